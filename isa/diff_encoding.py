@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/diff_encoding.py isa/encoding.v1.json isa/encoding.v2.json
+#   python3 isa/diff_encoding.py old.json new.json --json diff.json
+#   python3 isa/diff_encoding.py old.json new.json --filter '^v_ffma\.' --limit 20
+# Notes:
+#   - encodings are matched by their key ("<inst_name>.<form_key0>[...]").
+#   - each encoding's range list is reduced to a hashable signature first; only
+#     encodings whose signatures differ are diffed field by field.
+#   - side-by-side HTML for changed encodings:
+#       python3 isa/render_encoding_html.py new.json --diff-against old.json -o outdir
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+
+RANGE_SIG_FIELDS = ("type", "start", "length", "name", "constant", "oprnd_idx")
+
+# Unnamed ranges (constant / reserved / gap) are matched by interval overlap
+# instead of by name.
+POSITIONAL_TYPES = {"constant", "reserved", "gap"}
+
+
+def load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def range_signature(ranges: list[dict]) -> tuple:
+    return tuple(
+        sorted(tuple(r.get(f) for f in RANGE_SIG_FIELDS) for r in ranges)
+    )
+
+
+def index_encodings(data: dict) -> dict[str, tuple[int, dict]]:
+    # key -> (signature hash, encoding)
+    encodings = data.get("encodings") or {}
+    if not isinstance(encodings, dict):
+        raise ValueError("encodings must be an object")
+    return {
+        key: (hash(range_signature(enc.get("ranges", []))), enc)
+        for key, enc in encodings.items()
+    }
+
+
+def field_id(r: dict) -> tuple:
+    return (r.get("type"), r.get("name"), r.get("oprnd_idx"))
+
+
+def fmt_interval(r: dict) -> str:
+    start = r.get("start", 0)
+    length = r.get("length", 0)
+    end = start + length - 1 if length else start
+    return f"[{end}:{start}]"
+
+
+def overlap(a: dict, b: dict) -> int:
+    lo = max(a["start"], b["start"])
+    hi = min(a["start"] + a["length"], b["start"] + b["length"])
+    return max(0, hi - lo)
+
+
+def match_positional(old: list[dict], new: list[dict]) -> list[tuple[dict | None, dict | None]]:
+    # Both lists are sorted by start. Pair each old interval with the new
+    # interval of the same type that overlaps it most; a sweep over the two
+    # sorted lists keeps this linear in the number of ranges.
+    pairs: list[tuple[dict | None, dict | None]] = []
+    used_new: set[int] = set()
+    j = 0
+    for a in old:
+        while j < len(new) and new[j]["start"] + new[j]["length"] <= a["start"]:
+            j += 1
+        best = None
+        best_ov = 0
+        k = j
+        while k < len(new) and new[k]["start"] < a["start"] + a["length"]:
+            ov = overlap(a, new[k])
+            if k not in used_new and new[k].get("type") == a.get("type") and ov > best_ov:
+                best, best_ov = k, ov
+            k += 1
+        if best is None:
+            pairs.append((a, None))
+        else:
+            used_new.add(best)
+            pairs.append((a, new[best]))
+    for k, b in enumerate(new):
+        if k not in used_new:
+            pairs.append((None, b))
+    return pairs
+
+
+def owner_intervals(ranges: list[dict]) -> list[tuple[int, int, tuple]]:
+    out = []
+    for r in sorted(ranges, key=lambda r: r.get("start", 0)):
+        ident = field_id(r)
+        if r.get("type") in POSITIONAL_TYPES:
+            ident = ident + (r.get("constant"),)
+        out.append((r.get("start", 0), r.get("start", 0) + r.get("length", 0), ident))
+    return out
+
+
+def changed_bit_intervals(old: list[dict], new: list[dict]) -> list[tuple[int, int]]:
+    # Merge the boundaries of both layouts and compare the owning field of
+    # every elementary interval; adjacent changed intervals are coalesced.
+    a = owner_intervals(old)
+    b = owner_intervals(new)
+    bounds = sorted({s for s, _, _ in a} | {e for _, e, _ in a} | {s for s, _, _ in b} | {e for _, e, _ in b})
+    out: list[tuple[int, int]] = []
+    i = j = 0
+    for lo, hi in zip(bounds, bounds[1:]):
+        while i < len(a) and a[i][1] <= lo:
+            i += 1
+        while j < len(b) and b[j][1] <= lo:
+            j += 1
+        own_a = a[i][2] if i < len(a) and a[i][0] <= lo else None
+        own_b = b[j][2] if j < len(b) and b[j][0] <= lo else None
+        if own_a == own_b:
+            continue
+        if out and out[-1][1] == lo:
+            out[-1] = (out[-1][0], hi)
+        else:
+            out.append((lo, hi))
+    return out
+
+
+def diff_ranges(old: list[dict], new: list[dict]) -> list[dict]:
+    changes: list[dict] = []
+    old_named: dict[tuple, dict] = {}
+    new_named: dict[tuple, dict] = {}
+    old_pos: list[dict] = []
+    new_pos: list[dict] = []
+    for r in old:
+        if r.get("type") in POSITIONAL_TYPES:
+            old_pos.append(r)
+        else:
+            old_named[field_id(r)] = r
+    for r in new:
+        if r.get("type") in POSITIONAL_TYPES:
+            new_pos.append(r)
+        else:
+            new_named[field_id(r)] = r
+
+    for fid, a in old_named.items():
+        b = new_named.get(fid)
+        if b is None:
+            changes.append({"kind": "removed", "field": list(fid), "old": fmt_interval(a)})
+            continue
+        moved = a.get("start") != b.get("start")
+        resized = a.get("length") != b.get("length")
+        if moved or resized:
+            kind = "moved+resized" if moved and resized else ("moved" if moved else "resized")
+            changes.append(
+                {"kind": kind, "field": list(fid), "old": fmt_interval(a), "new": fmt_interval(b)}
+            )
+    for fid, b in new_named.items():
+        if fid not in old_named:
+            changes.append({"kind": "added", "field": list(fid), "new": fmt_interval(b)})
+
+    old_pos.sort(key=lambda r: r.get("start", 0))
+    new_pos.sort(key=lambda r: r.get("start", 0))
+    for a, b in match_positional(old_pos, new_pos):
+        if a is None:
+            changes.append({"kind": "added", "field": [b.get("type")], "new": fmt_interval(b),
+                            "constant": b.get("constant")})
+        elif b is None:
+            changes.append({"kind": "removed", "field": [a.get("type")], "old": fmt_interval(a),
+                            "constant": a.get("constant")})
+        elif a.get("start") != b.get("start") or a.get("length") != b.get("length"):
+            changes.append(
+                {
+                    "kind": "constant-moved" if a.get("type") == "constant" else "resized",
+                    "field": [a.get("type")],
+                    "old": fmt_interval(a),
+                    "new": fmt_interval(b),
+                    "old_constant": a.get("constant"),
+                    "new_constant": b.get("constant"),
+                }
+            )
+        elif a.get("constant") != b.get("constant"):
+            changes.append(
+                {
+                    "kind": "constant-changed",
+                    "field": [a.get("type")],
+                    "old": fmt_interval(a),
+                    "old_constant": a.get("constant"),
+                    "new_constant": b.get("constant"),
+                }
+            )
+    return changes
+
+
+def diff_encodings(old_data: dict, new_data: dict) -> dict:
+    old_idx = index_encodings(old_data)
+    new_idx = index_encodings(new_data)
+    added = sorted(k for k in new_idx if k not in old_idx)
+    removed = sorted(k for k in old_idx if k not in new_idx)
+    unchanged = 0
+    changed: dict[str, dict] = {}
+    for key in sorted(k for k in old_idx if k in new_idx):
+        old_hash, old_enc = old_idx[key]
+        new_hash, new_enc = new_idx[key]
+        if old_hash == new_hash:
+            unchanged += 1
+            continue
+        old_ranges = old_enc.get("ranges", [])
+        new_ranges = new_enc.get("ranges", [])
+        changed[key] = {
+            "changes": diff_ranges(old_ranges, new_ranges),
+            "changed_bits": [list(iv) for iv in changed_bit_intervals(old_ranges, new_ranges)],
+        }
+    return {
+        "summary": {
+            "old_encodings": len(old_idx),
+            "new_encodings": len(new_idx),
+            "unchanged": unchanged,
+            "changed": len(changed),
+            "added": len(added),
+            "removed": len(removed),
+        },
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+    }
+
+
+def fmt_change(c: dict) -> str:
+    field = ".".join(str(x) for x in c["field"] if x is not None)
+    kind = c["kind"]
+    if kind == "added":
+        extra = f" = {c['constant']}" if c.get("constant") is not None else ""
+        return f"+ {field} {c['new']}{extra}"
+    if kind == "removed":
+        extra = f" = {c['constant']}" if c.get("constant") is not None else ""
+        return f"- {field} {c['old']}{extra}"
+    if kind == "constant-changed":
+        return f"~ {field} {c['old']}: {c['old_constant']} -> {c['new_constant']}"
+    if kind == "constant-moved":
+        return f"~ {field} {c['old']}={c['old_constant']} -> {c['new']}={c['new_constant']}"
+    return f"~ {field} {kind}: {c['old']} -> {c['new']}"
+
+
+def write_text_report(out, diff: dict, pattern, limit: int) -> None:
+    s = diff["summary"]
+    out.write(
+        f"encodings: old={s['old_encodings']} new={s['new_encodings']} | "
+        f"unchanged={s['unchanged']} changed={s['changed']} "
+        f"added={s['added']} removed={s['removed']}\n"
+    )
+    for label, keys in (("added", diff["added"]), ("removed", diff["removed"])):
+        keys = [k for k in keys if not pattern or pattern.search(k)]
+        if keys:
+            out.write(f"\n{label} ({len(keys)}):\n")
+            for k in keys:
+                out.write(f"  {k}\n")
+    printed = 0
+    for key, info in diff["changed"].items():
+        if pattern and not pattern.search(key):
+            continue
+        if limit and printed >= limit:
+            out.write(f"\n... stopped at --limit={limit}\n")
+            break
+        bits = ", ".join(f"[{hi - 1}:{lo}]" for lo, hi in info["changed_bits"])
+        out.write(f"\n{key}  (changed bits: {bits or 'none'})\n")
+        for c in info["changes"]:
+            out.write(f"  {fmt_change(c)}\n")
+        printed += 1
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Diff two encoding JSON files produced by encoding synthesis."
+    )
+    parser.add_argument("old_json", help="Baseline encoding JSON")
+    parser.add_argument("new_json", help="New encoding JSON")
+    parser.add_argument("--json", default="", help="Also write the full diff as JSON to this path")
+    parser.add_argument("--filter", default="", help="Regex on encoding keys (text report only)")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=0,
+        help="Max changed encodings printed in the text report (0 means no limit)",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        diff = diff_encodings(load_json(args.old_json), load_json(args.new_json))
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(diff, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    pattern = re.compile(args.filter) if args.filter else None
+    write_text_report(sys.stdout, diff, pattern, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/encoding_density.py isa/encoding.v1.json isa/ref/sm90a/ref-encoding.json
+#   python3 isa/encoding_density.py isa/encoding.v1.json isa/ref/sm90a/ref-encoding.json --spec isa/spec.jsonc --json density.json
+#   python3 isa/encoding_density.py isa/encoding.v1.json isa/ref/sm90a/ref-encoding.json --filter '^v_f'
+# Notes:
+#   - every encoding's 128 bits are split into categories:
+#       opcode    synthesized: `constant` ranges (instruction + form codes);
+#                 ref: constant bits inside the opcode window of extract_opcodes.py (bits 0..11).
+#       operand   `operand` ranges.
+#       flag      synthesized: `oprnd_flag`; ref: `flag`, `operand_flag`, `operand_modifier`.
+#       modifier  `modifier` ranges.
+#       control   ref only: predicate and scheduling fields (stall, y, r-bar, w-bar, b-mask, reuse).
+#       constant  ref only: constant bits outside the opcode window (the dump does not tell fixed
+#                 sub-opcodes from reserved-zero bits, so both land here).
+#       reserved  synthesized: `reserved`; both sides: bits not covered by any range.
+#     utilization = (operand + flag + modifier + control) / 128.
+#   - opcode space: synthesized side, leaf codes used out of 2**(instruction bits + form bits) and per level
+#     (for prefix-coded opcodes, encoding_synthesis.v2.py --opcode prefix, the Kraft sum of the leaf codes);
+#     ref side, occupied slots of the 12-bit opcode window (same occupancy rule as extract_opcodes.py).
+#   - spec instructions are matched to ref variants through `behavior.SASS` (xref_spec_ref.py); a form is
+#     compared against the ref variants with the same operand count when there are any, else all variants
+#     of its SASS base names.
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "ref" / "sm90a"))
+
+from analyze_ref_encoding import CONTROL_TYPES, iter_ref_entries  # noqa: E402
+from extract_opcodes import OPCODE_BITS, occupancy  # noqa: E402
+from validate_spec_format import load_jsonc  # noqa: E402
+from xref_spec_ref import RefIndex, cross_reference  # noqa: E402
+
+INSTRUCTION_WIDTH_BITS = 128
+CATEGORIES = ("opcode", "operand", "flag", "modifier", "control", "constant", "reserved")
+PAYLOAD_CATEGORIES = ("operand", "flag", "modifier", "control")
+
+SYNTH_CATEGORY = {
+    "constant": "opcode",
+    "operand": "operand",
+    "oprnd_flag": "flag",
+    "modifier": "modifier",
+    "reserved": "reserved",
+}
+REF_CATEGORY = {
+    "operand": "operand",
+    "flag": "flag",
+    "operand_flag": "flag",
+    "operand_modifier": "flag",
+    "modifier": "modifier",
+    **{t: "control" for t in CONTROL_TYPES},
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare bit density of synthesized and reference encodings.")
+    parser.add_argument("encoding", help="Synthesized encoding JSON (e.g. isa/encoding.v1.json)")
+    parser.add_argument("ref_json", help="Path to ref-encoding.json")
+    parser.add_argument(
+        "--spec",
+        default=str(Path(__file__).with_name("spec.jsonc")),
+        help="spec.jsonc used to match instructions via behavior.SASS (default: ./spec.jsonc)",
+    )
+    parser.add_argument("--json", default="", help="Also write the full report as JSON to this path")
+    parser.add_argument("--filter", default="", help="Regex on spec instruction names for the per-instruction table")
+    return parser.parse_args()
+
+
+def empty_counts() -> dict[str, int]:
+    return {c: 0 for c in CATEGORIES}
+
+
+def utilization(counts: dict[str, int]) -> float:
+    return sum(counts[c] for c in PAYLOAD_CATEGORIES) / INSTRUCTION_WIDTH_BITS
+
+
+def synth_bit_usage(enc: dict) -> dict[str, int]:
+    counts = empty_counts()
+    covered = 0
+    for r in enc.get("ranges", []):
+        length = int(r.get("length") or 0)
+        counts[SYNTH_CATEGORY.get(r.get("type"), "reserved")] += length
+        covered += length
+    counts["reserved"] += max(0, INSTRUCTION_WIDTH_BITS - covered)
+    return counts
+
+
+def ref_bit_usage(v: dict[str, Any]) -> tuple[dict[str, int], int, int]:
+    # (category bits, opcode value, mask of the opcode-window bits fixed by constants)
+    counts = empty_counts()
+    covered = 0
+    opcode = 0
+    opmask = 0
+    for r in (v.get("ranges") or {}).get("ranges", []):
+        start = int(r.get("start") or 0)
+        length = int(r.get("length") or 0)
+        covered += length
+        rtype = r.get("type")
+        if rtype != "constant":
+            counts[REF_CATEGORY.get(rtype, "reserved")] += length
+            continue
+        in_window = max(0, min(start + length, OPCODE_BITS) - start)
+        counts["opcode"] += in_window
+        counts["constant"] += length - in_window
+        if in_window:
+            field = (1 << in_window) - 1
+            opmask |= field << start
+            opcode |= (int(r.get("constant") or 0) & field) << start
+    counts["reserved"] += max(0, INSTRUCTION_WIDTH_BITS - covered)
+    return counts, opcode, opmask
+
+
+def summarize(rows: Iterable[dict[str, int]]) -> dict[str, Any]:
+    rows = list(rows)
+    if not rows:
+        return {"encodings": 0}
+    utils = [utilization(c) for c in rows]
+    totals = {c: sum(r[c] for r in rows) for c in CATEGORIES}
+    return {
+        "encodings": len(rows),
+        "mean_bits": {c: round(totals[c] / len(rows), 2) for c in CATEGORIES},
+        "share": {c: round(totals[c] / (len(rows) * INSTRUCTION_WIDTH_BITS), 4) for c in CATEGORIES},
+        "utilization": {
+            "mean": round(statistics.fmean(utils), 4),
+            "median": round(statistics.median(utils), 4),
+            "min": round(min(utils), 4),
+            "max": round(max(utils), 4),
+        },
+    }
+
+
+def synth_opcode_space(meta: dict, n_encodings: int) -> dict[str, Any]:
+    stats = meta.get("statistics") or {}
+    prefix = stats.get("opcode") or {}
+    if prefix.get("mode") == "prefix":
+        # Variable-length codes: the share of the code space used is the Kraft sum of the leaf codes.
+        return {
+            "opcode_bits": prefix["max_bits"],
+            "slots": 1 << prefix["max_bits"],
+            "used": n_encodings,
+            "used_share": prefix["kraft_sum"],
+            "levels": [],
+        }
+    inst_bits = int(stats.get("instruction_bits") or 0)
+    form_bits = [int(b) for b in stats.get("form_level_bits") or []]
+    total_bits = inst_bits + sum(form_bits)
+    levels = [{"level": "instruction", "bits": inst_bits, "used": stats.get("instruction_count")}]
+    for i, (bits, count) in enumerate(zip(form_bits, stats.get("form_level_counts") or [])):
+        levels.append({"level": f"form[{i}]", "bits": bits, "used": count})
+    return {
+        "opcode_bits": total_bits,
+        "slots": 1 << total_bits,
+        "used": n_encodings,
+        "used_share": round(n_encodings / (1 << total_bits), 6),
+        "levels": levels,
+    }
+
+
+def ref_opcode_space(opcodes: list[int], opmasks: list[int]) -> dict[str, Any]:
+    occ = occupancy(np.asarray(opcodes, dtype=np.int64), np.asarray(opmasks, dtype=np.int64))
+    used = int(occ.any(axis=1).sum())
+    return {
+        "opcode_bits": OPCODE_BITS,
+        "slots": 1 << OPCODE_BITS,
+        "used": used,
+        "used_share": round(used / (1 << OPCODE_BITS), 6),
+    }
+
+
+def compare(encoding: dict, ref_entries: Iterable[tuple[str, dict]], spec: dict) -> dict[str, Any]:
+    encodings = encoding.get("encodings") or {}
+    synth = {key: synth_bit_usage(enc) for key, enc in encodings.items()}
+
+    # One pass over the ref dump feeds both the SASS index and the per-variant bit counts.
+    ref_index = RefIndex()
+    ref: dict[str, dict[str, int]] = {}
+    opcodes: list[int] = []
+    opmasks: list[int] = []
+    for key, v in ref_entries:
+        ref_index.add(key, v)
+        ref[key], op, mask = ref_bit_usage(v)
+        opcodes.append(op)
+        opmasks.append(mask)
+
+    xref = cross_reference(spec, ref_index)
+    forms: dict[str, dict] = {}
+    by_inst: dict[str, dict[str, list]] = {}
+    for key, counts in synth.items():
+        f = xref["forms"].get(key)
+        ref_keys = []
+        if f and f["ref_base_names"]:
+            ref_keys = f["operand_count_matches"] or [
+                k for b in f["ref_base_names"] for k in ref_index.by_base[b]
+            ]
+        ref_utils = [utilization(ref[k]) for k in ref_keys]
+        forms[key] = {
+            "bits": counts,
+            "utilization": round(utilization(counts), 4),
+            "ref_variants": len(ref_keys),
+            "ref_utilization": round(statistics.fmean(ref_utils), 4) if ref_utils else None,
+        }
+        inst = by_inst.setdefault(encodings[key].get("instruction", key.split(".", 1)[0]), {"synth": [], "ref": set()})
+        inst["synth"].append(counts)
+        inst["ref"].update(ref_keys)
+
+    instructions = {}
+    for name, inst in by_inst.items():
+        s = summarize(inst["synth"])
+        r = summarize(ref[k] for k in sorted(inst["ref"]))
+        instructions[name] = {
+            "sass": xref["instructions"].get(name, {}).get("sass", []),
+            "ref_base_names": xref["instructions"].get(name, {}).get("ref_base_names", []),
+            "synth": s,
+            "ref": r,
+        }
+
+    return {
+        "meta": {
+            "synth_encodings": len(synth),
+            "ref_variants": len(ref),
+            "matched_forms": sum(1 for f in forms.values() if f["ref_variants"]),
+            "categories": list(CATEGORIES),
+            "payload_categories": list(PAYLOAD_CATEGORIES),
+        },
+        "synth": {
+            **summarize(synth.values()),
+            "opcode_space": synth_opcode_space(encoding.get("meta") or {}, len(synth)),
+        },
+        "ref": {**summarize(ref.values()), "opcode_space": ref_opcode_space(opcodes, opmasks)},
+        "instructions": instructions,
+        "forms": forms,
+    }
+
+
+def fmt_util(summary: dict) -> str:
+    if not summary.get("encodings"):
+        return "-"
+    return f"{summary['utilization']['mean']:.3f}"
+
+
+def write_text_report(out, report: dict, pattern: re.Pattern[str] | None) -> None:
+    m = report["meta"]
+    out.write(
+        f"synth: {m['synth_encodings']} encodings | ref: {m['ref_variants']} variants | "
+        f"forms matched via SASS: {m['matched_forms']}/{m['synth_encodings']}\n\n"
+    )
+    out.write(f"{'category':10} {'synth bits':>11} {'share':>7} {'ref bits':>11} {'share':>7}\n")
+    for c in CATEGORIES:
+        out.write(
+            f"{c:10} {report['synth']['mean_bits'][c]:11.2f} {report['synth']['share'][c]:7.3f} "
+            f"{report['ref']['mean_bits'][c]:11.2f} {report['ref']['share'][c]:7.3f}\n"
+        )
+    for side in ("synth", "ref"):
+        u = report[side]["utilization"]
+        sp = report[side]["opcode_space"]
+        out.write(
+            f"\n{side}: utilization mean={u['mean']:.3f} median={u['median']:.3f} "
+            f"min={u['min']:.3f} max={u['max']:.3f} | opcode space {sp['used']}/{sp['slots']} "
+            f"({sp['opcode_bits']} bits, {sp['used_share']:.2%})"
+        )
+        if sp.get("levels"):
+            out.write(" | " + ", ".join(f"{lv['level']}={lv['used']}/{1 << lv['bits']}" for lv in sp["levels"]))
+    out.write("\n\n")
+
+    out.write(f"{'instruction':16} {'forms':>5} {'synth':>6} {'ref':>6} {'delta':>7}  ref base names\n")
+    for name, inst in report["instructions"].items():
+        if pattern and not pattern.search(name):
+            continue
+        s, r = inst["synth"], inst["ref"]
+        delta = (
+            f"{r['utilization']['mean'] - s['utilization']['mean']:+7.3f}" if r.get("encodings") else f"{'-':>7}"
+        )
+        out.write(
+            f"{name:16} {s['encodings']:5d} {fmt_util(s):>6} {fmt_util(r):>6} {delta}  "
+            f"{', '.join(inst['ref_base_names']) or '-'}\n"
+        )
+
+
+def main() -> int:
+    args = parse_args()
+    ref_path = Path(args.ref_json)
+    for path in (Path(args.encoding), ref_path):
+        if not path.exists():
+            print(f"error: file not found: {path}", file=sys.stderr)
+            return 1
+    try:
+        spec = load_jsonc(args.spec)
+        with open(args.encoding, "r", encoding="utf-8") as fh:
+            encoding = json.load(fh)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    report = compare(encoding, iter_ref_entries(ref_path), spec)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    write_text_report(sys.stdout, report, re.compile(args.filter) if args.filter else None)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,730 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/encoding_synthesis.v2.py isa/spec.jsonc -o isa/encoding.v2.json
+#   python3 isa/encoding_synthesis.v2.py isa/spec.jsonc -o isa/encoding.v2.json --budget 20000 --branch 4
+#   python3 isa/encoding_synthesis.v2.py isa/spec.jsonc -o mixed.json --short-width 64 --histogram hist.json
+# Notes:
+#   - opcode fields are laid out exactly as in version 1 (instruction code, then one code per form level).
+#   - every other field gets a *field key*:
+#       operand     ("operand", role, width)          e.g. dst of every 8-bit register operand
+#       oprnd_flag  ("oprnd_flag", role, flag, width) e.g. the reuse flag of src1
+#       modifier    ("modifier", name, width)
+#     a key is given one start bit shared by every encoding that has it, whenever that fits.
+#   - keys are allocated in order of use count (then width), first-fit from the lowest bit, with
+#     depth-first backtracking over the `--branch` lowest feasible starts of each key, bounded by `--budget`
+#     placement steps. A start is feasible if the window is free in every encoding using the key and each of
+#     those encodings still has enough free bits for its remaining fields.
+#   - when no feasible start is left (or the budget is spent), the key takes the start free in the most
+#     encodings; the remaining encodings place that field locally (first fit, after all shared keys).
+#   - gaps between fields are emitted as `reserved` ranges.
+#   - `--opcode prefix` replaces the fixed-width opcode fields with prefix-free codes sized per subtree:
+#       - every node of the instruction/form tree gives its children a canonical prefix code; without a
+#         histogram the code lengths minimize the longest leaf code, with `--histogram` (JSON object,
+#         instruction name or encoding key -> count, add-one smoothed) they are Huffman codes that
+#         minimize the weighted mean code length.
+#       - a leaf's opcode is the concatenation of its path codes, read from bit 0 upwards. Instructions
+#         without forms keep a code so the instruction code space matches the spec.
+#       - prefix-freedom of the full leaf codes is checked (sorted codes, no code a prefix of the next) and
+#         reclaimed bits (fixed-width opcode bits minus the code length) are reported per encoding.
+#   - `--short-width 64` makes the ISA mixed-width: bit 0 of every instruction is a width discriminator
+#     (0 = 128-bit, 1 = short). Every form keeps its 128-bit encoding (opcode moved up by one bit); the forms
+#     whose fields fit next to the discriminator and a flat short opcode also get a short encoding, laid out by
+#     the same shared-position allocator, under the top-level `short_encodings`. `--short-hot N` restricts the
+#     short candidates to the N most frequent encodings of `--histogram`.
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import importlib.util
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from encoding_density import summarize, synth_bit_usage
+from validate_spec_format import load_jsonc
+
+_V1_PATH = Path(__file__).with_name("encoding_synthesis.v1.py")
+_v1_spec = importlib.util.spec_from_file_location("encoding_synthesis_v1", _V1_PATH)
+v1 = importlib.util.module_from_spec(_v1_spec)
+sys.modules[_v1_spec.name] = v1
+_v1_spec.loader.exec_module(v1)
+
+INSTRUCTION_WIDTH_BITS = v1.INSTRUCTION_WIDTH_BITS
+
+
+@dataclass
+class Field:
+    key: tuple
+    rtype: str
+    name: str
+    width: int
+    oprnd_idx: str | None = None
+    start: int | None = None
+
+
+@dataclass
+class Leaf:
+    key: str
+    instruction: str
+    form_path: list[str]
+    opcode_ranges: list[dict]
+    fields: list[Field] = field(default_factory=list)
+
+
+@dataclass
+class CodeNode:
+    # A node of the instruction/form tree; `leaf` is the encoding key for leaf forms.
+    name: str
+    children: list["CodeNode"] = field(default_factory=list)
+    leaf: str | None = None
+
+
+def window(start: int, width: int) -> int:
+    return ((1 << width) - 1) << start
+
+
+def has_free_run(occ: int, length: int, inst_width: int) -> bool:
+    # True if `occ` leaves `length` consecutive zero bits below `inst_width`.
+    free = ~occ & ((1 << inst_width) - 1)
+    for _ in range(length - 1):
+        free &= free >> 1
+    return free != 0
+
+
+def collect_leaves(spec: dict) -> tuple[list[Leaf], dict]:
+    instructions = spec["instructions"]
+    operand_width_bits = spec["operand_width_bits"]
+    flag_defs = spec["global_oprnd_flag_defs"]
+    global_mod_defs = spec["global_modifier_defs"]
+
+    inst_names = list(instructions.keys())
+    form_counts = v1.collect_form_counts(instructions)
+    form_bits = [v1.bits_needed(n) for n in form_counts]
+    bits_inst = v1.bits_needed(len(inst_names))
+    leaves: list[Leaf] = []
+
+    def make_leaf(inst_idx, inst_name, form_path, form_indices, operands, modifiers, mod_defs) -> Leaf:
+        # Same opcode layout as version 1. Fields are added below, so an overflowing leaf is only
+        # reported when it is laid out.
+        opcode_ranges = [
+            r
+            for r in v1.build_ranges(
+                inst_idx, form_indices, bits_inst, form_bits, [], [], operand_width_bits, flag_defs, mod_defs
+            )
+            if r["type"] == "constant"
+        ]
+        leaf = Leaf(inst_name + "." + ".".join(form_path), inst_name, form_path, opcode_ranges)
+        for operand in operands:
+            width = v1.get_operand_bits(operand, operand_width_bits)
+            role = operand.get("role") or operand.get("name")
+            leaf.fields.append(Field(("operand", role, width), "operand", operand.get("name"), width))
+        for operand in operands:
+            role = operand.get("role") or operand.get("name")
+            for flag in operand.get("oprnd_flag", []):
+                width = v1.get_flag_bits(flag, flag_defs)
+                leaf.fields.append(
+                    Field(("oprnd_flag", role, flag, width), "oprnd_flag", flag, width, oprnd_idx=operand.get("name"))
+                )
+        for modifier in modifiers:
+            width = v1.get_modifier_bits(modifier, mod_defs)
+            leaf.fields.append(Field(("modifier", modifier, width), "modifier", modifier, width))
+        leaf.fields = [f for f in leaf.fields if f.width]
+        return leaf
+
+    for inst_idx, inst_name in enumerate(inst_names):
+        inst = instructions[inst_name]
+        inst_mod_defs = dict(global_mod_defs)
+        inst_mod_defs.update(inst.get("local_modifier_defs", {}))
+
+        # Same walk as version 1: parent fixed_modifiers come before the form's inst_modifiers.
+        def walk(forms_obj, form_path, form_indices, operands, modifiers, mod_defs, parent_fixed_mods):
+            for idx, (form_key, form) in enumerate(v1.iter_forms(forms_obj)):
+                new_mod_defs = mod_defs
+                if form.get("local_modifier_defs"):
+                    new_mod_defs = dict(mod_defs)
+                    new_mod_defs.update(form["local_modifier_defs"])
+                new_operands = operands + list(form.get("operands", []))
+                new_modifiers = modifiers + list(parent_fixed_mods) + list(form.get("inst_modifiers", []))
+                if form.get("forms"):
+                    walk(
+                        form["forms"], form_path + [form_key], form_indices + [idx], new_operands,
+                        new_modifiers, new_mod_defs, list(form.get("fixed_modifiers", [])),
+                    )
+                else:
+                    leaves.append(
+                        make_leaf(
+                            inst_idx, inst_name, form_path + [form_key], form_indices + [idx],
+                            new_operands, new_modifiers, new_mod_defs,
+                        )
+                    )
+
+        walk(
+            inst.get("forms", {}), [], [], [], list(inst.get("inst_modifiers", [])),
+            inst_mod_defs, list(inst.get("fixed_modifiers", [])),
+        )
+
+    statistics = {
+        "instruction_count": len(inst_names),
+        "instruction_bits": bits_inst,
+        "form_level_counts": form_counts,
+        "form_level_bits": form_bits,
+    }
+    return leaves, statistics
+
+
+def code_tree(spec: dict) -> CodeNode:
+    root = CodeNode("")
+
+    def walk(node: CodeNode, forms_obj, prefix: str) -> None:
+        for form_key, form in v1.iter_forms(forms_obj):
+            child = CodeNode(form_key)
+            node.children.append(child)
+            if form.get("forms"):
+                walk(child, form["forms"], prefix + "." + form_key)
+            else:
+                child.leaf = prefix + "." + form_key
+
+    for inst_name, inst in spec["instructions"].items():
+        node = CodeNode(inst_name)
+        root.children.append(node)
+        walk(node, inst.get("forms", {}), inst_name)
+    return root
+
+
+def code_lengths(keys: list[float], weighted: bool) -> list[int]:
+    # Huffman merge: weights add up (weighted) or the deeper subtree wins (min-max code length).
+    if len(keys) <= 1:
+        return [0] * len(keys)
+    lengths = [0] * len(keys)
+    heap = [(k, i, [i]) for i, k in enumerate(keys)]
+    heapq.heapify(heap)
+    tie = len(keys)
+    while len(heap) > 1:
+        ka, _, a = heapq.heappop(heap)
+        kb, _, b = heapq.heappop(heap)
+        for i in a + b:
+            lengths[i] += 1
+        heapq.heappush(heap, (ka + kb if weighted else max(ka, kb) + 1, tie, a + b))
+        tie += 1
+    return lengths
+
+
+def canonical_codes(lengths: list[int]) -> list[str]:
+    codes = [""] * len(lengths)
+    code = 0
+    prev = 0
+    for i in sorted(range(len(lengths)), key=lambda i: (lengths[i], i)):
+        code <<= lengths[i] - prev
+        prev = lengths[i]
+        codes[i] = format(code, f"0{prev}b") if prev else ""
+        code += 1
+    return codes
+
+
+def leaf_weights(root: CodeNode, histogram: dict[str, float] | None) -> dict[str, float]:
+    # Encoding-key counts plus an even share of instruction-level counts, add-one smoothed.
+    hist = histogram or {}
+    out: dict[str, float] = {}
+
+    def leaves_of(node: CodeNode) -> list[str]:
+        if node.leaf is not None:
+            return [node.leaf]
+        return [k for c in node.children for k in leaves_of(c)]
+
+    for inst in root.children:
+        keys = leaves_of(inst)
+        for key in keys:
+            out[key] = hist.get(key, 0) + hist.get(inst.name, 0) / len(keys) + 1
+    return out
+
+
+def assign_prefix_codes(root: CodeNode, histogram: dict[str, float] | None) -> dict[str, list[str]]:
+    # encoding key -> per-level codes (instruction code first).
+    leaf_weight = leaf_weights(root, histogram)
+    weight: dict[int, float] = {}
+    depth: dict[int, int] = {}
+
+    def measure(node: CodeNode) -> None:
+        for c in node.children:
+            measure(c)
+        if node.leaf is not None:
+            weight[id(node)] = leaf_weight[node.leaf]
+            depth[id(node)] = 0
+            return
+        if not node.children:
+            weight[id(node)], depth[id(node)] = 1, 0
+            return
+        lengths = code_lengths([depth[id(c)] for c in node.children], False)
+        weight[id(node)] = sum(weight[id(c)] for c in node.children)
+        depth[id(node)] = max(n + depth[id(c)] for n, c in zip(lengths, node.children))
+
+    measure(root)
+
+    out: dict[str, list[str]] = {}
+
+    def assign(node: CodeNode, path: list[str]) -> None:
+        if node.leaf is not None:
+            out[node.leaf] = path
+            return
+        if histogram is None:
+            lengths = code_lengths([depth[id(c)] for c in node.children], False)
+        else:
+            lengths = code_lengths([weight[id(c)] for c in node.children], True)
+        for c, code in zip(node.children, canonical_codes(lengths)):
+            assign(c, path + [code])
+
+    assign(root, [])
+    return out
+
+
+def check_prefix_free(codes: list[str]) -> None:
+    # In sorted order a code that is a prefix of another is immediately followed by one it prefixes.
+    ordered = sorted(codes)
+    for a, b in zip(ordered, ordered[1:]):
+        if b.startswith(a):
+            raise ValueError(f"opcode codes are not prefix-free: '{a}' is a prefix of '{b}'")
+
+
+def prefix_opcode_ranges(level_codes: list[str]) -> list[dict]:
+    ranges = []
+    cursor = 0
+    for code in level_codes:
+        if not code:
+            continue
+        # Code bits are read from the lowest bit upwards, so the first code bit is the range's bit 0.
+        ranges.append(
+            {"type": "constant", "start": cursor, "length": len(code), "name": None,
+             "constant": int(code[::-1], 2), "oprnd_idx": None}
+        )
+        cursor += len(code)
+    return ranges
+
+
+def apply_prefix_opcodes(spec: dict, leaves: list[Leaf], histogram: dict[str, float] | None) -> dict:
+    fixed_bits = {leaf.key: sum(r["length"] for r in leaf.opcode_ranges) for leaf in leaves}
+    root = code_tree(spec)
+    weights = leaf_weights(root, histogram)
+    codes = assign_prefix_codes(root, histogram)
+    full = {key: "".join(parts) for key, parts in codes.items()}
+    check_prefix_free(list(full.values()))
+    for leaf in leaves:
+        leaf.opcode_ranges = prefix_opcode_ranges(codes[leaf.key])
+    reclaimed = {leaf.key: fixed_bits[leaf.key] - len(full[leaf.key]) for leaf in leaves}
+    lengths = [len(full[leaf.key]) for leaf in leaves]
+    return {
+        "mode": "prefix",
+        "weighted": histogram is not None,
+        "prefix_free": True,
+        "kraft_sum": round(sum(2.0 ** -n for n in lengths), 6),
+        "max_bits": max(lengths, default=0),
+        "mean_bits": round(sum(lengths) / len(lengths), 3) if lengths else 0.0,
+        "weighted_mean_bits": (
+            round(sum(weights[k] * len(full[k]) for k in full) / sum(weights.values()), 3) if full else 0.0
+        ),
+        "reclaimed_bits": {
+            "total": sum(reclaimed.values()),
+            "mean": round(sum(reclaimed.values()) / len(reclaimed), 3) if reclaimed else 0.0,
+            "max": max(reclaimed.values(), default=0),
+            "min": min(reclaimed.values(), default=0),
+        },
+        "codes": {key: {"code": full[key], "reclaimed": reclaimed[key]} for key in full},
+    }
+
+
+class SharedAllocator:
+    """Assigns one start bit per field key, shared by every leaf that uses the key."""
+
+    def __init__(
+        self, leaves: list[Leaf], budget: int, branch: int, inst_width: int = INSTRUCTION_WIDTH_BITS
+    ) -> None:
+        self.inst_width = inst_width
+        self.budget = budget
+        self.branch = branch
+        self.occ: list[int] = []
+        self.need: list[int] = []
+        self.fields: list[list[Field]] = [leaf.fields for leaf in leaves]
+        self.users: dict[tuple, list[tuple[int, Field]]] = {}
+        first_seen: dict[tuple, int] = {}
+        for i, leaf in enumerate(leaves):
+            occ = 0
+            for r in leaf.opcode_ranges:
+                occ |= window(r["start"], r["length"])
+            self.occ.append(occ)
+            self.need.append(sum(f.width for f in leaf.fields))
+            for f in leaf.fields:
+                self.users.setdefault(f.key, []).append((i, f))
+                first_seen.setdefault(f.key, len(first_seen))
+        self.order = sorted(self.users, key=lambda k: (-len(self.users[k]), -k[-1], first_seen[k]))
+        self.positions: dict[tuple, int | None] = {}
+        self.partial: set[tuple] = set()
+        self.steps = 0
+        self.backtracks = 0
+
+    def fits(self, leaf_idx: int, start: int, width: int) -> bool:
+        w = window(start, width)
+        if self.occ[leaf_idx] & w:
+            return False
+        occ = self.occ[leaf_idx] | w
+        if self.inst_width - occ.bit_count() < self.need[leaf_idx] - width:
+            return False
+        # The widest field still to place needs a contiguous free run.
+        rest = sorted((f.width for f in self.fields[leaf_idx] if f.start is None), reverse=True)
+        rest.remove(width)
+        return not rest or has_free_run(occ, rest[0], self.inst_width)
+
+    def candidates(self, key: tuple) -> list[int]:
+        width = key[-1]
+        out = []
+        for start in range(0, self.inst_width - width + 1):
+            if all(self.fits(i, start, width) for i, _ in self.users[key]):
+                out.append(start)
+                if len(out) == self.branch:
+                    break
+        return out
+
+    def apply(self, key: tuple, start: int | None, sign: int) -> None:
+        # sign=+1 places every user that fits at `start`, sign=-1 undoes it.
+        width = key[-1]
+        for i, f in self.users[key]:
+            if sign > 0:
+                if start is None or not self.fits(i, start, width):
+                    continue
+                f.start = start
+            elif f.start is None:
+                continue
+            else:
+                f.start = None
+            self.occ[i] ^= window(start, width)
+            self.need[i] -= sign * width
+
+    def best_partial(self, key: tuple) -> int | None:
+        width = key[-1]
+        best, best_count = None, 0
+        for start in range(0, self.inst_width - width + 1):
+            count = sum(1 for i, _ in self.users[key] if self.fits(i, start, width))
+            if count > best_count:
+                best, best_count = start, count
+        return best
+
+    def run(self) -> None:
+        # stack[i] = [candidate starts of order[i], index of the next one to try]
+        stack: list[list] = []
+        i = 0
+        while i < len(self.order):
+            key = self.order[i]
+            if len(stack) == i:
+                stack.append([self.candidates(key), 0])
+            cands, j = stack[i]
+            if j < len(cands):
+                stack[i][1] += 1
+                self.apply(key, cands[j], +1)
+                self.positions[key] = cands[j]
+                self.steps += 1
+                i += 1
+                continue
+            if i > 0 and self.order[i - 1] not in self.partial and self.steps < self.budget:
+                # Backtrack: retry the previous key at its next candidate start.
+                stack.pop()
+                i -= 1
+                prev = self.order[i]
+                self.apply(prev, self.positions.pop(prev), -1)
+                self.backtracks += 1
+                continue
+            # Out of options or budget: share where possible, the rest is placed locally later.
+            start = self.best_partial(key)
+            self.apply(key, start, +1)
+            self.positions[key] = start
+            self.partial.add(key)
+            i += 1
+
+
+def place_local(leaf: Leaf, inst_width: int = INSTRUCTION_WIDTH_BITS) -> int:
+    occ = 0
+    for r in leaf.opcode_ranges:
+        occ |= window(r["start"], r["length"])
+    for f in leaf.fields:
+        if f.start is not None:
+            occ |= window(f.start, f.width)
+    placed = 0
+    for f in leaf.fields:
+        if f.start is not None:
+            continue
+        for start in range(0, inst_width - f.width + 1):
+            if not occ & window(start, f.width):
+                f.start = start
+                occ |= window(start, f.width)
+                placed += 1
+                break
+        else:
+            raise ValueError(f"{leaf.key}: no room for field '{f.name}' ({f.width} bits)")
+    return placed
+
+
+def leaf_ranges(leaf: Leaf, inst_width: int = INSTRUCTION_WIDTH_BITS) -> list[dict]:
+    ranges = list(leaf.opcode_ranges)
+    for f in leaf.fields:
+        ranges.append(
+            {
+                "type": f.rtype,
+                "start": f.start,
+                "length": f.width,
+                "name": f.name,
+                "constant": None,
+                "oprnd_idx": f.oprnd_idx,
+            }
+        )
+    ranges.sort(key=lambda r: r["start"])
+    out: list[dict] = []
+    cursor = 0
+    for r in ranges:
+        if r["start"] > cursor:
+            out.append(
+                {"type": "reserved", "start": cursor, "length": r["start"] - cursor,
+                 "name": None, "constant": None, "oprnd_idx": None}
+            )
+        out.append(r)
+        cursor = r["start"] + r["length"]
+    if cursor < inst_width:
+        out.append(
+            {"type": "reserved", "start": cursor, "length": inst_width - cursor,
+             "name": None, "constant": None, "oprnd_idx": None}
+        )
+    return out
+
+
+def fmt_key(key: tuple) -> str:
+    kind, *ident, width = key
+    return f"{kind}:{'.'.join(str(x) for x in ident)}/{width}"
+
+
+def field_position_stats(alloc: SharedAllocator) -> dict:
+    field_positions = {}
+    for key in alloc.order:
+        users = alloc.users[key]
+        shared = sum(1 for _, f in users if f.start == alloc.positions.get(key))
+        field_positions[fmt_key(key)] = {"start": alloc.positions.get(key), "users": len(users), "shared": shared}
+    return {
+        "field_keys": len(alloc.order),
+        "fully_shared_keys": sum(1 for p in field_positions.values() if p["shared"] == p["users"]),
+        "allocator": {
+            "steps": alloc.steps,
+            "backtracks": alloc.backtracks,
+            "budget": alloc.budget,
+            "branch": alloc.branch,
+        },
+        "field_positions": field_positions,
+    }
+
+
+def constant_range(start: int, length: int, value: int) -> dict:
+    return {"type": "constant", "start": start, "length": length, "name": None, "constant": value, "oprnd_idx": None}
+
+
+def with_discriminator(opcode_ranges: list[dict], value: int) -> list[dict]:
+    # Bit 0 selects the instruction width; the opcode moves up by one bit.
+    return [constant_range(0, 1, value)] + [dict(r, start=r["start"] + 1) for r in opcode_ranges]
+
+
+def payload_bits(leaf: Leaf) -> int:
+    return sum(f.width for f in leaf.fields)
+
+
+def choose_short(leaves: list[Leaf], short_width: int, hot: set[str] | None) -> list[int]:
+    # The short opcode is a flat index over the short forms, so more short forms mean a wider opcode:
+    # take the largest n such that the n smallest candidates fit next to a bits_needed(n) opcode.
+    cands = sorted((payload_bits(leaf), i) for i, leaf in enumerate(leaves) if hot is None or leaf.key in hot)
+    for n in range(len(cands), 0, -1):
+        if 1 + v1.bits_needed(n) + cands[n - 1][0] <= short_width:
+            return sorted(i for _, i in cands[:n])
+    return []
+
+
+def synthesize_short(
+    leaves: list[Leaf], short_width: int, budget: int, branch: int, hot: set[str] | None
+) -> tuple[dict, dict]:
+    chosen = choose_short(leaves, short_width, hot)
+    dropped: list[str] = []
+    while True:
+        opcode_bits = v1.bits_needed(len(chosen))
+        short = []
+        for index, i in enumerate(chosen):
+            leaf = leaves[i]
+            ranges = [constant_range(1, opcode_bits, index)] if opcode_bits else []
+            short.append(
+                Leaf(
+                    leaf.key, leaf.instruction, leaf.form_path, with_discriminator(ranges, 1)[:1] + ranges,
+                    [Field(f.key, f.rtype, f.name, f.width, f.oprnd_idx) for f in leaf.fields],
+                )
+            )
+        alloc = SharedAllocator(short, budget, branch, short_width)
+        alloc.run()
+        # Shared positions can fragment a short word; forms whose local fields no longer fit stay long-only.
+        failed = []
+        for index, leaf in enumerate(short):
+            try:
+                place_local(leaf, short_width)
+            except ValueError:
+                failed.append(index)
+        if not failed:
+            break
+        dropped.extend(short[index].key for index in failed)
+        chosen = [i for index, i in enumerate(chosen) if index not in failed]
+
+    encodings = {
+        leaf.key: {
+            "instruction": leaf.instruction,
+            "form_path": leaf.form_path,
+            "width": short_width,
+            "ranges": leaf_ranges(leaf, short_width),
+        }
+        for leaf in short
+    }
+    by_inst: dict[str, list[int]] = {}
+    for leaf in leaves:
+        counts = by_inst.setdefault(leaf.instruction, [0, 0])
+        counts[0] += leaf.key in encodings
+        counts[1] += 1
+    stats = {
+        "width": short_width,
+        "discriminator": {"bit": 0, "long": 0, "short": 1},
+        "opcode_bits": v1.bits_needed(len(short)),
+        "candidates": len(leaves) if hot is None else sum(1 for leaf in leaves if leaf.key in hot),
+        "fit": len(short),
+        "fit_share": round(len(short) / len(leaves), 4) if leaves else 0.0,
+        "dropped_after_layout": dropped,
+        "by_instruction": by_inst,
+        **field_position_stats(alloc),
+    }
+    return encodings, stats
+
+
+def synthesize_encodings(
+    spec: dict,
+    budget: int,
+    branch: int,
+    opcode_mode: str = "fixed",
+    histogram: dict[str, float] | None = None,
+    short_width: int = 0,
+    short_hot: int = 0,
+) -> dict:
+    if short_width and not 2 < short_width < INSTRUCTION_WIDTH_BITS:
+        # The short form needs the discriminator bit plus at least one more bit, and must be narrower than the long one.
+        raise ValueError(f"--short-width must be between 3 and {INSTRUCTION_WIDTH_BITS - 1}, got {short_width}")
+    leaves, statistics = collect_leaves(spec)
+    if opcode_mode == "prefix":
+        statistics["opcode"] = apply_prefix_opcodes(spec, leaves, histogram)
+    if short_width:
+        for leaf in leaves:
+            leaf.opcode_ranges = with_discriminator(leaf.opcode_ranges, 0)
+    alloc = SharedAllocator(leaves, budget, branch)
+    alloc.run()
+    local = sum(place_local(leaf) for leaf in leaves)
+
+    encodings = {
+        leaf.key: {"instruction": leaf.instruction, "form_path": leaf.form_path, "ranges": leaf_ranges(leaf)}
+        for leaf in leaves
+    }
+    positions = field_position_stats(alloc)
+    statistics.update(
+        {
+            "field_keys": positions["field_keys"],
+            "fully_shared_keys": positions["fully_shared_keys"],
+            "local_placements": local,
+            "allocator": positions["allocator"],
+            "field_positions": positions["field_positions"],
+        }
+    )
+    statistics["density"] = summarize(synth_bit_usage(enc) for enc in encodings.values())
+    output = {"meta": {"encoding_version": 2, "statistics": statistics}, "encodings": encodings}
+
+    if short_width:
+        hot = None
+        if short_hot:
+            weights = leaf_weights(code_tree(spec), histogram)
+            hot = set(sorted(weights, key=lambda k: -weights[k])[:short_hot])
+        short, short_stats = synthesize_short(leaves, short_width, budget, branch, hot)
+        weights = leaf_weights(code_tree(spec), histogram)
+        total = sum(weights[leaf.key] for leaf in leaves)
+        # Mean bytes per executed instruction when every form that has a short encoding uses it.
+        short_stats["mean_bytes"] = round(
+            sum(weights[leaf.key] * (short_width if leaf.key in short else INSTRUCTION_WIDTH_BITS) for leaf in leaves)
+            / total
+            / 8,
+            3,
+        ) if total else 0.0
+        short_stats["weighted"] = histogram is not None
+        statistics["short"] = short_stats
+        output["short_encodings"] = short
+    return output
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Synthesize instruction encodings from spec.jsonc (version 2).")
+    parser.add_argument("spec_path", help="Path to spec.jsonc")
+    parser.add_argument("-o", "--output", required=True, help="Output JSON path")
+    parser.add_argument("--budget", type=int, default=20000, help="Max placement steps before giving up backtracking")
+    parser.add_argument("--branch", type=int, default=4, help="Candidate starts tried per field key")
+    parser.add_argument(
+        "--opcode",
+        choices=["fixed", "prefix"],
+        default="fixed",
+        help="fixed: version 1 opcode fields (default); prefix: prefix-free codes sized per subtree",
+    )
+    parser.add_argument(
+        "--histogram", default="", help="Instruction histogram JSON weighting --opcode prefix and --short-hot"
+    )
+    parser.add_argument(
+        "--short-width",
+        type=int,
+        default=0,
+        help="Also synthesize short encodings of this width (e.g. 64); bit 0 becomes the width discriminator",
+    )
+    parser.add_argument(
+        "--short-hot", type=int, default=0, help="Only the N most frequent encodings (--histogram) may be short"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    spec = load_jsonc(args.spec_path)
+    histogram = None
+    if args.histogram:
+        with open(args.histogram, "r", encoding="utf-8") as fh:
+            histogram = {str(k): float(v) for k, v in json.load(fh).items()}
+    try:
+        output = synthesize_encodings(
+            spec, args.budget, args.branch, args.opcode, histogram, args.short_width, args.short_hot
+        )
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2, ensure_ascii=False)
+        fh.write("\n")
+
+    stats = output["meta"]["statistics"]
+    print(
+        f"Wrote {args.output}: {stats['fully_shared_keys']}/{stats['field_keys']} field keys at one position, "
+        f"{stats['local_placements']} local placements, {stats['allocator']['backtracks']} backtracks"
+    )
+    if "short" in stats:
+        short = stats["short"]
+        print(
+            f"short encodings: {short['fit']}/{len(output['encodings'])} forms fit in {short['width']} bits "
+            f"({short['opcode_bits']} opcode bits), {short['mean_bytes']} bytes per instruction"
+        )
+    if "opcode" in stats:
+        op = stats["opcode"]
+        print(
+            f"prefix opcodes: {op['mean_bits']} bits mean ({op['weighted_mean_bits']} weighted), {op['max_bits']} max, kraft sum {op['kraft_sum']}, "
+            f"{op['reclaimed_bits']['total']} bits reclaimed ({op['reclaimed_bits']['mean']} per encoding)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/explore_encoding_space.py isa/spec.jsonc --set vreg=8..10 --set imm32=24,32
+#   python3 isa/explore_encoding_space.py isa/spec.jsonc --set vreg=8..12 --set sreg=8..12 --set rnd_mode_fp=2,3 --jobs 8
+#   python3 isa/explore_encoding_space.py isa/spec.jsonc --set vreg=8..16 --synth v2 --opcode prefix --json sweep.json
+# Notes:
+#   - every `--set NAME=VALUES` adds a grid axis; VALUES is a comma list and/or `lo..hi` ranges (inclusive).
+#     NAME is an `operand_width_bits` kind, or a modifier / operand flag name whose `bits` is overridden in
+#     global_modifier_defs, global_oprnd_flag_defs and every local_modifier_defs that defines it.
+#   - the base spec is parsed once and handed to the worker processes; each point applies its overrides
+#     copy-on-write (only the dicts on the path to a changed value are copied).
+#   - per point: validate_spec; per-encoding bit count (opcode + fields) to list every encoding that overflows
+#     128 bits; then, if nothing overflows, synthesis (`--synth v1` cursor packing, or `--synth v2` shared
+#     positions with a small backtracking budget) for reserved-bit totals and opcode space.
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from encoding_density import synth_bit_usage, synth_opcode_space
+from validate_spec_format import load_jsonc, validate_spec
+
+_V2_PATH = Path(__file__).with_name("encoding_synthesis.v2.py")
+_v2_spec = importlib.util.spec_from_file_location("encoding_synthesis_v2", _V2_PATH)
+v2 = importlib.util.module_from_spec(_v2_spec)
+sys.modules[_v2_spec.name] = v2
+_v2_spec.loader.exec_module(v2)
+
+INSTRUCTION_WIDTH_BITS = v2.INSTRUCTION_WIDTH_BITS
+
+# Worker state, set once per process by init_worker.
+_BASE: dict = {}
+_OPTIONS: dict = {}
+
+
+def parse_values(text: str) -> list[int]:
+    values: list[int] = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ".." in part:
+            lo, hi = part.split("..", 1)
+            values.extend(range(int(lo), int(hi) + 1))
+        else:
+            values.append(int(part))
+    if not values:
+        raise ValueError(f"no values in '{text}'")
+    return values
+
+
+def parse_grid(items: list[str]) -> dict[str, list[int]]:
+    grid: dict[str, list[int]] = {}
+    for item in items:
+        name, sep, values = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"expected NAME=VALUES, got '{item}'")
+        grid[name.strip()] = parse_values(values)
+    return grid
+
+
+def defined_names(spec: dict) -> tuple[set[str], set[str]]:
+    # (operand kinds, modifier / operand flag names) that a grid axis may refer to.
+    mods = set(spec.get("global_modifier_defs") or {}) | set(spec.get("global_oprnd_flag_defs") or {})
+
+    def walk(obj: dict) -> None:
+        mods.update(obj.get("local_modifier_defs") or {})
+        for _, form in v2.v1.iter_forms(obj.get("forms")):
+            walk(form)
+
+    for inst in (spec.get("instructions") or {}).values():
+        walk(inst)
+    return set(spec.get("operand_width_bits") or {}), mods
+
+
+def override_defs(defs: dict | None, bits: dict[str, int]) -> dict | None:
+    if not defs or not any(name in defs for name in bits):
+        return defs
+    out = dict(defs)
+    for name, value in bits.items():
+        if name in out:
+            out[name] = dict(out[name], bits=value)
+    return out
+
+
+def override_node(obj: dict, bits: dict[str, int]) -> dict:
+    # Copy `obj` only if a local_modifier_defs in it or below changes.
+    new = obj
+    local = override_defs(obj.get("local_modifier_defs"), bits)
+    if local is not obj.get("local_modifier_defs"):
+        new = dict(obj, local_modifier_defs=local)
+    forms = obj.get("forms")
+    if isinstance(forms, dict):
+        new_forms = {k: override_node(f, bits) for k, f in forms.items()}
+        if any(new_forms[k] is not forms[k] for k in forms):
+            new = dict(new, forms=new_forms)
+    elif isinstance(forms, list):
+        new_forms = [override_node(f, bits) for f in forms]
+        if any(a is not b for a, b in zip(new_forms, forms)):
+            new = dict(new, forms=new_forms)
+    return new
+
+
+def apply_overrides(base: dict, point: dict[str, int]) -> dict:
+    kinds = set(base.get("operand_width_bits") or {})
+    widths = {k: v for k, v in point.items() if k in kinds}
+    bits = {k: v for k, v in point.items() if k not in kinds}
+    spec = dict(base)
+    if widths:
+        spec["operand_width_bits"] = dict(base["operand_width_bits"], **widths)
+    if bits:
+        spec["global_modifier_defs"] = override_defs(base.get("global_modifier_defs"), bits)
+        spec["global_oprnd_flag_defs"] = override_defs(base.get("global_oprnd_flag_defs"), bits)
+        instructions = base.get("instructions") or {}
+        spec["instructions"] = {name: override_node(inst, bits) for name, inst in instructions.items()}
+    return spec
+
+
+def init_worker(base: dict, options: dict) -> None:
+    global _BASE, _OPTIONS
+    _BASE = base
+    _OPTIONS = options
+
+
+def evaluate(point: dict[str, int]) -> dict[str, Any]:
+    t0 = time.perf_counter()
+    spec = apply_overrides(_BASE, point)
+    row: dict[str, Any] = {"point": point}
+    errors = validate_spec(spec)
+    row["errors"] = len(errors)
+    if errors:
+        row["first_error"] = errors[0]
+        row["ms"] = round((time.perf_counter() - t0) * 1e3, 2)
+        return row
+
+    leaves, statistics = v2.collect_leaves(spec)
+    if _OPTIONS["synth"] == "v2" and _OPTIONS["opcode"] == "prefix":
+        # Prefix codes change the opcode length of every leaf, so overflow is judged with them.
+        statistics["opcode"] = v2.apply_prefix_opcodes(spec, leaves, None)
+    used = {
+        leaf.key: sum(r["length"] for r in leaf.opcode_ranges) + v2.payload_bits(leaf) for leaf in leaves
+    }
+    row["encodings"] = len(leaves)
+    row["overflow"] = sorted(k for k, u in used.items() if u > INSTRUCTION_WIDTH_BITS)
+    row["max_bits"] = max(used.values(), default=0)
+    fitting = [u for u in used.values() if u <= INSTRUCTION_WIDTH_BITS]
+    row["reserved_total"] = sum(INSTRUCTION_WIDTH_BITS - u for u in fitting)
+    row["reserved_min"] = min((INSTRUCTION_WIDTH_BITS - u for u in fitting), default=None)
+    meta: dict[str, Any] = {"statistics": statistics}
+
+    if not row["overflow"]:
+        try:
+            if _OPTIONS["synth"] == "v1":
+                output = v2.v1.synthesize_encodings(spec)
+            else:
+                output = v2.synthesize_encodings(spec, _OPTIONS["budget"], _OPTIONS["branch"], _OPTIONS["opcode"])
+                stats = output["meta"]["statistics"]
+                row["shared_keys"] = [stats["fully_shared_keys"], stats["field_keys"]]
+                row["local_placements"] = stats["local_placements"]
+            meta = output["meta"]
+            reserved = [synth_bit_usage(enc)["reserved"] for enc in output["encodings"].values()]
+            row["reserved_total"] = sum(reserved)
+            row["reserved_min"] = min(reserved, default=None)
+        except ValueError as exc:
+            row["synth_error"] = str(exc)
+    space = synth_opcode_space(meta, len(leaves))
+    row["opcode_bits"] = space["opcode_bits"]
+    row["opcode_space"] = space["used_share"]
+    row["ms"] = round((time.perf_counter() - t0) * 1e3, 2)
+    return row
+
+
+def run_sweep(base: dict, grid: dict[str, list[int]], options: dict, jobs: int) -> list[dict[str, Any]]:
+    names = list(grid)
+    points = [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+    if jobs <= 1:
+        init_worker(base, options)
+        return [evaluate(p) for p in points]
+    chunksize = max(1, len(points) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(base, options)) as pool:
+        return list(pool.map(evaluate, points, chunksize=chunksize))
+
+
+def write_table(out, grid: dict[str, list[int]], rows: list[dict[str, Any]], synth: str) -> None:
+    names = list(grid)
+    head = [f"{n:>8}" for n in names] + [
+        f"{'errors':>6}", f"{'overflow':>8}", f"{'max':>4}", f"{'reserved':>8}", f"{'min':>4}", f"{'op_bits':>7}",
+        f"{'op_space':>8}",
+    ]
+    if synth == "v2":
+        head += [f"{'shared':>7}", f"{'local':>5}"]
+    out.write(" ".join(head) + "\n")
+    for row in rows:
+        cells = [f"{row['point'][n]:>8}" for n in names] + [f"{row['errors']:>6}"]
+        if row["errors"]:
+            out.write(" ".join(cells) + f"  {row['first_error']}\n")
+            continue
+        res_min = "-" if row["reserved_min"] is None else row["reserved_min"]
+        cells += [
+            f"{len(row['overflow']):>8}", f"{row['max_bits']:>4}", f"{row['reserved_total']:>8}", f"{res_min:>4}",
+            f"{row['opcode_bits']:>7}", f"{row['opcode_space']:>8.3f}",
+        ]
+        if synth == "v2":
+            shared = f"{row['shared_keys'][0]}/{row['shared_keys'][1]}" if "shared_keys" in row else "-"
+            cells += [f"{shared:>7}", f"{row.get('local_placements', '-'):>5}"]
+        line = " ".join(cells)
+        if row.get("synth_error"):
+            line += f"  {row['synth_error']}"
+        out.write(line + "\n")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep operand / modifier widths and tabulate encoding synthesis results.")
+    parser.add_argument("spec", help="Path to the base spec.jsonc")
+    parser.add_argument("--set", dest="axes", action="append", default=[], help="Grid axis NAME=VALUES (repeatable)")
+    parser.add_argument("--synth", choices=["v1", "v2"], default="v1", help="Synthesis run per point (default: v1)")
+    parser.add_argument("--opcode", choices=["fixed", "prefix"], default="fixed", help="v2 opcode mode")
+    parser.add_argument("--budget", type=int, default=200, help="v2 backtracking budget per point")
+    parser.add_argument("--branch", type=int, default=4, help="v2 candidate starts per field key")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--json", default="", help="Write all rows (incl. overflowing encoding keys) as JSON")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        base = load_jsonc(args.spec)
+        grid = parse_grid(args.axes)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    if not grid:
+        print("error: no grid axes (use --set NAME=VALUES)", file=sys.stderr)
+        return 1
+    kinds, mods = defined_names(base)
+    unknown = [n for n in grid if n not in kinds and n not in mods]
+    if unknown:
+        print(f"error: unknown operand kind / modifier: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    options = {"synth": args.synth, "opcode": args.opcode, "budget": args.budget, "branch": args.branch}
+    t0 = time.perf_counter()
+    rows = run_sweep(base, grid, options, args.jobs)
+    dt = time.perf_counter() - t0
+
+    write_table(sys.stdout, grid, rows, args.synth)
+    feasible = sum(1 for r in rows if not r["errors"] and not r["overflow"] and not r.get("synth_error"))
+    print(f"-- {len(rows)} points, {feasible} without overflow; {dt:.2f}s with {args.jobs} job(s)", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"grid": grid, "options": options, "rows": rows}, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# 用法：
+#   1) 解析 isa/ref 下抓取的 HTML 文档，生成/增量刷新结构化索引（默认写到本脚本同目录的 ref-docs.index.json.gz）：
+#        python3 isa/ref/parse_ref_docs.py build --jobs 8
+#   2) 忽略已有索引，全部重新解析：
+#        python3 isa/ref/parse_ref_docs.py build --full
+#   3) 按助记符查询（大小写不敏感）：
+#        python3 isa/ref/parse_ref_docs.py show IADD3
+#        python3 isa/ref/parse_ref_docs.py show CSET --source maxwell --json
+#
+# 说明：
+#   - 目前支持两类页面：
+#       - sm90a/html/nv_isa/*.html：每个 `instruction-desc` 块是一条变体，解析出
+#         base_name / operands / 读写关系 / distilled 语法 / key / 128-bit 编码表 / Modifier Group 表 / operand modifier 表。
+#       - Maxwell SASS/opcodes/*.htm：按 `define_opcode` 注释把 Format 里的语法行归到各助记符，
+#         并解析 `.xxx : { ... }` 形式的修饰符说明、Description 正文与 Examples。
+#   - 索引按页面记录 mtime/size；再次 build 时只重新解析变化过的页面，删除的页面会被移除。
+#   - 变化页面用进程池并行解析；索引是一个 gzip 压缩的紧凑 JSON：
+#       {"version", "pages": {relpath: {"mtime_ns", "size", "source", "records": [...]}}, "by_mnemonic": {MNEM: [[relpath, i], ...]}}
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import html
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator
+
+INDEX_VERSION = 2
+REF_ROOT = Path(__file__).resolve().parent
+DEFAULT_INDEX = REF_ROOT / "ref-docs.index.json.gz"
+
+# (source name, directory relative to REF_ROOT, glob)
+DOC_SOURCES = (
+    ("sm90a", Path("sm90a/html/nv_isa"), "*.html"),
+    ("maxwell", Path("Maxwell SASS/opcodes"), "*.htm"),
+)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_BR_RE = re.compile(r"<br\s*/?>", re.I)
+_WS_RE = re.compile(r"\s+")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Parse scraped ISA reference HTML into a structured index.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="Create or incrementally refresh the index.")
+    p.add_argument("--index", default=str(DEFAULT_INDEX), help="Index path (default: %(default)s).")
+    p.add_argument("--jobs", type=int, default=1, help="Worker processes for parsing changed pages.")
+    p.add_argument("--full", action="store_true", help="Ignore the existing index and reparse every page.")
+
+    p = sub.add_parser("show", help="Print the records for one mnemonic.")
+    p.add_argument("mnemonic", help="Mnemonic, e.g. IADD3 (case-insensitive).")
+    p.add_argument("--index", default=str(DEFAULT_INDEX), help="Index path (default: %(default)s).")
+    p.add_argument("--source", default="", help="Only records from this source (sm90a / maxwell).")
+    p.add_argument("--json", action="store_true", help="Print raw JSON records.")
+    return parser.parse_args()
+
+
+def strip_tags(fragment: str) -> str:
+    text = _TAG_RE.sub("", _COMMENT_RE.sub("", fragment))
+    return _WS_RE.sub(" ", html.unescape(text)).strip()
+
+
+def strip_tags_keep_lines(fragment: str) -> list[str]:
+    # Some Maxwell Format blocks break lines with <br> rather than newlines.
+    text = html.unescape(_TAG_RE.sub("", _BR_RE.sub("\n", _COMMENT_RE.sub("", fragment))))
+    return [line.rstrip() for line in text.splitlines()]
+
+
+# ===== sm90a nv_isa pages =====
+
+_SM90_BLOCK_RE = re.compile(r'<div class="instruction-desc">')
+_SM90_NAME_RE = re.compile(r'<span class="base-name">(.*?)</span>', re.S)
+_SM90_OPERANDS_RE = re.compile(r'<span class="operands">(.*?)</span></div>', re.S)
+_SM90_ACCESS_RE = re.compile(r'<span class="flat-operand-section"[^>]*>\s*((?:READ|WRITE)[^<]*?)\s*</span>')
+_SM90_DISTILLED_RE = re.compile(r"<p> distilled: (.*?)</p>", re.S)
+_SM90_KEY_RE = re.compile(r"<p> key: (.*?)</p>", re.S)
+_SM90_TABLE_RE = re.compile(r'(?:<p>([^<]*))?<table class="instviz">(.*?)</table>', re.S)
+_SM90_ROW_RE = re.compile(r'<tr class="([^"]*)">(.*?)</tr>', re.S)
+_SM90_CELL_RE = re.compile(r"<td([^>]*)>(.*?)</td>", re.S)
+_SM90_COLSPAN_RE = re.compile(r'colspan="(\d+)"')
+_SM90_MODGROUP_RE = re.compile(r"Modifier Group (\d+)")
+_SM90_OPMOD_RE = re.compile(r"Operand (\d+) operand modifiers")
+
+
+def parse_sm90_encoding(table: str) -> list[list[Any]]:
+    """
+    Rebuild the bit layout from an `instviz` table: rows with class "smoll" are bit-index headers, the
+    other rows hold the fields of bit 0..63 and bit 64..127 in LSB-first order.
+
+    Returns [[start, length, label, constant], ...]; runs of literal 0/1 cells are merged into one
+    `const` field whose `constant` is the value of those bits.
+    """
+    fields: list[list[Any]] = []
+    pos = 0
+    for cls, row in _SM90_ROW_RE.findall(table):
+        if cls == "smoll":
+            continue
+        for attrs, cell in _SM90_CELL_RE.findall(row):
+            span = _SM90_COLSPAN_RE.search(attrs)
+            length = int(span.group(1)) if span else 1
+            label = strip_tags(cell)
+            if label in ("0", "1") and length == 1:
+                if fields and fields[-1][2] == "const" and fields[-1][0] + fields[-1][1] == pos:
+                    fields[-1][3] |= int(label) << fields[-1][1]
+                    fields[-1][1] += 1
+                else:
+                    fields.append([pos, 1, "const", int(label)])
+            else:
+                fields.append([pos, length, label, None])
+            pos += length
+    return fields
+
+
+def parse_sm90_value_table(table: str) -> list[list[str]]:
+    # Modifier / operand-modifier tables: rows of [bit pattern, text].
+    out = []
+    for _cls, row in _SM90_ROW_RE.findall(table):
+        cells = [strip_tags(c) for _attrs, c in _SM90_CELL_RE.findall(row)]
+        if cells:
+            out.append(cells[:2] if len(cells) >= 2 else [cells[0], ""])
+    return out
+
+
+def parse_sm90_page(text: str) -> list[dict[str, Any]]:
+    starts = [m.start() for m in _SM90_BLOCK_RE.finditer(text)]
+    records = []
+    for i, lo in enumerate(starts):
+        block = text[lo : starts[i + 1] if i + 1 < len(starts) else len(text)]
+        name_m = _SM90_NAME_RE.search(block)
+        if not name_m:
+            continue
+        name = strip_tags(name_m.group(1))
+        ops_m = _SM90_OPERANDS_RE.search(block)
+        distilled_m = _SM90_DISTILLED_RE.search(block)
+        key_m = _SM90_KEY_RE.search(block)
+        encoding: list[list[Any]] = []
+        modifiers: dict[str, list[list[str]]] = {}
+        operand_modifiers: dict[str, list[list[str]]] = {}
+        for caption, table in _SM90_TABLE_RE.findall(block):
+            caption = (caption or "").strip()
+            mg = _SM90_MODGROUP_RE.search(caption)
+            om = _SM90_OPMOD_RE.search(caption)
+            if mg:
+                modifiers[mg.group(1)] = parse_sm90_value_table(table)
+            elif om:
+                operand_modifiers[om.group(1)] = parse_sm90_value_table(table)
+            elif not encoding:
+                encoding = parse_sm90_encoding(table)
+        records.append(
+            {
+                "mnemonic": name.split(".", 1)[0],
+                "name": name,
+                "operands": strip_tags(ops_m.group(1)) if ops_m else "",
+                "access": [_WS_RE.sub(" ", a) for a in _SM90_ACCESS_RE.findall(block)],
+                "syntax": [strip_tags(distilled_m.group(1))] if distilled_m else [],
+                "key": strip_tags(key_m.group(1)) if key_m else "",
+                "encoding": encoding,
+                "modifiers": modifiers,
+                "operand_modifiers": operand_modifiers,
+            }
+        )
+    return records
+
+
+# ===== Maxwell SASS opcode pages =====
+
+_MX_TITLE_RE = re.compile(r"<h1>(.*?)</h1>", re.S)
+_MX_SECTION_RE = re.compile(r'<div class="(Format|Description|Examples)">(.*?)</div>', re.S)
+# A few pages (opIMADSP) have no <div class="Format">; their Format block is the <pre> under the heading.
+_MX_FORMAT_FALLBACK_RE = re.compile(r"<h2>Format:</h2>(.*?)(?=<h2>|<div class=)", re.S)
+# The first syntax line of a Format block can carry a "<pre>SPA 5.0:<br>" (or "<br><br>") prefix.
+_MX_SYNTAX_RE = re.compile(
+    r"^(?:<pre>)?(?:SPA [\d.]+:)?(?:<br>)*(<code>.*</code>)"
+    r"\s*<!-- SUMMARY_TABLE_INFO \{ define_opcode => \"([^\"]+)\" \} -->",
+    re.M,
+)
+_MX_MODIFIER_RE = re.compile(r"^ {1,4}(\.[\w.]+)\s*(?::\s*)+(.*)$")
+_MX_OPTIONS_RE = re.compile(r"\{([^}]*)\}")
+
+
+def parse_maxwell_modifiers(lines: list[str]) -> list[dict[str, Any]]:
+    """
+    `.name : { .A*, .B }  text` entries from the Format block; deeper-indented lines that follow are folded
+    into the entry's text. `*` marks the default option and is kept on the option string.
+    """
+    out: list[dict[str, Any]] = []
+    cur: dict[str, Any] | None = None
+    for line in lines:
+        m = _MX_MODIFIER_RE.match(line)
+        if m:
+            rest = m.group(2)
+            opts_m = _MX_OPTIONS_RE.search(rest)
+            options = [o.strip() for o in opts_m.group(1).split(",") if o.strip()] if opts_m else []
+            text = (rest[opts_m.end() :] if opts_m else rest).strip()
+            cur = {"name": m.group(1), "options": options, "text": text}
+            out.append(cur)
+        elif cur is not None and line.startswith("     ") and line.strip():
+            # Wrapped option lists ("{ .F, .LT, ... }" over several lines) are split out below.
+            cur["text"] = (cur["text"] + " " + line.strip()).strip()
+        else:
+            cur = None
+    for entry in out:
+        if not entry["options"] and entry["text"].startswith("{") and "}" in entry["text"]:
+            inner, _, tail = entry["text"][1:].partition("}")
+            entry["options"] = [o.strip() for o in re.split(r"[,\s]+", inner) if o.strip().startswith(".")]
+            entry["text"] = tail.strip()
+    return out
+
+
+def parse_maxwell_page(text: str) -> list[dict[str, Any]]:
+    sections = {name: body for name, body in _MX_SECTION_RE.findall(text)}
+    fmt = sections.get("Format")
+    if fmt is None:
+        fallback_m = _MX_FORMAT_FALLBACK_RE.search(text)
+        fmt = fallback_m.group(1) if fallback_m else ""
+    syntax: dict[str, list[str]] = {}
+    for code, opcode in _MX_SYNTAX_RE.findall(fmt):
+        syntax.setdefault(opcode, []).append(strip_tags(code))
+    if not syntax:
+        return []
+    title_m = _MX_TITLE_RE.search(text)
+    title = strip_tags(title_m.group(1)) if title_m else ""
+    modifiers = parse_maxwell_modifiers(strip_tags_keep_lines(_MX_SYNTAX_RE.sub("", fmt)))
+    description = strip_tags(sections.get("Description", ""))
+    examples = [ln.strip() for ln in strip_tags_keep_lines(sections.get("Examples", "")) if ln.strip()]
+    return [
+        {
+            "mnemonic": opcode,
+            "name": opcode,
+            "title": title,
+            "syntax": lines,
+            "modifiers": modifiers,
+            "description": description,
+            "examples": examples,
+        }
+        for opcode, lines in syntax.items()
+    ]
+
+
+PAGE_PARSERS = {"sm90a": parse_sm90_page, "maxwell": parse_maxwell_page}
+
+
+def parse_page(job: tuple[str, str]) -> tuple[str, list[dict[str, Any]]]:
+    # Worker entry point: (source, absolute path) -> (relpath, records).
+    source, path = job
+    text = Path(path).read_text(encoding="utf-8", errors="replace")
+    return str(Path(path).relative_to(REF_ROOT)), PAGE_PARSERS[source](text)
+
+
+# ===== index =====
+
+
+def iter_doc_pages() -> Iterator[tuple[str, Path]]:
+    for source, rel_dir, pattern in DOC_SOURCES:
+        for path in sorted((REF_ROOT / rel_dir).glob(pattern)):
+            yield source, path
+
+
+def load_index(path: Path) -> dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(path: Path, index: dict[str, Any]) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_by_mnemonic(pages: dict[str, dict[str, Any]]) -> dict[str, list[list[Any]]]:
+    by_mnemonic: dict[str, list[list[Any]]] = {}
+    for rel in sorted(pages):
+        for i, rec in enumerate(pages[rel]["records"]):
+            by_mnemonic.setdefault(rec["mnemonic"].upper(), []).append([rel, i])
+    return dict(sorted(by_mnemonic.items()))
+
+
+def refresh_index(old: dict[str, Any] | None, jobs: int) -> tuple[dict[str, Any], dict[str, int]]:
+    old_pages = (old or {}).get("pages", {}) if (old or {}).get("version") == INDEX_VERSION else {}
+    pages: dict[str, dict[str, Any]] = {}
+    todo: list[tuple[str, str]] = []
+    stat_of: dict[str, tuple[str, int, int]] = {}
+    for source, path in iter_doc_pages():
+        rel = str(path.relative_to(REF_ROOT))
+        st = path.stat()
+        stat_of[rel] = (source, st.st_mtime_ns, st.st_size)
+        prev = old_pages.get(rel)
+        if prev and prev["mtime_ns"] == st.st_mtime_ns and prev["size"] == st.st_size:
+            pages[rel] = prev
+        else:
+            todo.append((source, str(path)))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = list(pool.map(parse_page, todo, chunksize=max(1, len(todo) // (jobs * 4))))
+    else:
+        parsed = [parse_page(job) for job in todo]
+    for rel, records in parsed:
+        source, mtime_ns, size = stat_of[rel]
+        pages[rel] = {"mtime_ns": mtime_ns, "size": size, "source": source, "records": records}
+
+    pages = dict(sorted(pages.items()))
+    counts = {
+        "pages": len(pages),
+        "parsed": len(parsed),
+        "reused": len(pages) - len(parsed),
+        "removed": len(set(old_pages) - set(pages)),
+    }
+    return {"version": INDEX_VERSION, "pages": pages, "by_mnemonic": build_by_mnemonic(pages)}, counts
+
+
+def lookup(index: dict[str, Any], mnemonic: str, source: str = "") -> list[tuple[str, dict[str, Any]]]:
+    out = []
+    for rel, i in index["by_mnemonic"].get(mnemonic.upper(), []):
+        page = index["pages"][rel]
+        if source and page["source"] != source:
+            continue
+        out.append((rel, page["records"][i]))
+    return out
+
+
+def fmt_record(rel: str, rec: dict[str, Any]) -> str:
+    lines = [f"## {rec['name']}  ({rel})"]
+    if rec.get("title"):
+        lines.append(f"- title: {rec['title']}")
+    for s in rec.get("syntax", []):
+        lines.append(f"- syntax: `{s}`")
+    if rec.get("key"):
+        lines.append(f"- key: `{rec['key']}`  operands: {rec.get('operands')}  access: {rec.get('access')}")
+    if rec.get("encoding"):
+        parts = [
+            f"[{s + n - 1}:{s}]={label if c is None else c}" for s, n, label, c in rec["encoding"] if label != "0"
+        ]
+        lines.append(f"- encoding: {' '.join(parts)}")
+    mods = rec.get("modifiers")
+    if isinstance(mods, dict):
+        for g, table in mods.items():
+            lines.append(f"- modifier group {g}: " + ", ".join(f"{b}:{t or '-'}" for b, t in table))
+        for opi, table in (rec.get("operand_modifiers") or {}).items():
+            lines.append(f"- operand {opi} modifiers: " + ", ".join(f"{b}:{t or '-'}" for b, t in table))
+    elif mods:
+        for m in mods:
+            opts = f"{{{', '.join(m['options'])}}} " if m["options"] else ""
+            lines.append(f"- {m['name']}: {opts}{m['text']}".rstrip())
+    for ex in rec.get("examples", []):
+        lines.append(f"- example: `{ex}`")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    args = parse_args()
+    index_path = Path(args.index)
+    if args.cmd == "build":
+        old = None
+        if index_path.exists() and not args.full:
+            old = load_index(index_path)
+        index, counts = refresh_index(old, args.jobs)
+        save_index(index_path, index)
+        print(
+            f"Wrote {index_path}: {counts['pages']} pages ({counts['parsed']} parsed, {counts['reused']} reused, "
+            f"{counts['removed']} removed), {len(index['by_mnemonic'])} mnemonics"
+        )
+        return 0
+
+    if not index_path.exists():
+        print(f"error: index not found: {index_path} (run `build` first)", file=sys.stderr)
+        return 1
+    found = lookup(load_index(index_path), args.mnemonic, args.source)
+    if not found:
+        print(f"no records for {args.mnemonic!r}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps([{"page": rel, **rec} for rel, rec in found], indent=2, ensure_ascii=False))
+    else:
+        print("\n\n".join(fmt_record(rel, rec) for rel, rec in found))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,17 +10,25 @@
 # 说明：
 #   - 输出是 Markdown 文本，方便直接保存成 .md 阅读。
 #   - ranges.inst 是 16 字节(32 hex)的小端序表示；ranges.ranges 的 start 是从最低有效位开始计数的 bit index。
+#   - 输入按 entry 流式读取（iter_entry_spans），每个 entry 只解码一次（EntryRecord），同时喂给报告计数器和
+#     --per-instruction；逐指令摘要先写进临时文件，最后按 key 排序拷贝出来，内存里只留 (key, 偏移, 长度)。
+#   - 逐指令摘要可以用多进程并行生成（输出顺序不变）：
+#        python3 analyze_ref_encoding.py --per-instruction --jobs 8 --out report.md
 
 from __future__ import annotations
 
 import argparse
+import bisect
+import io
 import json
 import re
 import sys
-from collections import Counter, defaultdict
-from dataclasses import dataclass
+import tempfile
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import IO, Any, Iterable
+from typing import IO, Any, Iterable, Iterator
 
 
 EXPECTED_RANGE_KEYS = {
@@ -67,6 +75,12 @@ def parse_args() -> argparse.Namespace:
         default=16,
         help="Max number of entries printed for each modifiers table in the report.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for the --per-instruction section (default: 1, no pool).",
+    )
     return parser.parse_args()
 
 
@@ -78,6 +92,86 @@ def load_json(path: Path) -> dict[str, Any]:
     return data
 
 
+# ===== 流式读取 =====
+# ref-encoding.json 的顶层是一个 dict：{key: entry, ...}。下面按块读取文件，用 json.JSONDecoder.raw_decode
+# 直接在缓冲区上解析“当前这一个 entry”，因此峰值内存约等于一个 entry + 一个读块，且每个 entry 只解析一次。
+
+_WS_RE = re.compile(r"[ \t\r\n]*")
+_DECODER = json.JSONDecoder()
+
+
+class _NeedMore(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class EntrySpan:
+    key: str
+    offset: int  # 该 entry 的 value 在文件中的字节偏移
+    length: int  # value 的字节长度
+
+
+def iter_entry_spans(path: Path, *, chunk_size: int = 1 << 20) -> Iterator[tuple[EntrySpan, Any]]:
+    """
+    Incrementally parse a top-level JSON object and yield (span, decoded value) per member.
+
+    Only the current member is held in memory (plus one read chunk).
+    """
+    # newline="" keeps "\r\n" as-is, so byte offsets can be recovered by re-encoding consumed text.
+    with path.open("r", encoding="utf-8", newline="") as f:
+        buf = ""
+        pos = 0  # start of the unread tail of buf
+        base = 0  # file byte offset of buf[pos]
+        eof = False
+        started = False
+        while True:
+            try:
+                i = _WS_RE.match(buf, pos).end()
+                if not started:
+                    if i == len(buf):
+                        raise _NeedMore
+                    if buf[i] != "{":
+                        raise TypeError("Top-level JSON must be an object/dict")
+                    i = _WS_RE.match(buf, i + 1).end()
+                if buf[i : i + 1] == "}":
+                    return
+                if started and buf[i : i + 1] == ",":
+                    i = _WS_RE.match(buf, i + 1).end()
+                key, key_end = _DECODER.raw_decode(buf, i)
+                colon = _WS_RE.match(buf, key_end).end()
+                if colon == len(buf):
+                    raise _NeedMore
+                if not isinstance(key, str) or buf[colon] != ":":
+                    raise ValueError(f"Expected a string key and ':' near byte offset {base}")
+                vstart = _WS_RE.match(buf, colon + 1).end()
+                value, vend = _DECODER.raw_decode(buf, vstart)
+                # A number cut by the buffer end ("1.", "-3e") still decodes; require its terminator.
+                after = _WS_RE.match(buf, vend).end()
+                if buf[after : after + 1] not in (",", "}"):
+                    raise _NeedMore
+            except (_NeedMore, json.JSONDecodeError):  # the member is not fully buffered yet
+                if eof:
+                    raise ValueError(f"Truncated or invalid JSON near byte offset {base}") from None
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                # Drop the consumed prefix only when refilling, not after every member.
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            started = True
+            voffset = base + len(buf[pos:vstart].encode("utf-8"))
+            vlength = len(buf[vstart:vend].encode("utf-8"))
+            yield EntrySpan(key, voffset, vlength), value
+            base = voffset + vlength
+            pos = vend
+
+
+def iter_ref_entries(path: Path) -> Iterator[tuple[str, dict[str, Any]]]:
+    for span, v in iter_entry_spans(path):
+        yield span.key, v
+
+
 def inst_int_from_hex_le(inst_hex: str) -> int:
     raw = bytes.fromhex(inst_hex)
     if len(raw) != 16:
@@ -168,6 +262,16 @@ def describe_operand_atom(atom: dict[str, Any]) -> str:
 
 
 def ensure_partition_128(ranges: list[dict[str, Any]]) -> str | None:
+    # Fast path: sorted by start, a valid partition is a gap-free chain 0 -> 128.
+    end = 0
+    for start, length in sorted((int(r["start"]), int(r["length"])) for r in ranges):
+        if start != end or length <= 0:
+            break
+        end += length
+    else:
+        if end == 128:
+            return None
+    # Slow path only to describe the first problem.
     used = [None] * 128
     for r in ranges:
         start = int(r["start"])
@@ -184,6 +288,60 @@ def ensure_partition_128(ranges: list[dict[str, Any]]) -> str | None:
     return None
 
 
+CONTROL_TYPES = ("predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse")
+
+
+@dataclass(frozen=True)
+class EntryRecord:
+    """
+    One entry decoded once: `ranges.inst` as an int, ranges grouped by type (file order kept inside
+    each group), and the flattened operand atoms that `operand_index` refers to.
+
+    `inst` is None (and `inst_error` says why) when `ranges.inst` is not 16 bytes of hex.
+    """
+
+    key: str
+    v: dict[str, Any]
+    inst: int | None
+    inst_error: str | None
+    ranges: list[dict[str, Any]]
+    by_type: dict[str, list[dict[str, Any]]]
+    atoms: list[tuple[str, dict[str, Any]]]
+
+    def of_type(self, t: str) -> list[dict[str, Any]]:
+        return self.by_type.get(t, [])
+
+    def value(self, r: dict[str, Any]) -> int:
+        if self.inst is None:
+            raise ValueError(f"{self.key}: {self.inst_error}")
+        return extract_bits(self.inst, int(r["start"]), int(r["length"]))
+
+    def atom_desc(self, opi: int) -> str:
+        if 0 <= opi < len(self.atoms):
+            return describe_operand_atom(self.atoms[opi][1])
+        return "(unknown atom_index)"
+
+
+def decode_entry(key: str, v: dict[str, Any]) -> EntryRecord:
+    rr = v["ranges"]["ranges"]
+    by_type: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for r in rr:
+        by_type[r["type"]].append(r)
+    try:
+        inst, inst_error = inst_int_from_hex_le(v["ranges"]["inst"]), None
+    except (TypeError, ValueError) as e:
+        inst, inst_error = None, str(e)
+    return EntryRecord(
+        key=key,
+        v=v,
+        inst=inst,
+        inst_error=inst_error,
+        ranges=rr,
+        by_type=dict(by_type),
+        atoms=flatten_operands(v["parsed"]["operands"]),
+    )
+
+
 @dataclass(frozen=True)
 class DecodedModifierField:
     start: int
@@ -194,17 +352,15 @@ class DecodedModifierField:
     selected_tokens: tuple[str, ...]
 
 
-def decode_modifier_fields(v: dict[str, Any]) -> list[DecodedModifierField]:
-    inst = inst_int_from_hex_le(v["ranges"]["inst"])
-    mod_fields = [r for r in v["ranges"]["ranges"] if r["type"] == "modifier"]
-    mod_fields.sort(key=lambda r: (int(r["start"]), int(r["length"])))
+def decode_modifier_fields(rec: EntryRecord) -> list[DecodedModifierField]:
+    mod_fields = sorted(rec.of_type("modifier"), key=lambda r: (int(r["start"]), int(r["length"])))
 
-    tables: list[list[list[Any]]] = v.get("modifiers") or []
+    tables: list[list[list[Any]]] = rec.v.get("modifiers") or []
     decoded: list[DecodedModifierField] = []
     for i, r in enumerate(mod_fields):
         start = int(r["start"])
         length = int(r["length"])
-        val = extract_bits(inst, start, length)
+        val = rec.value(r)
         table = tables[i] if i < len(tables) else []
         selected_text = dict(table).get(val) if table else None
         tokens = tuple(split_modifier_tokens(selected_text)) if selected_text else tuple()
@@ -221,59 +377,51 @@ def decode_modifier_fields(v: dict[str, Any]) -> list[DecodedModifierField]:
     return decoded
 
 
-def pick_representative_instruction(data: dict[str, Any]) -> str:
+def representative_score(v: dict[str, Any]) -> int:
     # Heuristic: prefer an instruction that exercises more features so the report has a concrete example.
-    best_key = ""
-    best_score = -1
-    for key, v in data.items():
-        rr = v.get("ranges", {}).get("ranges", [])
-        types = {r.get("type") for r in rr if isinstance(r, dict)}
-        score = 0
-        for t in [
-            "operand",
-            "operand_flag",
-            "operand_modifier",
-            "modifier",
-            "flag",
-            "predicate",
-            "stall",
-            "reuse",
-            "b-mask",
-        ]:
-            score += 2 if t in types else 0
-        score += 1 if (v.get("operand_interactions") is not None) else 0
-        score += 1 if (v.get("opcode_modis") or []) else 0
-        score += 1 if (v.get("operand_modifiers") and len(v.get("operand_modifiers")) > 0) else 0
-        score += 1 if (v.get("modifiers") and len(v.get("modifiers")) > 0) else 0
-        if score > best_score or (score == best_score and key < best_key):
-            best_key = key
-            best_score = score
-    return best_key
-
-
-def decode_control_fields(v: dict[str, Any]) -> dict[str, tuple[int, int, int] | None]:
+    rr = v.get("ranges", {}).get("ranges", [])
+    types = {r.get("type") for r in rr if isinstance(r, dict)}
+    score = 0
+    for t in [
+        "operand",
+        "operand_flag",
+        "operand_modifier",
+        "modifier",
+        "flag",
+        "predicate",
+        "stall",
+        "reuse",
+        "b-mask",
+    ]:
+        score += 2 if t in types else 0
+    score += 1 if (v.get("operand_interactions") is not None) else 0
+    score += 1 if (v.get("opcode_modis") or []) else 0
+    score += 1 if (v.get("operand_modifiers") and len(v.get("operand_modifiers")) > 0) else 0
+    score += 1 if (v.get("modifiers") and len(v.get("modifiers")) > 0) else 0
+    return score
+
+
+def decode_control_fields(rec: EntryRecord) -> dict[str, tuple[int, int, int] | None]:
     # Returns name -> (start,length,value) or None if not present.
-    inst = inst_int_from_hex_le(v["ranges"]["inst"])
-    rr = v["ranges"]["ranges"]
     out: dict[str, tuple[int, int, int] | None] = {}
-    for t in ["predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse"]:
-        r = next((x for x in rr if x["type"] == t), None)
-        if r is None:
+    for t in CONTROL_TYPES:
+        found = rec.of_type(t)
+        if not found:
             out[t] = None
             continue
-        start = int(r["start"])
-        length = int(r["length"])
-        out[t] = (start, length, extract_bits(inst, start, length))
+        r = found[0]
+        out[t] = (int(r["start"]), int(r["length"]), rec.value(r))
     return out
 
 
 def summarize_instruction(
     out: IO[str],
-    key: str,
-    v: dict[str, Any],
+    rec: EntryRecord,
     *,
     max_table_items: int,
 ) -> None:
+    key = rec.key
+    v = rec.v
     out.write(f"\n### `{key}`\n\n")
     out.write(
         "这部分把“某一条指令”的结构用更接近人类阅读的方式摊开：\n"
@@ -285,19 +433,16 @@ def summarize_instruction(
     out.write(f"- `parsed.predicate`: `{v['parsed'].get('predicate')}`\n")
     out.write(f"- `parsed.modifiers`: `{v['parsed'].get('modifiers')}`\n")
     out.write(f"- `opcode_modis`: `{v.get('opcode_modis')}`\n")
-
-    inst_hex = v["ranges"]["inst"]
-    out.write(f"- `ranges.inst` (hex, 16B LE): `{inst_hex}`\n")
+    out.write(f"- `ranges.inst` (hex, 16B LE): `{v['ranges']['inst']}`\n")
 
     # Ranges summary
-    rr = v["ranges"]["ranges"]
-    type_counts = Counter(r["type"] for r in rr)
-    out.write(f"- `ranges.ranges`: {len(rr)} fields, types={dict(type_counts)}\n")
+    type_counts = Counter(r["type"] for r in rec.ranges)
+    out.write(f"- `ranges.ranges`: {len(rec.ranges)} fields, types={dict(type_counts)}\n")
 
     # Control fields decoded
-    ctrl = decode_control_fields(v)
+    ctrl = decode_control_fields(rec)
     out.write("- control/schedule fields decoded from `ranges.inst`:\n")
-    for t in ["predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse"]:
+    for t in CONTROL_TYPES:
         info = ctrl.get(t)
         if info is None:
             out.write(f"  - {t}: (not present)\n")
@@ -306,8 +451,7 @@ def summarize_instruction(
             out.write(f"  - {t}: {fmt_bits(start, length)} = {value}\n")
 
     # Constants (highlight opcode-like field)
-    inst = inst_int_from_hex_le(inst_hex)
-    constants = [r for r in rr if r["type"] == "constant"]
+    constants = rec.of_type("constant")
     opcode12 = next(
         (r for r in constants if int(r["start"]) == 0 and int(r["length"]) == 12),
         None,
@@ -318,11 +462,8 @@ def summarize_instruction(
             prefix = int(key.split(".", 1)[0])
         except Exception:  # noqa: BLE001
             prefix = None
-        start = int(opcode12["start"])
-        length = int(opcode12["length"])
-        val = extract_bits(inst, start, length)
         out.write(
-            f"- opcode-like `constant@start=0,length=12`: {fmt_bits(start, length)} = {val}"
+            f"- opcode-like `constant@start=0,length=12`: {fmt_bits(0, 12)} = {rec.value(opcode12)}"
             + (f" (key prefix={prefix})" if prefix is not None else "")
             + "\n"
         )
@@ -330,15 +471,13 @@ def summarize_instruction(
     nonzero = []
     zero_count = 0
     for r in sorted(constants, key=lambda x: int(x["start"])):
-        start = int(r["start"])
-        length = int(r["length"])
-        val = extract_bits(inst, start, length)
+        val = rec.value(r)
         if val == 0:
             zero_count += 1
             continue
         if opcode12 is not None and r is opcode12:
             continue
-        nonzero.append((start, length, val))
+        nonzero.append((int(r["start"]), int(r["length"]), val))
     out.write(f"- constants: total={len(constants)}, zeros={zero_count}, nonzero(except opcode12)={len(nonzero)}\n")
     if nonzero:
         out.write("  - nonzero constants:\n")
@@ -359,16 +498,14 @@ def summarize_instruction(
         else:
             out.write(f"  - op{i}: {op.get('type') if isinstance(op, dict) else type(op).__name__} {op}\n")
 
-    atoms = flatten_operands(operands)
-    out.write(f"- operand atoms (flattened, used by `operand_index`, {len(atoms)}):\n")
-    for idx, (path, atom) in enumerate(atoms):
+    out.write(f"- operand atoms (flattened, used by `operand_index`, {len(rec.atoms)}):\n")
+    for idx, (path, atom) in enumerate(rec.atoms):
         out.write(f"  - atom#{idx} ({path}): {describe_operand_atom(atom)}\n")
 
     # Operand bit segments
     by_operand: dict[int, list[tuple[int, int]]] = defaultdict(list)
-    for r in rr:
-        if r["type"] == "operand":
-            by_operand[int(r["operand_index"])].append((int(r["start"]), int(r["length"])))
+    for r in rec.of_type("operand"):
+        by_operand[int(r["operand_index"])].append((int(r["start"]), int(r["length"])))
     for idx in by_operand:
         by_operand[idx].sort()
     if by_operand:
@@ -377,42 +514,32 @@ def summarize_instruction(
             segs = by_operand[idx]
             total = sum(l for _, l in segs)
             seg_str = ", ".join(f"{fmt_bits(s, l)}" for s, l in segs)
-            atom_desc = (
-                describe_operand_atom(atoms[idx][1]) if 0 <= idx < len(atoms) else "(unknown atom_index)"
-            )
-            out.write(f"  - operand_index #{idx} ({atom_desc}): total={total}b, segments={seg_str}\n")
+            out.write(f"  - operand_index #{idx} ({rec.atom_desc(idx)}): total={total}b, segments={seg_str}\n")
 
     # Flags / operand_flags
-    flags = [r for r in rr if r["type"] == "flag"]
+    flags = sorted(rec.of_type("flag"), key=lambda r: int(r["start"]))
     if flags:
-        flags.sort(key=lambda r: int(r["start"]))
         out.write(
             "- flags (`type=flag`, 1-bit):\n"
             "  - 这些通常对应 disasm 里额外出现/消失的 token（例如 `FTZ`），`ranges.inst` 的该 bit=1 表示启用。\n"
         )
         for r in flags:
-            start = int(r["start"])
-            length = int(r["length"])
-            out.write(f"  - {r['name']}: {fmt_bits(start, length)} = {extract_bits(inst, start, length)}\n")
+            out.write(f"  - {r['name']}: {fmt_bits(int(r['start']), int(r['length']))} = {rec.value(r)}\n")
 
-    op_flags = [r for r in rr if r["type"] == "operand_flag"]
+    op_flags = sorted(rec.of_type("operand_flag"), key=lambda r: (int(r["operand_index"]), int(r["start"])))
     if op_flags:
-        op_flags.sort(key=lambda r: (int(r["operand_index"]), int(r["start"])))
         out.write(
             "- operand flags (`type=operand_flag`, 1-bit):\n"
             "  - 这些是“挂在某个操作数上的一元修饰/开关”（例如取反/取负/取绝对值）。\n"
         )
         for r in op_flags:
-            start = int(r["start"])
-            length = int(r["length"])
             opi = int(r["operand_index"])
-            atom_desc = describe_operand_atom(atoms[opi][1]) if 0 <= opi < len(atoms) else "(unknown atom_index)"
             out.write(
-                f"  - operand_index #{opi} ({atom_desc}) {r['name']}: {fmt_bits(start, length)} = {extract_bits(inst, start, length)}\n"
+                f"  - operand_index #{opi} ({rec.atom_desc(opi)}) {r['name']}: {fmt_bits(int(r['start']), int(r['length']))} = {rec.value(r)}\n"
             )
 
     # Modifiers (variable) and how they decode in this sample inst
-    decoded_mods = decode_modifier_fields(v)
+    decoded_mods = decode_modifier_fields(rec)
     if decoded_mods:
         out.write(
             "- modifier fields (`type=modifier`) decoded from `ranges.inst`:\n"
@@ -428,17 +555,16 @@ def summarize_instruction(
             )
 
     # Operand modifiers (variable)
-    op_mod_fields = [r for r in rr if r["type"] == "operand_modifier"]
+    op_mod_fields = rec.of_type("operand_modifier")
     if op_mod_fields:
         out.write("- operand modifier fields (`type=operand_modifier`) decoded from `ranges.inst`:\n")
         for r in sorted(op_mod_fields, key=lambda x: (int(x["operand_index"]), int(x["start"]))):
             opi = int(r["operand_index"])
             table = (v.get("operand_modifiers") or {}).get(str(opi), [])
-            val = extract_bits(inst, int(r["start"]), int(r["length"]))
+            val = rec.value(r)
             txt = dict(table).get(val) if table else None
-            atom_desc = describe_operand_atom(atoms[opi][1]) if 0 <= opi < len(atoms) else "(unknown atom_index)"
             out.write(
-                f"  - operand_index #{opi} ({atom_desc}) {fmt_bits(int(r['start']), int(r['length']))} = {val}"
+                f"  - operand_index #{opi} ({rec.atom_desc(opi)}) {fmt_bits(int(r['start']), int(r['length']))} = {val}"
                 f" -> {txt!r} | table: {fmt_table(table, max_table_items) if table else '(missing/empty)'}\n"
             )
 
@@ -458,375 +584,504 @@ def summarize_instruction(
                     parts.append(repr(it))
                     continue
                 opi = int(it[0])
-                atom_desc = describe_operand_atom(atoms[opi][1]) if 0 <= opi < len(atoms) else "(unknown atom_index)"
-                parts.append(f"operand_index #{opi} ({atom_desc}) {it[1]} x{it[2]}")
+                parts.append(f"operand_index #{opi} ({rec.atom_desc(opi)}) {it[1]} x{it[2]}")
             out.write(f"  - {cat}: {', '.join(parts)}\n")
 
 
-def main() -> int:
-    args = parse_args()
-    input_path = Path(args.input)
-    data = load_json(input_path)
+def render_sections(recs: list[EntryRecord], max_table_items: int) -> list[str]:
+    # Worker entry point for --jobs: render a batch of already-decoded entries.
+    sections = []
+    for rec in recs:
+        buf = io.StringIO()
+        summarize_instruction(buf, rec, max_table_items=max_table_items)
+        sections.append(buf.getvalue())
+    return sections
 
-    out: IO[str]
-    if args.out == "-":
-        out = sys.stdout
-    else:
-        out = Path(args.out).open("w", encoding="utf-8")
 
-    try:
-        # ===== Top-level schema =====
-        out.write("# ref-encoding.json 格式分析报告\n\n")
-        out.write(f"- input: `{str(input_path)}`\n")
-        out.write(f"- instructions: {len(data)}\n\n")
-
-        out.write("## 阅读指南（先看这段）\n\n")
-        out.write(
-            "- 这份报告的目标：把 `ref-encoding.json` 的“公共格式/字段语义/选项关系”解释清楚，方便你做进一步解析或生成代码。\n"
-        )
-        out.write(
-            "- 最重要的概念：每条指令都是 **128-bit**，`ranges.ranges` 把 0..127 bit **完整切分**成若干字段；每个字段有 `type/start/length/...`。\n"
-        )
-        out.write(
-            "- `start` 的含义：从 **最低有效位 (LSB)** 开始计数的 bit index；因此解析一个字段值就是：`value = (inst >> start) & ((1<<length)-1)`。\n"
-        )
-        out.write(
-            "- `ranges.inst` 的含义：16 字节的 hex 字符串，按 **little-endian** 解释成 128-bit 整数后，再用上面的 `start/length` 取字段值。\n"
-        )
-        out.write(
-            "- 如果你只想快速知道有哪些字段类型：直接跳到“`type` 包含哪些选项”。\n"
-        )
-        out.write(
-            "- 如果你想看某条指令下各种选项怎么互动：用 `--per-instruction` 输出“逐指令摘要”。\n\n"
-        )
+class SectionSpool:
+    """
+    --per-instruction sections rendered while the entries stream by.
 
-        rep_key = pick_representative_instruction(data)
-        if rep_key:
-            rep = data[rep_key]
-            rep_types = Counter(r["type"] for r in rep["ranges"]["ranges"])
-            out.write("## 快速例子（用一条“功能比较全”的指令说明结构）\n\n")
-            out.write(f"- example key: `{rep_key}`\n")
-            out.write(f"- example disasm: `{rep.get('disasm')}`\n")
-            out.write(
-                "- 你可以把它理解为：`ranges.ranges` 定义了 bit-layout；`parsed` 给出语法层面的指令/操作数；"
-                "`modifiers/flags/operand_*` 等字段共同决定 disasm 里会出现哪些 token。\n"
-            )
-            out.write(f"- example field types: {dict(rep_types)}\n\n")
+    Sections are appended to a temporary file and only (key, offset, length) stays in memory;
+    `write_sorted` copies them back out in key order through the one open spool handle.
+    With --limit, entries that can no longer be among the first `limit` keys are not rendered.
+    With --jobs, batches of records are rendered in a process pool (a few batches in flight).
+    """
 
-        instr_keysets = Counter(tuple(sorted(v.keys())) for v in data.values())
-        out.write("## 顶层结构（每条指令对象的字段）\n\n")
-        out.write(
-            "- 顶层 JSON 是一个 dict：key 是类似 `528.IADD3_R_P_P_R_R_R` 的字符串；value 是该“指令变体”的结构描述。\n"
-        )
-        out.write(f"- unique keysets: {len(instr_keysets)}\n")
-        for ks, count in instr_keysets.most_common(5):
-            out.write(f"- {count}x keys={list(ks)}\n")
+    BATCH = 32
+
+    def __init__(self, *, max_table_items: int, limit: int, jobs: int) -> None:
+        self.max_table_items = max_table_items
+        self.limit = limit
+        self.smallest: list[str] = []  # the `limit` smallest keys seen so far
+        self.file = tempfile.TemporaryFile()
+        self.index: list[tuple[str, int, int]] = []
+        self.pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        self.max_pending = 2 * jobs
+        self.batch: list[EntryRecord] = []
+        self.pending: deque[tuple[list[str], Future]] = deque()
+
+    def __enter__(self) -> SectionSpool:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        self.file.close()
+
+    def wants(self, key: str) -> bool:
+        if not self.limit:
+            return True
+        if len(self.smallest) == self.limit and key >= self.smallest[-1]:
+            return False
+        bisect.insort(self.smallest, key)
+        del self.smallest[self.limit :]
+        return True
+
+    def add(self, rec: EntryRecord) -> None:
+        if not self.wants(rec.key):
+            return
+        if self.pool is None:
+            self._write(rec.key, render_sections([rec], self.max_table_items)[0])
+            return
+        self.batch.append(rec)
+        if len(self.batch) >= self.BATCH:
+            self._submit()
+
+    def _submit(self) -> None:
+        keys = [rec.key for rec in self.batch]
+        self.pending.append((keys, self.pool.submit(render_sections, self.batch, self.max_table_items)))
+        self.batch = []
+        while len(self.pending) > self.max_pending:
+            self._collect()
+
+    def _collect(self) -> None:
+        keys, fut = self.pending.popleft()
+        for key, section in zip(keys, fut.result()):
+            self._write(key, section)
+
+    def _write(self, key: str, section: str) -> None:
+        data = section.encode("utf-8")
+        self.index.append((key, self.file.tell(), len(data)))
+        self.file.write(data)
+
+    def write_sorted(self, out: IO[str]) -> int:
+        # Returns the number of sections written.
+        if self.batch:
+            self._submit()
+        while self.pending:
+            self._collect()
+        self.index.sort()
+        if self.limit:
+            del self.index[self.limit :]
+        for _key, offset, length in self.index:
+            self.file.seek(offset)
+            out.write(self.file.read(length).decode("utf-8"))
+        return len(self.index)
+
+
+@dataclass
+class ReportStats:
+    """
+    Counters for the whole-file report, accumulated one entry at a time.
 
-        out.write("\n### 字段之间的关键关系\n\n")
-        out.write(
-            "- `parsed.base_name`：指令基本名字（例如 `IADD3`）。\n"
-            "- `opcode_modis`：这条变体在“名字层面”额外附加到指令名的 token（也会体现在 `canonical_name` 里）。\n"
-            "- `canonical_name`：**严格等于** `parsed.base_name` + `opcode_modis`（用 `.` 连接）。\n"
-        )
-        ok = 0
-        for v in data.values():
-            base = v["parsed"]["base_name"]
-            opmods = v.get("opcode_modis") or []
-            expect = base + ("" if not opmods else "." + ".".join(opmods))
-            ok += 1 if v.get("canonical_name") == expect else 0
-        out.write(
-            "- 关系校验：`canonical_name == parsed.base_name + ('.' + '.'.join(opcode_modis) if opcode_modis else '')`\n"
-        )
-        out.write(f"  - {ok}/{len(data)} OK\n")
+    Nothing here keeps a reference to an entry, so memory does not grow with the input size
+    (apart from the error lists, which only hold short strings).
+    """
 
-        # ===== ranges 格式校验 =====
-        out.write("\n## ranges 字段的公共格式\n\n")
-        out.write(
-            "- `ranges` 是一个对象：\n"
-            "  - `inst`: 一个 16B 的 hex（示例编码；常用于校验/展示默认值）。\n"
-            "  - `ranges`: 一个 list，每项都是一个字段描述（`type/start/length/...`）。\n"
-        )
-        out.write(
-            "- 报告里的校验项解释：\n"
-            "  - `ranges.ranges` keyset：确认每个字段是否都长得像同一个 schema。\n"
-            "  - partition(0..127)：确认字段把 128-bit 覆盖得严丝合缝（无重叠、无空洞）。\n"
-            "  - constant vs inst：确认 `type=constant` 真的和 `ranges.inst` 的对应 bit 一致。\n\n"
-        )
-        ranges_keysets = Counter(tuple(sorted(v["ranges"].keys())) for v in data.values())
-        out.write(f"- `ranges` object keysets: {dict(ranges_keysets)}\n")
-
-        all_range_keysets = Counter()
-        type_counts = Counter()
-        type_nonnull = defaultdict(Counter)
-        type_names = defaultdict(Counter)
-        schedule_starts = defaultdict(Counter)
-        flag_name_counts = Counter()
-        operand_flag_name_counts = Counter()
-
-        partition_errors: list[tuple[str, str]] = []
-        inst_len_errors: list[tuple[str, str]] = []
-        constant_mismatch: list[tuple[str, str]] = []
-        opcode12_missing: list[str] = []
-        opcode12_mismatch_key_prefix: list[tuple[str, int, int]] = []
-
-        modifier_tables_stats = Counter()
-        modifier_table_option_multi_token = 0
-        modifier_table_option_single_token = 0
-        modifier_table_option_empty = 0
-        operand_modifier_table_option_empty = 0
-        operand_modifier_table_option_nonempty = 0
-
-        for key, v in data.items():
-            rr = v["ranges"]["ranges"]
-            all_range_keysets.update([tuple(sorted(r.keys())) for r in rr])
-            type_counts.update([r["type"] for r in rr])
-
-            # Validate partition and inst length / endianness assumptions.
-            pe = ensure_partition_128(rr)
-            if pe:
-                partition_errors.append((key, pe))
-
-            inst_hex = v["ranges"]["inst"]
+    instructions: int = 0
+    rep_key: str = ""
+    rep_score: int = -1
+    rep_disasm: Any = None
+    rep_types: dict[str, int] = field(default_factory=dict)
+    instr_keysets: Counter = field(default_factory=Counter)
+    canonical_ok: int = 0
+    ranges_keysets: Counter = field(default_factory=Counter)
+    all_range_keysets: Counter = field(default_factory=Counter)
+    type_counts: Counter = field(default_factory=Counter)
+    type_nonnull: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+    type_names: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+    schedule_starts: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+    flag_name_counts: Counter = field(default_factory=Counter)
+    operand_flag_name_counts: Counter = field(default_factory=Counter)
+    partition_errors: list[tuple[str, str]] = field(default_factory=list)
+    inst_len_errors: list[tuple[str, str]] = field(default_factory=list)
+    constant_mismatch: list[tuple[str, str]] = field(default_factory=list)
+    opcode12_missing: list[str] = field(default_factory=list)
+    opcode12_mismatch_key_prefix: list[tuple[str, int, int]] = field(default_factory=list)
+    modifier_tables_stats: Counter = field(default_factory=Counter)
+    modifier_table_option_multi_token: int = 0
+    modifier_table_option_single_token: int = 0
+    modifier_table_option_empty: int = 0
+    operand_modifier_table_option_empty: int = 0
+    operand_modifier_table_option_nonempty: int = 0
+
+    def add(self, rec: EntryRecord) -> None:
+        key, v, rr = rec.key, rec.v, rec.ranges
+        self.instructions += 1
+
+        score = representative_score(v)
+        if score > self.rep_score or (score == self.rep_score and key < self.rep_key):
+            self.rep_key = key
+            self.rep_score = score
+            self.rep_disasm = v.get("disasm")
+            self.rep_types = {t: len(group) for t, group in rec.by_type.items()}
+
+        self.instr_keysets[tuple(sorted(v.keys()))] += 1
+        base = v["parsed"]["base_name"]
+        opmods = v.get("opcode_modis") or []
+        expect = base + ("" if not opmods else "." + ".".join(opmods))
+        self.canonical_ok += 1 if v.get("canonical_name") == expect else 0
+        self.ranges_keysets[tuple(sorted(v["ranges"].keys()))] += 1
+
+        self.all_range_keysets.update([tuple(sorted(r.keys())) for r in rr])
+        self.type_counts.update({t: len(group) for t, group in rec.by_type.items()})
+
+        # Validate partition and inst length / endianness assumptions.
+        pe = ensure_partition_128(rr)
+        if pe:
+            self.partition_errors.append((key, pe))
+
+        if rec.inst_error is not None:
+            self.inst_len_errors.append((key, rec.inst_error))
+
+        constants = rec.of_type("constant")
+        # 常见“opcode-like”字段：start=0,length=12 的 constant；少数指令没有。
+        opcode12 = None
+        for r in constants:
+            if int(r["start"]) == 0 and int(r["length"]) == 12:
+                opcode12 = int(r["constant"])
+                break
+        if opcode12 is None:
+            self.opcode12_missing.append(key)
+        else:
+            # 对比 key 前缀（形如 "528.IADD3_..."）只是辅助统计：它并不总等于 opcode12。
             try:
-                inst = inst_int_from_hex_le(inst_hex)
-            except Exception as e:  # noqa: BLE001
-                inst_len_errors.append((key, str(e)))
-                inst = None
-
-            # 常见“opcode-like”字段：start=0,length=12 的 constant；少数指令没有。
-            opcode12 = None
-            for r in rr:
-                if r["type"] == "constant" and int(r["start"]) == 0 and int(r["length"]) == 12:
-                    opcode12 = int(r["constant"])
-                    break
-            if opcode12 is None:
-                opcode12_missing.append(key)
-            else:
-                # 对比 key 前缀（形如 "528.IADD3_..."）只是辅助统计：它并不总等于 opcode12。
-                try:
-                    prefix = int(key.split(".", 1)[0])
-                    if prefix != opcode12:
-                        opcode12_mismatch_key_prefix.append((key, prefix, opcode12))
-                except Exception:  # noqa: BLE001
-                    pass
-
-            # modifiers 表：每条指令 modifiers 的“表数量”应当等于 modifier bitfield 数量（经验观察恒成立）。
-            tables: list[list[list[Any]]] = v.get("modifiers") or []
-            mod_fields = [r for r in rr if r["type"] == "modifier"]
-            modifier_tables_stats[(len(mod_fields), len(tables))] += 1
-            for table in tables:
+                prefix = int(key.split(".", 1)[0])
+                if prefix != opcode12:
+                    self.opcode12_mismatch_key_prefix.append((key, prefix, opcode12))
+            except Exception:  # noqa: BLE001
+                pass
+
+        # modifiers 表：每条指令 modifiers 的“表数量”应当等于 modifier bitfield 数量（经验观察恒成立）。
+        tables: list[list[list[Any]]] = v.get("modifiers") or []
+        self.modifier_tables_stats[(len(rec.of_type("modifier")), len(tables))] += 1
+        for table in tables:
+            for _val, text in table or []:
+                if not text:
+                    self.modifier_table_option_empty += 1
+                    continue
+                txt = str(text).rstrip(".")
+                if not txt:
+                    self.modifier_table_option_empty += 1
+                elif "." in txt:
+                    self.modifier_table_option_multi_token += 1
+                else:
+                    self.modifier_table_option_single_token += 1
+
+        # operand_modifiers 表（操作数修饰符）：统计非空/空选项。
+        om = v.get("operand_modifiers") or {}
+        if isinstance(om, dict):
+            for table in om.values():
                 for _val, text in table or []:
                     if not text:
-                        modifier_table_option_empty += 1
-                        continue
-                    txt = str(text).rstrip(".")
-                    if not txt:
-                        modifier_table_option_empty += 1
-                    elif "." in txt:
-                        modifier_table_option_multi_token += 1
+                        self.operand_modifier_table_option_empty += 1
                     else:
-                        modifier_table_option_single_token += 1
-
-            # operand_modifiers 表（操作数修饰符）：统计非空/空选项。
-            om = v.get("operand_modifiers") or {}
-            if isinstance(om, dict):
-                for table in om.values():
-                    for _val, text in table or []:
-                        if not text:
-                            operand_modifier_table_option_empty += 1
-                        else:
-                            operand_modifier_table_option_nonempty += 1
-
-            for r in rr:
-                t = r["type"]
-                for f in ["operand_index", "group_id", "name", "constant"]:
-                    type_nonnull[t][f"non_null_{f}"] += 0 if r.get(f) is None else 1
-                if r.get("name") is not None:
-                    type_names[t][str(r["name"])] += 1
-                if t == "flag":
-                    flag_name_counts[str(r["name"])] += 1
-                if t == "operand_flag":
-                    operand_flag_name_counts[str(r["name"])] += 1
-
-                # Record schedule/control fields (these tend to have fixed positions).
-                if t in {"stall", "y", "reuse", "r-bar", "w-bar", "b-mask", "predicate"}:
-                    schedule_starts[t][(int(r["start"]), int(r["length"]))] += 1
-
-                # Validate constant ranges match bits in inst (if inst was parsed OK).
-                if inst is not None and t == "constant":
+                        self.operand_modifier_table_option_nonempty += 1
+
+        for r in rr:
+            t = r["type"]
+            nn = self.type_nonnull[t]
+            for f in ["operand_index", "group_id", "name", "constant"]:
+                if r.get(f) is not None:
+                    nn[f"non_null_{f}"] += 1
+            if r.get("name") is not None:
+                self.type_names[t][str(r["name"])] += 1
+            if t == "flag":
+                self.flag_name_counts[str(r["name"])] += 1
+            if t == "operand_flag":
+                self.operand_flag_name_counts[str(r["name"])] += 1
+
+            # Record schedule/control fields (these tend to have fixed positions).
+            if t in {"stall", "y", "reuse", "r-bar", "w-bar", "b-mask", "predicate"}:
+                self.schedule_starts[t][(int(r["start"]), int(r["length"]))] += 1
+
+        # Validate constant ranges match bits in inst (if inst was parsed OK).
+        if rec.inst is not None:
+            for r in constants:
+                expected = int(r["constant"])
+                got = rec.value(r)
+                if got != expected:
                     start = int(r["start"])
                     length = int(r["length"])
-                    expected = int(r["constant"])
-                    got = extract_bits(inst, start, length)
-                    if got != expected:
-                        constant_mismatch.append(
-                            (key, f"constant mismatch at {fmt_bits(start, length)}: expected={expected} got={got}")
-                        )
-
-        out.write("- `ranges.ranges` 每个字段是否符合示例格式（固定 7 个 key）？\n")
-        out.write(f"  - EXPECTED keys = {sorted(EXPECTED_RANGE_KEYS)}\n")
-        out.write(f"  - observed unique keysets = {len(all_range_keysets)}\n")
-        for ks, count in all_range_keysets.most_common(5):
-            out.write(f"  - {count}x keys={list(ks)}\n")
-        out.write(
-            f"- partition(0..127) checks: {'OK' if not partition_errors else f'FAIL ({len(partition_errors)})'}\n"
-        )
-        out.write(
-            f"- `ranges.inst` (16B little-endian hex) checks: {'OK' if not inst_len_errors else f'FAIL ({len(inst_len_errors)})'}\n"
-        )
-        out.write(
-            f"- `type=constant` vs inst bits checks: {'OK' if not constant_mismatch else f'FAIL ({len(constant_mismatch)})'}\n"
-        )
-        out.write(
-            "\n- opcode-like 字段（`constant@start=0,length=12`）解释：\n"
-            "  - 大多数指令都有一个位于 bit[0..11] 的常量段，看起来像“主 opcode”。\n"
-            "  - 少数指令缺失这个字段（例如 NOP / BMOV 相关），说明它们的编码形式不同。\n"
-            "  - 另外：顶层 key 的数字前缀（例如 `551.`）并不保证等于该 12-bit 常量；它更像是这个数据集内部的编号/族标识。\n"
-        )
-        out.write(
-            f"- opcode-like 字段（`constant@start=0,length=12`）: {len(data) - len(opcode12_missing)}/{len(data)} 有该字段\n"
-        )
-        if opcode12_missing:
-            out.write(f"  - missing examples: {opcode12_missing[:10]}\n")
+                    self.constant_mismatch.append(
+                        (key, f"constant mismatch at {fmt_bits(start, length)}: expected={expected} got={got}")
+                    )
+
+
+def collect_report_stats(
+    input_path: Path,
+    pattern: re.Pattern[str] | None,
+    spool: SectionSpool | None = None,
+) -> ReportStats:
+    # One streaming pass: each entry is decoded once and fed to the counters and, when given,
+    # to the --per-instruction spool.
+    stats = ReportStats()
+    for span, v in iter_entry_spans(input_path):
+        rec = decode_entry(span.key, v)
+        stats.add(rec)
+        if spool is not None and (pattern is None or pattern.search(rec.key)):
+            spool.add(rec)
+    return stats
+
+
+def write_report(out: IO[str], input_path: Path, stats: ReportStats) -> None:
+    n = stats.instructions
+    # ===== Top-level schema =====
+    out.write("# ref-encoding.json 格式分析报告\n\n")
+    out.write(f"- input: `{str(input_path)}`\n")
+    out.write(f"- instructions: {n}\n\n")
+
+    out.write("## 阅读指南（先看这段）\n\n")
+    out.write(
+        "- 这份报告的目标：把 `ref-encoding.json` 的“公共格式/字段语义/选项关系”解释清楚，方便你做进一步解析或生成代码。\n"
+    )
+    out.write(
+        "- 最重要的概念：每条指令都是 **128-bit**，`ranges.ranges` 把 0..127 bit **完整切分**成若干字段；每个字段有 `type/start/length/...`。\n"
+    )
+    out.write(
+        "- `start` 的含义：从 **最低有效位 (LSB)** 开始计数的 bit index；因此解析一个字段值就是：`value = (inst >> start) & ((1<<length)-1)`。\n"
+    )
+    out.write(
+        "- `ranges.inst` 的含义：16 字节的 hex 字符串，按 **little-endian** 解释成 128-bit 整数后，再用上面的 `start/length` 取字段值。\n"
+    )
+    out.write(
+        "- 如果你只想快速知道有哪些字段类型：直接跳到“`type` 包含哪些选项”。\n"
+    )
+    out.write(
+        "- 如果你想看某条指令下各种选项怎么互动：用 `--per-instruction` 输出“逐指令摘要”。\n\n"
+    )
 
-        # ===== type options =====
-        out.write("\n## `type` 包含哪些选项\n\n")
+    if stats.rep_key:
+        out.write("## 快速例子（用一条“功能比较全”的指令说明结构）\n\n")
+        out.write(f"- example key: `{stats.rep_key}`\n")
+        out.write(f"- example disasm: `{stats.rep_disasm}`\n")
         out.write(
-            "- 下面列出的 `type` 是 `ranges.ranges` 里字段的分类。你可以把它理解为“这个 bitfield 在语义上表示什么”。\n\n"
+            "- 你可以把它理解为：`ranges.ranges` 定义了 bit-layout；`parsed` 给出语法层面的指令/操作数；"
+            "`modifiers/flags/operand_*` 等字段共同决定 disasm 里会出现哪些 token。\n"
         )
-        out.write(f"- unique `type` values: {len(type_counts)}\n")
-        for t, c in type_counts.most_common():
-            out.write(f"- `{t}`: {c}\n")
+        out.write(f"- example field types: {stats.rep_types}\n\n")
 
-        out.write("\n## flags / operand_flags 的 name 取值（摘要）\n\n")
-        out.write(
-            "- `type=flag`：指令级的 1-bit 开关（通常对应 disasm 里出现/消失一个 token）。\n"
-            "- `type=operand_flag`：操作数级的 1-bit 开关（通常对应某个 operand 的一元变换，如取反/取负/取绝对值）。\n\n"
-        )
-        out.write(f"- `type=flag` unique names: {len(flag_name_counts)}\n")
-        out.write(f"- `type=operand_flag` unique names: {len(operand_flag_name_counts)}\n")
-        out.write(f"- `type=flag` top names: {flag_name_counts.most_common(25)}\n")
-        out.write(f"- `type=operand_flag` names: {operand_flag_name_counts.most_common()}\n")
+    out.write("## 顶层结构（每条指令对象的字段）\n\n")
+    out.write(
+        "- 顶层 JSON 是一个 dict：key 是类似 `528.IADD3_R_P_P_R_R_R` 的字符串；value 是该“指令变体”的结构描述。\n"
+    )
+    out.write(f"- unique keysets: {len(stats.instr_keysets)}\n")
+    for ks, count in stats.instr_keysets.most_common(5):
+        out.write(f"- {count}x keys={list(ks)}\n")
 
-        out.write("\n## modifiers / operand_modifiers 的结构（摘要）\n\n")
-        out.write(
-            "- 这两块用于解释“枚举型字段”如何映射到 disasm 里的修饰符文本。\n"
-            "- 建议记住一个简单规则：\n"
-            "  - `type=modifier` 的第 0 个字段，对应 `modifiers[0]`；第 1 个字段对应 `modifiers[1]` ……（按字段出现顺序）。\n"
-            "  - `type=operand_modifier` 则按 `operand_index` 去 `operand_modifiers[str(operand_index)]` 查表。\n\n"
-        )
-        out.write(
-            "- `modifiers`：list[table]，其中 table 是 `[[value:int, text:str], ...]`；每条指令里 `type=modifier` 的 bitfield 数量 == `len(modifiers)`（按出现顺序一一对应）。\n"
-        )
-        out.write(f"- (modifier_fields, modifiers_tables) 分布：{modifier_tables_stats.most_common(10)}\n")
-        out.write(
-            f"- modifiers 选项文本：single-token={modifier_table_option_single_token}, multi-token(含'.')={modifier_table_option_multi_token}, empty={modifier_table_option_empty}\n"
-        )
-        out.write(
-            "- `operand_modifiers`：dict[str(operand_index) -> table]；并且 `type=operand_modifier` 的 operand_index 集合与 dict key 完全一致。\n"
-        )
-        out.write(
-            f"- operand_modifiers 选项文本：nonempty={operand_modifier_table_option_nonempty}, empty={operand_modifier_table_option_empty}\n"
-        )
+    out.write("\n### 字段之间的关键关系\n\n")
+    out.write(
+        "- `parsed.base_name`：指令基本名字（例如 `IADD3`）。\n"
+        "- `opcode_modis`：这条变体在“名字层面”额外附加到指令名的 token（也会体现在 `canonical_name` 里）。\n"
+        "- `canonical_name`：**严格等于** `parsed.base_name` + `opcode_modis`（用 `.` 连接）。\n"
+    )
+    out.write(
+        "- 关系校验：`canonical_name == parsed.base_name + ('.' + '.'.join(opcode_modis) if opcode_modis else '')`\n"
+    )
+    out.write(f"  - {stats.canonical_ok}/{n} OK\n")
 
-        # ===== type 字段含义（基于统计/约束推断） =====
-        out.write("\n## 各 `type` 的字段约束与含义（推断）\n\n")
-        out.write(
-            "- 这一节试图回答“每种 `type` 究竟代表什么？”以及“要看懂字段之间的关系，该怎么做？”。\n"
-            "- 下面两条是阅读后续内容的基础：\n"
-            "  - `start/length`：该字段在 128-bit 指令里的 bit 位置与宽度（start 从 LSB 开始计数）。\n"
-            "  - `ranges.ranges`：对每条指令都是一个 0..127 的完整分区，因此它就是该指令的完整 bit-layout。\n\n"
-        )
-        out.write("\n### 字段约束（哪些字段会非空）\n\n")
-        for t in sorted(type_counts):
-            c = type_counts[t]
-            nn = type_nonnull[t]
-            out.write(
-                f"- `{t}` ({c}): "
-                + ", ".join(
-                    f"{f}={nn.get('non_null_' + f, 0)}/{c}"
-                    for f in ["operand_index", "group_id", "name", "constant"]
-                )
-                + "\n"
-            )
+    # ===== ranges 格式校验 =====
+    out.write("\n## ranges 字段的公共格式\n\n")
+    out.write(
+        "- `ranges` 是一个对象：\n"
+        "  - `inst`: 一个 16B 的 hex（示例编码；常用于校验/展示默认值）。\n"
+        "  - `ranges`: 一个 list，每项都是一个字段描述（`type/start/length/...`）。\n"
+    )
+    out.write(
+        "- 报告里的校验项解释：\n"
+        "  - `ranges.ranges` keyset：确认每个字段是否都长得像同一个 schema。\n"
+        "  - partition(0..127)：确认字段把 128-bit 覆盖得严丝合缝（无重叠、无空洞）。\n"
+        "  - constant vs inst：确认 `type=constant` 真的和 `ranges.inst` 的对应 bit 一致。\n\n"
+    )
+    out.write(f"- `ranges` object keysets: {dict(stats.ranges_keysets)}\n")
 
-        out.write("\n### 语义总结（按 `type`）\n\n")
-        out.write(
-            "- `constant`：固定比特段；`constant` 给出该段的数值（与 `ranges.inst` 对应）。\n"
-            "  - 常见用法：opcode、子操作选择、保留位/填充位。\n"
-        )
-        out.write(
-            "- `operand`：操作数的编码比特段；`operand_index` 对应“展开后的 operand atom 索引”（由 `parsed.operands` 递归展开 `sub_operands` 得到）。\n"
-            "  - 同一个 operand 有时会分成多个不连续 bit 段（脚本在逐指令摘要里会把 segments 合并展示）。\n"
-        )
-        out.write(
-            "- `modifier`：可枚举的“指令修饰符”编码段；值在 `modifiers` 表里映射为形如 `XXX.` 的文本。\n"
-            "  - 这些文本会变成 disasm 里的 `OP.MOD1.MOD2...` 形式；且一个选项文本可能自带多个 token（如 `F16x2.RN.`）。\n"
-        )
-        out.write(
-            "  - 注意：`modifier` 与 `modifiers` 的匹配方式是“按 bitfield 出现顺序”一一对应；并且一个选项文本可能包含多个 token（如 `F16x2.RN.`）。\n"
-        )
-        out.write(
-            "- `flag`：1-bit 指令级布尔开关；`name` 是开关名（如 `FTZ`、`SAT`）。\n"
-            "  - `name` 的语义需要结合 ISA/微架构文档才能完全解释；本报告主要说明它们如何出现在编码里。\n"
-        )
-        out.write(
-            "- `operand_modifier`：可枚举的“操作数修饰符”编码段；查 `operand_modifiers[str(operand_index)]`。\n"
-        )
-        out.write(
-            "- `operand_flag`：1-bit 操作数级布尔开关；典型 name 包括 `cNEG/cABS/cNOT/cINV` 等。\n"
-        )
-        out.write(
-            "- `predicate`：谓词寄存器选择（4-bit）；与 `parsed.predicate`（如 `@P0`）相关。\n"
-        )
-        out.write(
-            "- `stall/y/reuse/r-bar/w-bar/b-mask`：统一的调度/控制字段（通常在所有指令里位置固定，见下节）。\n"
-        )
+    out.write("- `ranges.ranges` 每个字段是否符合示例格式（固定 7 个 key）？\n")
+    out.write(f"  - EXPECTED keys = {sorted(EXPECTED_RANGE_KEYS)}\n")
+    out.write(f"  - observed unique keysets = {len(stats.all_range_keysets)}\n")
+    for ks, count in stats.all_range_keysets.most_common(5):
+        out.write(f"  - {count}x keys={list(ks)}\n")
+    out.write(
+        f"- partition(0..127) checks: {'OK' if not stats.partition_errors else f'FAIL ({len(stats.partition_errors)})'}\n"
+    )
+    out.write(
+        f"- `ranges.inst` (16B little-endian hex) checks: {'OK' if not stats.inst_len_errors else f'FAIL ({len(stats.inst_len_errors)})'}\n"
+    )
+    out.write(
+        f"- `type=constant` vs inst bits checks: {'OK' if not stats.constant_mismatch else f'FAIL ({len(stats.constant_mismatch)})'}\n"
+    )
+    out.write(
+        "\n- opcode-like 字段（`constant@start=0,length=12`）解释：\n"
+        "  - 大多数指令都有一个位于 bit[0..11] 的常量段，看起来像“主 opcode”。\n"
+        "  - 少数指令缺失这个字段（例如 NOP / BMOV 相关），说明它们的编码形式不同。\n"
+        "  - 另外：顶层 key 的数字前缀（例如 `551.`）并不保证等于该 12-bit 常量；它更像是这个数据集内部的编号/族标识。\n"
+    )
+    out.write(
+        f"- opcode-like 字段（`constant@start=0,length=12`）: {n - len(stats.opcode12_missing)}/{n} 有该字段\n"
+    )
+    if stats.opcode12_missing:
+        out.write(f"  - missing examples: {stats.opcode12_missing[:10]}\n")
 
-        # ===== 固定位字段（调度/谓词等） =====
-        out.write("\n## 固定位字段（调度/控制）\n\n")
-        out.write(
-            "- 这些字段在数据里表现为：几乎所有指令都包含，并且 `start/length` 完全固定。\n"
-            "- 它们更多描述调度/依赖/复用等控制信息，而不是指令本身的“操作数/功能”。\n\n"
-        )
-        for t in ["predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse"]:
-            dist = schedule_starts.get(t, Counter())
-            if not dist:
-                continue
-            common = dist.most_common(5)
-            out.write(f"- `{t}` start/len 分布：{common} (unique={len(dist)})\n")
+    # ===== type options =====
+    out.write("\n## `type` 包含哪些选项\n\n")
+    out.write(
+        "- 下面列出的 `type` 是 `ranges.ranges` 里字段的分类。你可以把它理解为“这个 bitfield 在语义上表示什么”。\n\n"
+    )
+    out.write(f"- unique `type` values: {len(stats.type_counts)}\n")
+    for t, c in stats.type_counts.most_common():
+        out.write(f"- `{t}`: {c}\n")
 
-        # ===== operand_interactions =====
-        out.write("\n## operand_interactions 的含义与交互（推断）\n\n")
-        out.write(
-            "- `operand_interactions`（若存在）按寄存器文件分类（`GPR/PRED/UGPR/UPRED`），列出每个 operand_atom 的读写属性：`[operand_index, 'R'|'W'|'RW', n]`。\n"
-        )
-        out.write("- 其中 `n` 在数据里常见为 1/2/4（例如矩阵/向量指令可能一次读写多个寄存器）。\n")
-        out.write(
-            "- 这为“每条指令下 operand 的角色（dst/src、读写宽度）”提供了直接信息，可与 `parsed.operands` 的类型一起理解。\n"
-        )
+    out.write("\n## flags / operand_flags 的 name 取值（摘要）\n\n")
+    out.write(
+        "- `type=flag`：指令级的 1-bit 开关（通常对应 disasm 里出现/消失一个 token）。\n"
+        "- `type=operand_flag`：操作数级的 1-bit 开关（通常对应某个 operand 的一元变换，如取反/取负/取绝对值）。\n\n"
+    )
+    out.write(f"- `type=flag` unique names: {len(stats.flag_name_counts)}\n")
+    out.write(f"- `type=operand_flag` unique names: {len(stats.operand_flag_name_counts)}\n")
+    out.write(f"- `type=flag` top names: {stats.flag_name_counts.most_common(25)}\n")
+    out.write(f"- `type=operand_flag` names: {stats.operand_flag_name_counts.most_common()}\n")
+
+    out.write("\n## modifiers / operand_modifiers 的结构（摘要）\n\n")
+    out.write(
+        "- 这两块用于解释“枚举型字段”如何映射到 disasm 里的修饰符文本。\n"
+        "- 建议记住一个简单规则：\n"
+        "  - `type=modifier` 的第 0 个字段，对应 `modifiers[0]`；第 1 个字段对应 `modifiers[1]` ……（按字段出现顺序）。\n"
+        "  - `type=operand_modifier` 则按 `operand_index` 去 `operand_modifiers[str(operand_index)]` 查表。\n\n"
+    )
+    out.write(
+        "- `modifiers`：list[table]，其中 table 是 `[[value:int, text:str], ...]`；每条指令里 `type=modifier` 的 bitfield 数量 == `len(modifiers)`（按出现顺序一一对应）。\n"
+    )
+    out.write(f"- (modifier_fields, modifiers_tables) 分布：{stats.modifier_tables_stats.most_common(10)}\n")
+    out.write(
+        f"- modifiers 选项文本：single-token={stats.modifier_table_option_single_token}, multi-token(含'.')={stats.modifier_table_option_multi_token}, empty={stats.modifier_table_option_empty}\n"
+    )
+    out.write(
+        "- `operand_modifiers`：dict[str(operand_index) -> table]；并且 `type=operand_modifier` 的 operand_index 集合与 dict key 完全一致。\n"
+    )
+    out.write(
+        f"- operand_modifiers 选项文本：nonempty={stats.operand_modifier_table_option_nonempty}, empty={stats.operand_modifier_table_option_empty}\n"
+    )
+
+    # ===== type 字段含义（基于统计/约束推断） =====
+    out.write("\n## 各 `type` 的字段约束与含义（推断）\n\n")
+    out.write(
+        "- 这一节试图回答“每种 `type` 究竟代表什么？”以及“要看懂字段之间的关系，该怎么做？”。\n"
+        "- 下面两条是阅读后续内容的基础：\n"
+        "  - `start/length`：该字段在 128-bit 指令里的 bit 位置与宽度（start 从 LSB 开始计数）。\n"
+        "  - `ranges.ranges`：对每条指令都是一个 0..127 的完整分区，因此它就是该指令的完整 bit-layout。\n\n"
+    )
+    out.write("\n### 字段约束（哪些字段会非空）\n\n")
+    for t in sorted(stats.type_counts):
+        c = stats.type_counts[t]
+        nn = stats.type_nonnull[t]
         out.write(
-            "- 实用建议：如果你要构建 dataflow/寄存器依赖分析，`operand_interactions` 往往比仅看 `parsed.operands` 更直接。\n"
+            f"- `{t}` ({c}): "
+            + ", ".join(
+                f"{f}={nn.get('non_null_' + f, 0)}/{c}"
+                for f in ["operand_index", "group_id", "name", "constant"]
+            )
+            + "\n"
         )
 
-        # ===== 可选：逐指令摘要 =====
-        if args.per_instruction:
+    out.write("\n### 语义总结（按 `type`）\n\n")
+    out.write(
+        "- `constant`：固定比特段；`constant` 给出该段的数值（与 `ranges.inst` 对应）。\n"
+        "  - 常见用法：opcode、子操作选择、保留位/填充位。\n"
+    )
+    out.write(
+        "- `operand`：操作数的编码比特段；`operand_index` 对应“展开后的 operand atom 索引”（由 `parsed.operands` 递归展开 `sub_operands` 得到）。\n"
+        "  - 同一个 operand 有时会分成多个不连续 bit 段（脚本在逐指令摘要里会把 segments 合并展示）。\n"
+    )
+    out.write(
+        "- `modifier`：可枚举的“指令修饰符”编码段；值在 `modifiers` 表里映射为形如 `XXX.` 的文本。\n"
+        "  - 这些文本会变成 disasm 里的 `OP.MOD1.MOD2...` 形式；且一个选项文本可能自带多个 token（如 `F16x2.RN.`）。\n"
+    )
+    out.write(
+        "  - 注意：`modifier` 与 `modifiers` 的匹配方式是“按 bitfield 出现顺序”一一对应；并且一个选项文本可能包含多个 token（如 `F16x2.RN.`）。\n"
+    )
+    out.write(
+        "- `flag`：1-bit 指令级布尔开关；`name` 是开关名（如 `FTZ`、`SAT`）。\n"
+        "  - `name` 的语义需要结合 ISA/微架构文档才能完全解释；本报告主要说明它们如何出现在编码里。\n"
+    )
+    out.write(
+        "- `operand_modifier`：可枚举的“操作数修饰符”编码段；查 `operand_modifiers[str(operand_index)]`。\n"
+    )
+    out.write(
+        "- `operand_flag`：1-bit 操作数级布尔开关；典型 name 包括 `cNEG/cABS/cNOT/cINV` 等。\n"
+    )
+    out.write(
+        "- `predicate`：谓词寄存器选择（4-bit）；与 `parsed.predicate`（如 `@P0`）相关。\n"
+    )
+    out.write(
+        "- `stall/y/reuse/r-bar/w-bar/b-mask`：统一的调度/控制字段（通常在所有指令里位置固定，见下节）。\n"
+    )
+
+    # ===== 固定位字段（调度/谓词等） =====
+    out.write("\n## 固定位字段（调度/控制）\n\n")
+    out.write(
+        "- 这些字段在数据里表现为：几乎所有指令都包含，并且 `start/length` 完全固定。\n"
+        "- 它们更多描述调度/依赖/复用等控制信息，而不是指令本身的“操作数/功能”。\n\n"
+    )
+    for t in ["predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse"]:
+        dist = stats.schedule_starts.get(t, Counter())
+        if not dist:
+            continue
+        common = dist.most_common(5)
+        out.write(f"- `{t}` start/len 分布：{common} (unique={len(dist)})\n")
+
+    # ===== operand_interactions =====
+    out.write("\n## operand_interactions 的含义与交互（推断）\n\n")
+    out.write(
+        "- `operand_interactions`（若存在）按寄存器文件分类（`GPR/PRED/UGPR/UPRED`），列出每个 operand_atom 的读写属性：`[operand_index, 'R'|'W'|'RW', n]`。\n"
+    )
+    out.write("- 其中 `n` 在数据里常见为 1/2/4（例如矩阵/向量指令可能一次读写多个寄存器）。\n")
+    out.write(
+        "- 这为“每条指令下 operand 的角色（dst/src、读写宽度）”提供了直接信息，可与 `parsed.operands` 的类型一起理解。\n"
+    )
+    out.write(
+        "- 实用建议：如果你要构建 dataflow/寄存器依赖分析，`operand_interactions` 往往比仅看 `parsed.operands` 更直接。\n"
+    )
+
+
+def main() -> int:
+    args = parse_args()
+    input_path = Path(args.input)
+    pattern = re.compile(args.filter) if (args.per_instruction and args.filter) else None
+
+    out: IO[str]
+    if args.out == "-":
+        out = sys.stdout
+    else:
+        out = Path(args.out).open("w", encoding="utf-8")
+
+    try:
+        if not args.per_instruction:
+            write_report(out, input_path, collect_report_stats(input_path, pattern))
+            return 0
+
+        with SectionSpool(max_table_items=args.max_table_items, limit=args.limit, jobs=args.jobs) as spool:
+            write_report(out, input_path, collect_report_stats(input_path, pattern, spool))
+
+            # ===== 可选：逐指令摘要 =====
             out.write("\n## 每条指令的选项与交互摘要\n\n")
             out.write(
                 "- 提示：这里只展示 `ref-encoding.json` 提供的“一个样例 inst”（通常各 operand=0），因此：\n"
                 "  - `modifier/flag/operand_flag` 的解码结果仅代表该样例 inst 的默认选择。\n"
                 "  - 但 bit-layout、枚举表、以及 operand_interactions 的读写关系对理解格式非常有帮助。\n\n"
             )
-            pattern = re.compile(args.filter) if args.filter else None
-            printed = 0
-            for key in sorted(data.keys()):
-                if pattern and not pattern.search(key):
-                    continue
-                summarize_instruction(out, key, data[key], max_table_items=args.max_table_items)
-                printed += 1
-                if args.limit and printed >= args.limit:
-                    out.write(f"\n\n> 已达到 --limit={args.limit}，后续省略。\n")
-                    break
+            written = spool.write_sorted(out)
+            if args.limit and written >= args.limit:
+                out.write(f"\n\n> 已达到 --limit={args.limit}，后续省略。\n")
 
     finally:
         if out is not sys.stdout:
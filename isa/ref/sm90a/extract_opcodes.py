@@ -1,36 +1,100 @@
 # Usage:
 #   python3 isa/ref/sm90a/extract_opcodes.py > isa/ref/sm90a/opcodes.json
+#   python3 isa/ref/sm90a/extract_opcodes.py /path/to/ref-encoding.json --arch sm90a --format json -o opcode-space.json
+#   python3 isa/ref/sm90a/extract_opcodes.py /path/to/ref-encoding.json --arch sm90a --format html -o opcode-space.html
 #
 # Description:
 #   Parses 'ref-encoding.json' to extract the 12-bit opcode for each instruction.
-#   Outputs a JSON object mapping "Opcode.Name" to its binary representation string.
+#   The default (legacy) output is a JSON object mapping "Opcode.Name" to its binary representation string.
 #
+#   --format json/html builds an index of the whole opcode space instead:
+#     - occupancy: every one of the 2**opcode_bits slots is used or free; a variant whose opcode window is
+#       not fully covered by constant ranges occupies every slot that matches its constant bits.
+#     - secondary fields: constant ranges outside the opcode window that every variant of a slot has at the
+#       same position but with different values; variants are grouped by those values.
+#     - conflicts: pairs of variants in one slot whose constant bits never disagree, i.e. that cannot be
+#       told apart by fixed bits alone.
+#
+#   Constant masks/values are precomputed once per variant from the columnar store (ref_columnar.py), so
+#   opcode extraction and occupancy are NumPy operations over all variants.
 
-import json
+from __future__ import annotations
+
+import argparse
 import collections
+import html
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from analyze_ref_encoding import iter_ref_entries
+from ref_columnar import RefStore, build_store, constant_value, extract_fields
 
 # Configuration for sorting and display
 # The script will sort primarily by the lower LOW_BITS_COUNT bits,
 # and secondarily by the upper HIGH_BITS_COUNT bits.
 LOW_BITS_COUNT = 9
 HIGH_BITS_COUNT = 3  # Note: LOW_BITS_COUNT + HIGH_BITS_COUNT should equal 12
+OPCODE_BITS = LOW_BITS_COUNT + HIGH_BITS_COUNT
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Extract opcodes / index the opcode space of a ref encoding dump.")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default=str(Path(__file__).with_name("ref-encoding.json")),
+        help="Path to ref-encoding.json (default: ./ref-encoding.json next to this script).",
+    )
+    parser.add_argument("--arch", default="", help="Architecture label shown in json/html output.")
+    parser.add_argument(
+        "--format",
+        choices=["legacy", "json", "html"],
+        default="legacy",
+        help="legacy: opcodes.json mapping (default); json/html: opcode-space index.",
+    )
+    parser.add_argument("-o", "--out", default="-", help="Output file (default: '-' for stdout).")
+    return parser.parse_args()
+
+
+def constant_masks(store: RefStore) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-variant (N, 2) uint64 masks of the bits fixed by `type=constant` ranges, and the values of those
+    bits. Non-constant bits are 0 in both arrays.
+    """
+    n = store.n_entries
+    mask = np.zeros((n, 2), dtype=np.uint64)
+    value = np.zeros((n, 2), dtype=np.uint64)
+    rows = store.rows_of_type("constant")
+    start = store.r_start[rows].astype(np.int64)
+    length = store.r_length[rows].astype(np.int64)
+    # Both words of every constant, so parts above bit 63 of a wide constant are kept.
+    const = np.stack([store.r_constant[rows], np.zeros_like(rows, dtype=np.uint64)], axis=1)
+    if store.r_constant_hi is not None:
+        const[:, 1] = store.r_constant_hi[rows]
+    entry = store.r_entry[rows]
+    # Split every constant range into its part in word 0 (bits 0..63) and word 1 (bits 64..127).
+    for word in (0, 1):
+        lo = np.clip(start - 64 * word, 0, 64)
+        hi = np.clip(start + length - 64 * word, 0, 64)
+        sel = hi > lo
+        width = (hi - lo)[sel].astype(np.uint64)
+        shift = lo[sel].astype(np.uint64)
+        # Offset of this word's part inside the constant (non-zero only for ranges straddling bit 64).
+        skip = np.clip(64 * word - start, 0, 64)[sel].astype(np.uint64)
+        field_mask = np.where(width >= 64, np.uint64(~np.uint64(0)), (np.uint64(1) << np.minimum(width, 63)) - 1)
+        bits = extract_fields(const[sel], np.arange(width.size), skip, width)
+        np.bitwise_or.at(mask[:, word], entry[sel], field_mask << shift)
+        np.bitwise_or.at(value[:, word], entry[sel], bits << shift)
+    return mask, value
 
 
-def get_opcode(ranges):
-    opcode = 0
-    for b in range(12):
-        bit_val = 0
-        for r in ranges:
-            start = r["start"]
-            length = r["length"]
-            if start <= b < start + length:
-                if r["type"] == "constant" and r["constant"] is not None:
-                    offset = b - start
-                    bit_val = (int(r["constant"]) >> offset) & 1
-                # If not constant, treat as 0 (instruction variant / operand)
-                break
-        opcode |= bit_val << b
-    return opcode
+def get_opcodes(mask: np.ndarray, value: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Opcode value (non-constant bits read as 0, as before) and which opcode bits are actually fixed.
+    window = np.uint64((1 << OPCODE_BITS) - 1)
+    return (value[:, 0] & window).astype(np.int64), (mask[:, 0] & window).astype(np.int64)
 
 
 def to_bin_str(opcode):
@@ -42,59 +106,219 @@ def to_bin_str(opcode):
     return f"{s[0:HIGH_BITS_COUNT]}  {s[HIGH_BITS_COUNT:4]} {s[4:8]} {s[8:12]}"
 
 
-def main():
-    try:
-        with open("/home/mmy/work/gpidl/isa/ref/sm90a/ref-encoding.json", "r") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print("Error: File not found.")
-        return
+def sort_key(opcode: int) -> tuple[int, int]:
+    # First by lower LOW_BITS_COUNT bits, then by upper HIGH_BITS_COUNT bits
+    return (opcode & ((1 << LOW_BITS_COUNT) - 1), opcode >> LOW_BITS_COUNT)
 
-    extracted = []
 
-    for key, val in data.items():
-        if "ranges" not in val or "ranges" not in val["ranges"]:
-            continue
+def key_suffix(key: str) -> str:
+    parts = key.split(".", 1)
+    return parts[1] if len(parts) == 2 else key
 
-        ranges_list = val["ranges"]["ranges"]
-        opcode = get_opcode(ranges_list)
 
-        parts = key.split(".", 1)
-        if len(parts) == 2:
-            name_suffix = parts[1]
-        else:
-            name_suffix = key
+def legacy_mapping(keys: list[str], opcodes: np.ndarray) -> collections.OrderedDict:
+    extracted = [
+        {"opcode": int(op), "key": f"{int(op)}.{key_suffix(key)}", "bin": to_bin_str(int(op))}
+        for key, op in zip(keys, opcodes)
+    ]
+    extracted.sort(key=lambda x: sort_key(x["opcode"]))
+
+    ordered_items = collections.OrderedDict()
+    if not extracted:
+        return ordered_items
+    max_len = max(len(x["key"]) for x in extracted)
+    for item in extracted:
+        padded_key = item["key"].ljust(max_len)
+        ordered_items[padded_key] = item["bin"]
+    return ordered_items
+
+
+def occupancy(opcodes: np.ndarray, opmask: np.ndarray) -> np.ndarray:
+    # (2**OPCODE_BITS, N) bool: slot s is occupied by variant i if s agrees with i on i's fixed opcode bits.
+    slots = np.arange(1 << OPCODE_BITS, dtype=np.int64)
+    return (slots[:, None] & opmask[None, :]) == opcodes[None, :]
+
 
-        new_key = f"{opcode}.{name_suffix}"
-        bin_str = to_bin_str(opcode)
+def free_runs(used: np.ndarray) -> list[list[int]]:
+    # [[first, last], ...] runs of consecutive free slots.
+    free = np.concatenate(([False], ~used, [False]))
+    edges = np.flatnonzero(free[1:] != free[:-1])
+    return [[int(a), int(b) - 1] for a, b in zip(edges[::2], edges[1::2])]
 
-        extracted.append({"opcode": opcode, "key": new_key, "bin": bin_str})
 
-    # Sort: First by lower LOW_BITS_COUNT bits, then by upper HIGH_BITS_COUNT bits
-    low_mask = (1 << LOW_BITS_COUNT) - 1
-    extracted.sort(
-        key=lambda x: (
-            x["opcode"] & low_mask,  # Primary sort key
-            x["opcode"] >> LOW_BITS_COUNT,  # Secondary sort key
+def secondary_fields(store: RefStore, members: np.ndarray) -> list[tuple[int, int]]:
+    # Constant (start, length) positions outside the opcode window shared by every member with differing values.
+    code = store.type_code("constant")
+    common: set[tuple[int, int]] | None = None
+    values: dict[tuple[int, int], set[int]] = collections.defaultdict(set)
+    for eid in members:
+        lo, hi = store.entry_offsets[eid], store.entry_offsets[eid + 1]
+        sel = np.flatnonzero(store.r_type[lo:hi] == code) + lo
+        pos = set()
+        for row in sel:
+            s, ln = int(store.r_start[row]), int(store.r_length[row])
+            if s < OPCODE_BITS:
+                continue
+            pos.add((s, ln))
+            values[(s, ln)].add(constant_value(store, row))
+        common = pos if common is None else common & pos
+    return sorted(p for p in (common or set()) if len(values[p]) > 1)
+
+
+def secondary_signature(store: RefStore, eid: int, fields: list[tuple[int, int]]) -> str:
+    lo, hi = store.entry_offsets[eid], store.entry_offsets[eid + 1]
+    by_pos = {
+        (int(store.r_start[r]), int(store.r_length[r])): constant_value(store, r)
+        for r in range(lo, hi)
+        if store.type_names[store.r_type[r]] == "constant"
+    }
+    return ",".join(f"{s}:{ln}={by_pos[(s, ln)]}" for s, ln in fields) or "-"
+
+
+def conflict_pairs(mask: np.ndarray, value: np.ndarray, members: np.ndarray) -> list[tuple[int, int]]:
+    # Pairs whose fixed bits never disagree: (mask_a & mask_b) & (value_a ^ value_b) == 0 in both words.
+    m = mask[members]
+    v = value[members]
+    both = m[:, None, :] & m[None, :, :]
+    differ = (v[:, None, :] ^ v[None, :, :]) & both
+    same = ~np.any(differ != 0, axis=2)
+    i, j = np.nonzero(np.triu(same, k=1))
+    return [(int(members[a]), int(members[b])) for a, b in zip(i, j)]
+
+
+def build_index(store: RefStore, source: str, arch: str) -> dict:
+    mask, value = constant_masks(store)
+    opcodes, opmask = get_opcodes(mask, value)
+    occ = occupancy(opcodes, opmask)
+    used = occ.any(axis=1)
+    full = (1 << OPCODE_BITS) - 1
+    keys = [str(k) for k in store.keys]
+
+    slots: dict[str, dict] = {}
+    for slot in sorted(np.flatnonzero(used).tolist(), key=sort_key):
+        members = np.flatnonzero(occ[slot])
+        fields = secondary_fields(store, members)
+        groups: dict[str, list[str]] = collections.defaultdict(list)
+        for eid in members:
+            groups[secondary_signature(store, int(eid), fields)].append(keys[eid])
+        slots[str(slot)] = {
+            "bin": to_bin_str(slot),
+            "variants": [keys[e] for e in members],
+            "via_mask": [keys[e] for e in members if opmask[e] != full],
+            "secondary_fields": [list(p) for p in fields],
+            "groups": dict(groups),
+            "conflicts": [[keys[a], keys[b]] for a, b in conflict_pairs(mask, value, members)],
+        }
+
+    return {
+        "meta": {
+            "source": source,
+            "arch": arch,
+            "opcode_bits": OPCODE_BITS,
+            "variants": store.n_entries,
+            "used_opcodes": int(used.sum()),
+            "free_opcodes": int((~used).sum()),
+            "partial_opcode_variants": int((opmask != full).sum()),
+            "conflict_pairs": sum(len(s["conflicts"]) for s in slots.values()),
+        },
+        "opcodes": slots,
+        "free": free_runs(used),
+    }
+
+
+HTML_STYLE = """
+body { font-family: ui-monospace, SFMono-Regular, Menlo, Consolas, monospace; margin: 16px; color: #111; }
+table.space { border-collapse: collapse; }
+table.space td, table.space th { width: 14px; height: 14px; padding: 0; border: 1px solid #ddd; font-size: 9px; text-align: center; }
+td.free { background: #fff; }
+td.used { background: #9ecae1; }
+td.partial { background: #c7e9c0; }
+td.conflict { background: #fc9272; }
+.legend span { display: inline-block; padding: 2px 8px; margin-right: 8px; border: 1px solid #ccc; }
+table.slots { border-collapse: collapse; margin-top: 16px; }
+table.slots td, table.slots th { border: 1px solid #ddd; padding: 2px 6px; vertical-align: top; text-align: left; }
+"""
+
+
+def render_html(index: dict) -> str:
+    meta = index["meta"]
+    slots = index["opcodes"]
+    width = 1 << LOW_BITS_COUNT
+    cols = 64
+    title = f"Opcode space {meta['arch']}".strip()
+    parts = [
+        "<!DOCTYPE html>",
+        "<html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(title)}</title>",
+        f"<style>{HTML_STYLE}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p>source: {html.escape(meta['source'])} | variants: {meta['variants']} | "
+        f"used: {meta['used_opcodes']} | free: {meta['free_opcodes']} | "
+        f"partial-opcode variants: {meta['partial_opcode_variants']} | conflict pairs: {meta['conflict_pairs']}</p>",
+        "<p class='legend'><span style='background:#9ecae1'>used</span>"
+        "<span style='background:#c7e9c0'>used (masked opcode)</span>"
+        "<span style='background:#fc9272'>conflict</span><span>free</span></p>",
+        "<p>rows: high bits + low bits / 64; columns: low bits % 64</p>",
+        "<table class='space'>",
+    ]
+    for hi in range(1 << HIGH_BITS_COUNT):
+        for row in range(width // cols):
+            parts.append(f"<tr><th>{hi}:{row * cols}</th>")
+            for col in range(cols):
+                slot = (hi << LOW_BITS_COUNT) | (row * cols + col)
+                info = slots.get(str(slot))
+                if info is None:
+                    parts.append(f"<td class='free' title='{slot} free'></td>")
+                    continue
+                cls = "conflict" if info["conflicts"] else ("partial" if info["via_mask"] else "used")
+                tip = html.escape(f"{slot}: " + ", ".join(key_suffix(k) for k in info["variants"]), quote=True)
+                parts.append(f"<td class='{cls}' title='{tip}'><a href='#op{slot}'>&nbsp;</a></td>")
+            parts.append("</tr>")
+    parts.append("</table>")
+
+    parts.append("<table class='slots'><tr><th>opcode</th><th>bin</th><th>secondary fields</th><th>groups</th><th>conflicts</th></tr>")
+    for slot, info in slots.items():
+        fields = ", ".join(f"[{s + ln - 1}:{s}]" for s, ln in info["secondary_fields"]) or "-"
+        groups = "<br>".join(
+            f"{html.escape(sig)}: {html.escape(', '.join(key_suffix(k) for k in ks))}" for sig, ks in info["groups"].items()
         )
-    )
+        conflicts = "<br>".join(html.escape(f"{key_suffix(a)} ~ {key_suffix(b)}") for a, b in info["conflicts"]) or "-"
+        parts.append(
+            f"<tr id='op{slot}'><td>{slot}</td><td>{info['bin']}</td><td>{fields}</td><td>{groups}</td><td>{conflicts}</td></tr>"
+        )
+    parts.append("</table>")
+    free = ", ".join(f"{a}" if a == b else f"{a}-{b}" for a, b in index["free"])
+    parts.append(f"<h2>Free opcodes</h2><p>{free or '(none)'}</p>")
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
 
-    if not extracted:
-        print("{}")
-        return
 
-    max_len = max(len(x["key"]) for x in extracted)
+def main():
+    args = parse_args()
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"Error: File not found: {input_path}", file=sys.stderr)
+        return 1
 
-    # Create an ordered dictionary to preserve sort order
-    # Using a list of pairs for the ordered dict
-    ordered_items = collections.OrderedDict()
+    store = RefStore(**build_store(iter_ref_entries(input_path)))
 
-    for item in extracted:
-        padded_key = item["key"].ljust(max_len)
-        ordered_items[padded_key] = item["bin"]
+    if args.format == "legacy":
+        mask, value = constant_masks(store)
+        opcodes, _ = get_opcodes(mask, value)
+        text = json.dumps(legacy_mapping([str(k) for k in store.keys], opcodes), indent=2) + "\n"
+    else:
+        index = build_index(store, str(input_path), args.arch)
+        if args.format == "json":
+            text = json.dumps(index, indent=2, ensure_ascii=False) + "\n"
+        else:
+            text = render_html(index)
 
-    print(json.dumps(ordered_items, indent=2))
+    if args.out == "-":
+        sys.stdout.write(text)
+    else:
+        Path(args.out).write_text(text, encoding="utf-8")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
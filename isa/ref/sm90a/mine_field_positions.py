@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# 用法：
+#   1) 直接读取 ref-encoding.json（内部先转成列式表示），打印各字段的位置稳定性报告：
+#        python3 mine_field_positions.py /path/to/ref-encoding.json
+#   2) 读取 ref_columnar.py 生成的 .npz（更快），并输出 JSON 供 encoding synthesis 使用：
+#        python3 mine_field_positions.py ref-encoding.npz --json field-positions.json
+#   3) 只看某些字段类（正则匹配字段类名），并调整“稳定”阈值：
+#        python3 mine_field_positions.py ref-encoding.npz --filter '^(operand\[0\]|predicate|reuse)$' --stable 0.9
+#
+# 说明：
+#   - 字段类（field class）由 (type, operand_index, group_id, name) 决定，例如：
+#       `predicate`、`stall`、`operand[0]`（目的寄存器通常是 atom 0）、`operand_flag[3].cNEG`、`modifier#1`、`flag.FTZ`。
+#     `type=constant` 的字段只参与 bit 占用统计，不作为字段类报告。
+#   - coverage：含有该字段类的变体占比；stable：最常见 (start,length) 的占比 >= --stable；
+#   - conflicts：该字段类的主位置（最常见 (start,length)）在其他变体中被别的字段类占用的次数，以及占用者分布。
+#   - per-bit：每个 bit 最常见的拥有者及其占比（只统计非 constant 字段）。
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+
+from analyze_ref_encoding import fmt_bits, iter_ref_entries
+from ref_columnar import INST_BITS, RefStore, build_store, load_store
+
+# Fields that have a name but no operand: the name identifies the class.
+NAMED_TYPES = {"flag", "operand_flag"}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mine stable field bit positions from reference encodings.")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default=str(Path(__file__).with_name("ref-encoding.json")),
+        help="ref-encoding.json or a .npz store from ref_columnar.py (default: ./ref-encoding.json).",
+    )
+    parser.add_argument("--out", default="-", help="Text report output (default: '-' for stdout).")
+    parser.add_argument("--json", default="", help="Also write the result as JSON to this path.")
+    parser.add_argument("--filter", default="", help="Regex on field class names.")
+    parser.add_argument("--stable", type=float, default=0.95, help="Share threshold for a stable position.")
+    parser.add_argument("--top", type=int, default=4, help="Positions / occupants listed per class.")
+    return parser.parse_args()
+
+
+def open_store(path: Path) -> RefStore:
+    if path.suffix == ".npz":
+        return load_store(path)
+    return RefStore(**build_store(iter_ref_entries(path)))
+
+
+@dataclass
+class FieldClasses:
+    names: list[str]
+    row_class: np.ndarray  # (M,) class id per range row, -1 for constants
+
+
+def classify_rows(store: RefStore) -> FieldClasses:
+    t = store.r_type.astype(np.int64)
+    opi = store.r_operand.astype(np.int64) + 1
+    grp = store.r_group.astype(np.int64) + 1
+    name = store.r_name.astype(np.int64) + 1
+    type_names = [str(x) for x in store.type_names]
+    named = np.isin(t, [i for i, n in enumerate(type_names) if n in NAMED_TYPES])
+    # Only the type's own identity fields take part; everything else is zeroed before hashing.
+    is_operand_like = np.isin(t, [i for i, n in enumerate(type_names) if n.startswith("operand")])
+    is_modifier = np.isin(t, [i for i, n in enumerate(type_names) if n == "modifier"])
+    code = (
+        ((t * 1024 + np.where(is_operand_like, opi, 0)) * 1024 + np.where(is_modifier, grp, 0)) * 65536
+        + np.where(named, name, 0)
+    )
+    const_code = type_names.index("constant") if "constant" in type_names else -1
+    keep = t != const_code
+    uniq, inv = np.unique(code[keep], return_inverse=True)
+
+    names = []
+    for c in uniq:
+        n_id = int(c % 65536) - 1
+        rest = int(c // 65536)
+        g_id = rest % 1024 - 1
+        rest //= 1024
+        o_id = rest % 1024 - 1
+        tn = type_names[rest // 1024]
+        label = tn
+        if o_id >= 0:
+            label += f"[{o_id}]"
+        if g_id >= 0:
+            label += f"#{g_id}"
+        if n_id >= 0:
+            label += f".{store.range_names[n_id]}"
+        names.append(label)
+    row_class = np.full(store.r_type.shape, -1, dtype=np.int64)
+    row_class[keep] = inv
+    return FieldClasses(names=names, row_class=row_class)
+
+
+def bit_owner_map(store: RefStore, row_class: np.ndarray) -> np.ndarray:
+    # (N, 128) class id owning each bit (-1 for constants / uncovered bits).
+    owner = np.full((store.n_entries, INST_BITS), -1, dtype=np.int64)
+    rows = np.flatnonzero(row_class >= 0)
+    lengths = store.r_length[rows].astype(np.int64)
+    rep = np.repeat(rows, lengths)
+    # Bit offset within each row: 0..length-1.
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    bits = store.r_start[rep].astype(np.int64) + (np.arange(rep.size) - first)
+    ok = bits < INST_BITS
+    owner[store.r_entry[rep][ok], bits[ok]] = row_class[rep][ok]
+    return owner
+
+
+def mine(store: RefStore, stable_share: float, top: int, pattern: re.Pattern[str] | None) -> dict:
+    fc = classify_rows(store)
+    owner = bit_owner_map(store, fc.row_class)
+    n = store.n_entries
+    rows = np.flatnonzero(fc.row_class >= 0)
+    cls = fc.row_class[rows]
+    pos_code = store.r_start[rows].astype(np.int64) * (INST_BITS + 1) + store.r_length[rows].astype(np.int64)
+
+    # One histogram for all classes: unique (class, start, length) with counts.
+    combo = cls * (INST_BITS + 1) ** 2 + pos_code
+    uniq, counts = np.unique(combo, return_counts=True)
+    u_cls = uniq // (INST_BITS + 1) ** 2
+    u_pos = uniq % (INST_BITS + 1) ** 2
+    variants_with = np.bincount(
+        np.unique(cls * n + store.r_entry[rows].astype(np.int64)) // n, minlength=len(fc.names)
+    )
+
+    classes: dict[str, dict] = {}
+    order = np.argsort(-variants_with, kind="stable")
+    for c in order:
+        name = fc.names[c]
+        if pattern and not pattern.search(name):
+            continue
+        sel = np.flatnonzero(u_cls == c)
+        sel = sel[np.argsort(-counts[sel], kind="stable")]
+        total = int(counts[sel].sum())
+        positions = [
+            [int(u_pos[i] // (INST_BITS + 1)), int(u_pos[i] % (INST_BITS + 1)), int(counts[i])] for i in sel
+        ]
+        start, length, top_count = positions[0]
+        # Conflicts: variants where the dominant interval holds some other class.
+        window = owner[:, start : start + length]
+        foreign = (window >= 0) & (window != c)
+        hit = foreign.any(axis=1)
+        # Occupants are counted once per variant, not per bit.
+        v_idx = np.nonzero(foreign)[0]
+        pairs = np.unique(v_idx * len(fc.names) + window[foreign])
+        occ_ids, occ_counts = np.unique(pairs % len(fc.names), return_counts=True)
+        occ_order = np.argsort(-occ_counts, kind="stable")[:top]
+        classes[name] = {
+            "coverage": round(int(variants_with[c]) / n, 4) if n else 0.0,
+            "variants": int(variants_with[c]),
+            "fields": total,
+            "positions": positions,
+            "dominant_share": round(top_count / total, 4) if total else 0.0,
+            "stable": bool(total and top_count / total >= stable_share),
+            "conflict_variants": int(hit.sum()),
+            "conflict_occupants": [[fc.names[int(occ_ids[i])], int(occ_counts[i])] for i in occ_order],
+        }
+
+    per_bit = []
+    for b in range(INST_BITS):
+        col = owner[:, b]
+        col = col[col >= 0]
+        if col.size == 0:
+            per_bit.append([b, None, 0.0])
+            continue
+        ids, cnt = np.unique(col, return_counts=True)
+        k = int(np.argmax(cnt))
+        per_bit.append([b, fc.names[int(ids[k])], round(int(cnt[k]) / n, 4)])
+
+    return {
+        "meta": {"variants": n, "field_classes": len(fc.names), "stable_share": stable_share},
+        "classes": classes,
+        "per_bit": per_bit,
+    }
+
+
+def write_report(out: IO[str], result: dict, top: int) -> None:
+    meta = result["meta"]
+    out.write(f"# 字段位置稳定性\n\n- variants: {meta['variants']}\n- field classes: {meta['field_classes']}\n")
+    out.write(f"- stable: 最常见位置占比 >= {meta['stable_share']}\n\n")
+    out.write("| class | coverage | stable | dominant | share | conflicts | other positions / occupants |\n")
+    out.write("|---|---:|:---:|---|---:|---:|---|\n")
+    for name, c in result["classes"].items():
+        start, length, _ = c["positions"][0]
+        others = ", ".join(f"{fmt_bits(s, l)}x{k}" for s, l, k in c["positions"][1 : top + 1])
+        occ = ", ".join(f"{o}x{k}" for o, k in c["conflict_occupants"])
+        extra = "; ".join(x for x in (others, f"occupied by {occ}" if occ else "") if x)
+        out.write(
+            f"| `{name}` | {c['coverage']:.3f} | {'Y' if c['stable'] else ''} | {fmt_bits(start, length)} "
+            f"| {c['dominant_share']:.3f} | {c['conflict_variants']} | {extra} |\n"
+        )
+    out.write("\n## per-bit 最常见拥有者\n\n")
+    for b, owner, share in result["per_bit"]:
+        if owner is not None:
+            out.write(f"- bit {b}: `{owner}` ({share:.3f})\n")
+
+
+def main() -> int:
+    args = parse_args()
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"error: file not found: {input_path}", file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    store = open_store(input_path)
+    t1 = time.perf_counter()
+    pattern = re.compile(args.filter) if args.filter else None
+    result = mine(store, args.stable, args.top, pattern)
+    t2 = time.perf_counter()
+    result["meta"]["timing_ms"] = {"load": round((t1 - t0) * 1e3, 1), "mine": round((t2 - t1) * 1e3, 1)}
+
+    out: IO[str] = sys.stdout if args.out == "-" else Path(args.out).open("w", encoding="utf-8")
+    try:
+        write_report(out, result, args.top)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    print(f"(load {result['meta']['timing_ms']['load']} ms, mine {result['meta']['timing_ms']['mine']} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
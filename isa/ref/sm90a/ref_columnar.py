@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# 用法：
+#   1) 一次性把 ref-encoding.json 转成列式 .npz（默认读写本脚本同目录）：
+#        python3 ref_columnar.py build [/path/to/ref-encoding.json] -o ref-encoding.npz
+#   2) 在 .npz 上运行向量化检查（constant vs inst、partition(0..127)）：
+#        python3 ref_columnar.py check ref-encoding.npz
+#   3) 某类字段的 (start, length) 分布直方图：
+#        python3 ref_columnar.py hist ref-encoding.npz --type stall --type operand
+#
+# 说明：
+#   - 依赖 numpy。
+#   - inst: (N, 2) uint64，[:, 0] 是 bit 0..63，[:, 1] 是 bit 64..127（与 ranges.inst 的小端序一致）。
+#   - ranges 被摊平成等长的列（r_entry/r_type/r_start/r_length/r_operand/r_group/r_name/r_constant/r_constant_hi），
+#     按 (entry, start) 排序；entry_offsets 是 CSR 风格的偏移（entry i 的字段在 [offsets[i], offsets[i+1])）。
+#   - 字符串都放在名字表里（keys/base_names/canonical_names/type_names/range_names），列里只存整数下标；
+#     缺失值（null）用 -1 表示。
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from analyze_ref_encoding import fmt_bits, inst_int_from_hex_le, iter_ref_entries
+
+MASK64 = (1 << 64) - 1
+INST_BITS = 128
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Columnar NumPy store of ref-encoding.json.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="Convert ref-encoding.json into a .npz store.")
+    p.add_argument(
+        "input",
+        nargs="?",
+        default=str(Path(__file__).with_name("ref-encoding.json")),
+        help="Path to ref-encoding.json (default: ./ref-encoding.json next to this script).",
+    )
+    p.add_argument(
+        "-o",
+        "--out",
+        default=str(Path(__file__).with_name("ref-encoding.npz")),
+        help="Output .npz path (default: ./ref-encoding.npz next to this script).",
+    )
+
+    p = sub.add_parser("check", help="Run vectorized constant/partition checks.")
+    p.add_argument("store", help="Path to .npz store.")
+    p.add_argument("--show", type=int, default=10, help="Max failing items printed per check.")
+
+    p = sub.add_parser("hist", help="Print (start, length) histograms per field type.")
+    p.add_argument("store", help="Path to .npz store.")
+    p.add_argument(
+        "--type",
+        action="append",
+        default=[],
+        help="Field type to report (repeatable; default: all types).",
+    )
+    p.add_argument("--top", type=int, default=8, help="Max (start, length) buckets printed per type.")
+    return parser.parse_args()
+
+
+class NameTable:
+    def __init__(self) -> None:
+        self.index: dict[str, int] = {}
+
+    def code(self, name: Any) -> int:
+        if name is None:
+            return -1
+        name = str(name)
+        idx = self.index.get(name)
+        if idx is None:
+            idx = len(self.index)
+            self.index[name] = idx
+        return idx
+
+    def names(self) -> np.ndarray:
+        return np.array(list(self.index) or [""], dtype=str)
+
+
+def build_store(entries: Iterable[tuple[str, dict[str, Any]]]) -> dict[str, np.ndarray]:
+    keys: list[str] = []
+    base_table = NameTable()
+    canon_table = NameTable()
+    type_table = NameTable()
+    name_table = NameTable()
+    entry_base: list[int] = []
+    entry_canon: list[int] = []
+    inst_words: list[tuple[int, int]] = []
+    offsets = [0]
+    cols: dict[str, list[int]] = {
+        "r_entry": [],
+        "r_type": [],
+        "r_start": [],
+        "r_length": [],
+        "r_operand": [],
+        "r_group": [],
+        "r_name": [],
+        "r_constant": [],
+        "r_constant_hi": [],
+    }
+    for eid, (key, v) in enumerate(entries):
+        keys.append(key)
+        entry_base.append(base_table.code(v["parsed"].get("base_name")))
+        entry_canon.append(canon_table.code(v.get("canonical_name")))
+        inst = inst_int_from_hex_le(v["ranges"]["inst"])
+        inst_words.append((inst & MASK64, inst >> 64))
+        rr = sorted(v["ranges"]["ranges"], key=lambda r: (int(r["start"]), int(r["length"])))
+        for r in rr:
+            cols["r_entry"].append(eid)
+            cols["r_type"].append(type_table.code(r["type"]))
+            cols["r_start"].append(int(r["start"]))
+            cols["r_length"].append(int(r["length"]))
+            cols["r_operand"].append(-1 if r.get("operand_index") is None else int(r["operand_index"]))
+            cols["r_group"].append(-1 if r.get("group_id") is None else int(r["group_id"]))
+            cols["r_name"].append(name_table.code(r.get("name")))
+            # Constants are split like inst: r_constant holds bits 0..63, r_constant_hi bits 64..127.
+            const = 0 if r.get("constant") is None else int(r["constant"])
+            cols["r_constant"].append(const & MASK64)
+            cols["r_constant_hi"].append(const >> 64)
+        offsets.append(offsets[-1] + len(rr))
+
+    return {
+        "keys": np.array(keys, dtype=str),
+        "base_names": base_table.names(),
+        "canonical_names": canon_table.names(),
+        "type_names": type_table.names(),
+        "range_names": name_table.names(),
+        "entry_base": np.array(entry_base, dtype=np.int32),
+        "entry_canonical": np.array(entry_canon, dtype=np.int32),
+        "entry_offsets": np.array(offsets, dtype=np.int64),
+        "inst": np.array(inst_words, dtype=np.uint64).reshape(-1, 2),
+        "r_entry": np.array(cols["r_entry"], dtype=np.int32),
+        "r_type": np.array(cols["r_type"], dtype=np.int16),
+        "r_start": np.array(cols["r_start"], dtype=np.int16),
+        "r_length": np.array(cols["r_length"], dtype=np.int16),
+        "r_operand": np.array(cols["r_operand"], dtype=np.int16),
+        "r_group": np.array(cols["r_group"], dtype=np.int16),
+        "r_name": np.array(cols["r_name"], dtype=np.int32),
+        "r_constant": np.array(cols["r_constant"], dtype=np.uint64),
+        "r_constant_hi": np.array(cols["r_constant_hi"], dtype=np.uint64),
+    }
+
+
+@dataclass
+class RefStore:
+    keys: np.ndarray
+    base_names: np.ndarray
+    canonical_names: np.ndarray
+    type_names: np.ndarray
+    range_names: np.ndarray
+    entry_base: np.ndarray
+    entry_canonical: np.ndarray
+    entry_offsets: np.ndarray
+    inst: np.ndarray
+    r_entry: np.ndarray
+    r_type: np.ndarray
+    r_start: np.ndarray
+    r_length: np.ndarray
+    r_operand: np.ndarray
+    r_group: np.ndarray
+    r_name: np.ndarray
+    r_constant: np.ndarray
+    r_constant_hi: np.ndarray | None = None  # missing in stores built before it was added
+
+    @property
+    def n_entries(self) -> int:
+        return int(self.inst.shape[0])
+
+    def type_code(self, name: str) -> int:
+        hits = np.flatnonzero(self.type_names == name)
+        return int(hits[0]) if hits.size else -1
+
+    def rows_of_type(self, name: str) -> np.ndarray:
+        return np.flatnonzero(self.r_type == self.type_code(name))
+
+
+def save_store(path: Path, arrays: dict[str, np.ndarray]) -> None:
+    np.savez_compressed(path, **arrays)
+
+
+def load_store(path: Path) -> RefStore:
+    with np.load(path, allow_pickle=False) as z:
+        return RefStore(**{k: z[k] for k in z.files})
+
+
+def constant_value(store: RefStore, row: int) -> int:
+    # Full value of one constant row as a Python int (r_constant_hi holds bits 64..127, if present).
+    value = int(store.r_constant[row])
+    if store.r_constant_hi is not None:
+        value |= int(store.r_constant_hi[row]) << 64
+    return value
+
+
+def extract_fields(inst: np.ndarray, entry: np.ndarray, start: np.ndarray, length: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `(inst[entry] >> start) & ((1 << length) - 1)` over the two 64-bit words.
+
+    Fields must be at most 64 bits wide. NumPy shifts by >= 64 are not defined, so every shift
+    amount is clamped and the out-of-range lanes are masked with np.where.
+    """
+    lo = inst[entry, 0]
+    hi = inst[entry, 1]
+    s = start.astype(np.uint64)
+    ln = length.astype(np.uint64)
+    in_lo = s < 64
+    straddle = in_lo & (s > 0)
+    lo_part = lo >> np.where(in_lo, s, 0)
+    hi_into_lo = np.where(straddle, hi << np.where(straddle, 64 - s, 0), 0)
+    hi_part = hi >> np.where(in_lo, 0, s - 64)
+    value = np.where(in_lo, lo_part | hi_into_lo, hi_part)
+    mask = (np.uint64(1) << np.minimum(ln, 63)) - np.uint64(1)
+    mask = np.where(ln >= 64, np.uint64(MASK64), mask)
+    return value & mask
+
+
+def constant_mismatches(store: RefStore) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (mismatch rows, unchecked rows) of `type=constant` ranges.
+
+    Constants wider than 64 bits are compared word by word against r_constant / r_constant_hi;
+    a store without r_constant_hi cannot check them, so they come back as unchecked instead.
+    """
+    rows = store.rows_of_type("constant")
+    wide = store.r_length[rows] > 64
+    unchecked = rows[wide] if store.r_constant_hi is None else rows[:0]
+    if store.r_constant_hi is None:
+        rows, wide = rows[~wide], wide[~wide]
+    entry = store.r_entry[rows]
+    start = store.r_start[rows]
+    length = store.r_length[rows]
+    got = extract_fields(store.inst, entry, start, np.minimum(length, 64))
+    bad = got != store.r_constant[rows]
+    if wide.any():
+        got_hi = extract_fields(store.inst, entry[wide], start[wide] + 64, length[wide] - 64)
+        bad[wide] |= got_hi != store.r_constant_hi[rows[wide]]
+    return rows[bad], unchecked
+
+
+def partition_failures(store: RefStore) -> np.ndarray:
+    """
+    Returns entry ids whose ranges are not an exact partition of bit 0..127.
+
+    Rows are sorted by (entry, start), so a partition means: the first row of each entry starts
+    at 0, every other row starts where its predecessor ends, and the last row ends at 128.
+    """
+    start = store.r_start.astype(np.int32)
+    end = start + store.r_length.astype(np.int32)
+    offsets = store.entry_offsets
+    n = store.n_entries
+    bad = np.zeros(n, dtype=bool)
+    empty = offsets[1:] == offsets[:-1]
+    bad |= empty
+    first = offsets[:-1][~empty]
+    last = offsets[1:][~empty] - 1
+    bad[~empty] |= start[first] != 0
+    bad[~empty] |= end[last] != INST_BITS
+    if start.size > 1:
+        same_entry = store.r_entry[1:] == store.r_entry[:-1]
+        broken = same_entry & (start[1:] != end[:-1])
+        bad[store.r_entry[1:][broken]] = True
+    return np.flatnonzero(bad)
+
+
+def position_histogram(store: RefStore, type_name: str) -> list[tuple[int, int, int]]:
+    # [(start, length, count), ...] sorted by count desc.
+    rows = store.rows_of_type(type_name)
+    if rows.size == 0:
+        return []
+    code = store.r_start[rows].astype(np.int32) * (INST_BITS + 1) + store.r_length[rows].astype(np.int32)
+    uniq, counts = np.unique(code, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    return [(int(uniq[i] // (INST_BITS + 1)), int(uniq[i] % (INST_BITS + 1)), int(counts[i])) for i in order]
+
+
+def cmd_build(args: argparse.Namespace) -> int:
+    t0 = time.perf_counter()
+    arrays = build_store(iter_ref_entries(Path(args.input)))
+    save_store(Path(args.out), arrays)
+    dt = time.perf_counter() - t0
+    print(
+        f"Wrote {args.out}: {arrays['inst'].shape[0]} entries, {arrays['r_entry'].size} ranges ({dt:.2f}s)"
+    )
+    return 0
+
+
+def cmd_check(args: argparse.Namespace) -> int:
+    store = load_store(Path(args.store))
+    t0 = time.perf_counter()
+    bad_const, unchecked = constant_mismatches(store)
+    t1 = time.perf_counter()
+    bad_part = partition_failures(store)
+    t2 = time.perf_counter()
+    print(f"- entries: {store.n_entries}, ranges: {store.r_entry.size}")
+    print(
+        f"- `type=constant` vs inst bits checks: {'OK' if not bad_const.size else f'FAIL ({bad_const.size})'}"
+        f" [{(t1 - t0) * 1e3:.2f} ms]"
+    )
+    for row in bad_const[: args.show]:
+        key = store.keys[store.r_entry[row]]
+        print(f"  - {key}: constant mismatch at {fmt_bits(int(store.r_start[row]), int(store.r_length[row]))}")
+    if unchecked.size:
+        print(f"  - unchecked: {unchecked.size} constants wider than 64 bits (store has no r_constant_hi; rebuild it)")
+    for row in unchecked[: args.show]:
+        key = store.keys[store.r_entry[row]]
+        print(f"    - {key}: {fmt_bits(int(store.r_start[row]), int(store.r_length[row]))}")
+    print(
+        f"- partition(0..127) checks: {'OK' if not bad_part.size else f'FAIL ({bad_part.size})'}"
+        f" [{(t2 - t1) * 1e3:.2f} ms]"
+    )
+    for eid in bad_part[: args.show]:
+        print(f"  - {store.keys[eid]}")
+    return 1 if (bad_const.size or bad_part.size) else 0
+
+
+def cmd_hist(args: argparse.Namespace) -> int:
+    store = load_store(Path(args.store))
+    types = args.type or [str(t) for t in store.type_names]
+    t0 = time.perf_counter()
+    hists = {t: position_histogram(store, t) for t in types}
+    dt = time.perf_counter() - t0
+    for t, hist in hists.items():
+        total = sum(c for _, _, c in hist)
+        top = ", ".join(f"{fmt_bits(s, l)}x{c}" for s, l, c in hist[: args.top])
+        more = "" if len(hist) <= args.top else f" ... (+{len(hist) - args.top})"
+        print(f"- `{t}`: {total} fields, unique(start,len)={len(hist)}: {top}{more}")
+    print(f"({dt * 1e3:.2f} ms)")
+    return 0
+
+
+def main() -> int:
+    args = parse_args()
+    if args.cmd == "build":
+        return cmd_build(args)
+    if args.cmd == "check":
+        return cmd_check(args)
+    return cmd_hist(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
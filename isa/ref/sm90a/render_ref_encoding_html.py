@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# 用法：
+#   1) 默认读取同目录下的 ref-encoding.json，渲染成与 render_encoding_html.py 相同风格的 bitgrid 页面：
+#        python3 render_ref_encoding_html.py -o ref-encoding.html
+#   2) 指定输入文件、每页最多显示的变体数，并用正则过滤 key：
+#        python3 render_ref_encoding_html.py /path/to/ref-encoding.json -o out --page-size 16 --filter 'IADD3|FSET'
+#
+# 说明：
+#   - 页面按 `parsed.base_name` 分组（每个 base_name 一个页面，超出 --page-size 时分页）。
+#   - ref schema 的 `ranges.ranges` 会先转换成 encoding synthesis 输出格式（见 isa/encoding_synthesis_notes.md）
+#     再交给 isa/render_encoding_html.py 渲染：
+#       - operand -> operand，name 取展开后的 operand atom 路径（如 `op2.sub0`）
+#       - operand_flag -> oprnd_flag，oprnd_idx 指向对应 atom
+#       - modifier -> modifier，name 为 `mod<group_id>`
+#       - operand_modifier / flag / constant 以及 predicate/stall/y/r-bar/w-bar/b-mask/reuse 保持原 type
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from analyze_ref_encoding import flatten_operands, iter_ref_entries  # noqa: E402
+from render_encoding_html import write_site  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Render ref-encoding.json with the encoding bitgrid renderer."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default=str(Path(__file__).with_name("ref-encoding.json")),
+        help="Path to ref-encoding.json (default: ./ref-encoding.json next to this script).",
+    )
+    parser.add_argument("-o", "--outdir", required=True, help="Output directory for HTML files.")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=32,
+        help="Max variants per base_name page (0 means one page per base_name).",
+    )
+    parser.add_argument("--filter", default="", help="Regex to filter instruction keys.")
+    return parser.parse_args()
+
+
+def atom_names(v: dict[str, Any]) -> list[str]:
+    operands = (v.get("parsed") or {}).get("operands") or []
+    return [path for path, _ in flatten_operands(operands)]
+
+
+def convert_range(r: dict[str, Any], atoms: list[str]) -> dict[str, Any]:
+    t = r["type"]
+    out: dict[str, Any] = {
+        "type": t,
+        "start": int(r["start"]),
+        "length": int(r["length"]),
+        "name": None,
+        "constant": None,
+        "oprnd_idx": None,
+    }
+    opi = r.get("operand_index")
+    atom = None
+    if opi is not None:
+        opi = int(opi)
+        atom = atoms[opi] if 0 <= opi < len(atoms) else f"atom{opi}"
+    if t == "operand":
+        out["name"] = atom
+    elif t == "operand_flag":
+        out["type"] = "oprnd_flag"
+        out["name"] = r.get("name")
+        out["oprnd_idx"] = atom
+    elif t == "operand_modifier":
+        out["name"] = f"{atom}.mod"
+        out["oprnd_idx"] = atom
+    elif t == "modifier":
+        out["name"] = f"mod{r.get('group_id')}"
+    elif t == "flag":
+        out["name"] = r.get("name")
+    elif t == "constant":
+        out["constant"] = int(r["constant"])
+    return out
+
+
+def ref_entry_to_encoding(key: str, v: dict[str, Any]) -> dict[str, Any]:
+    atoms = atom_names(v)
+    return {
+        "instruction": v["parsed"].get("base_name") or key,
+        "form_path": [v.get("canonical_name") or key],
+        "ranges": [convert_range(r, atoms) for r in v["ranges"]["ranges"]],
+        "note": f"disasm: {v.get('disasm')}",
+    }
+
+
+def convert_ref_encodings(
+    entries: Iterable[tuple[str, dict[str, Any]]],
+    pattern: re.Pattern[str] | None,
+) -> dict[str, dict]:
+    encodings: dict[str, dict] = {}
+    for key, v in entries:
+        if pattern and not pattern.search(key):
+            continue
+        encodings[key] = ref_entry_to_encoding(key, v)
+    return encodings
+
+
+def main() -> int:
+    args = parse_args()
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"error: file not found: {input_path}", file=sys.stderr)
+        return 1
+    pattern = re.compile(args.filter) if args.filter else None
+    encodings = convert_ref_encodings(iter_ref_entries(input_path), pattern)
+    write_site(
+        Path(args.outdir),
+        str(input_path),
+        {},
+        encodings,
+        page_size=args.page_size,
+        title="Reference Encoding Index",
+    )
+    print(f"Wrote {len(encodings)} encodings to {args.outdir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
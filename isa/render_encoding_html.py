@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 # Usage:
 #   python3 isa/render_encoding_html.py isa/encoding.v1.json -o isa/encoding.v1.html
+#   python3 isa/render_encoding_html.py new.json --diff-against old.json -o diff.html
 # Notes:
 #   - index.html is written to the output root.
 #   - per-instruction pages are written under <outdir>/instructions.
+#   - with --diff-against, only changed encodings are rendered, old and new side by side.
 
 from __future__ import annotations
 
@@ -15,6 +17,8 @@ import re
 import sys
 from pathlib import Path
 
+from diff_encoding import diff_encodings, fmt_change
+
 CSS = """
 :root {
   --bg: #f7f4ef;
@@ -153,6 +157,30 @@ code, .mono {
   color: var(--muted);
   margin-top: 6px;
 }
+.diff-pair {
+  display: flex;
+  flex-wrap: wrap;
+  gap: 16px;
+}
+.diff-side {
+  flex: 1 1 560px;
+  min-width: 0;
+}
+.diff-side h3 {
+  margin: 4px 0;
+  font-size: 14px;
+  color: var(--muted);
+}
+.pager {
+  margin: 10px 0;
+  font-size: 13px;
+}
+.pager a, .pager strong { margin: 0 3px; }
+.changes {
+  margin: 8px 0;
+  padding-left: 18px;
+  font-size: 13px;
+}
 @media (max-width: 900px) {
   .inst-list { columns: 2 200px; }
 }
@@ -184,6 +212,10 @@ CONST_PALETTE = ["#E3E7EC", "#D6DCE3", "#CCD2DA", "#EDF0F4"]
 RESERVED_PALETTE = ["#F1F2F4", "#E6E8EC", "#DDE1E6", "#F6F7F9"]
 GAP_PALETTE = ["#ECECEC", "#E2E2E2", "#D7D7D7"]
 DEFAULT_PALETTE = ["#D0D0D0", "#C4C4C4", "#B8B8B8"]
+CONTROL_PALETTE = ["#E8E0D4", "#DCD2C4", "#EFE8DE"]
+
+# Scheduling/control field types used by reference (SASS) encodings.
+CONTROL_TYPES = {"predicate", "stall", "y", "r-bar", "w-bar", "b-mask", "reuse"}
 
 
 def load_json(path: str) -> dict:
@@ -229,6 +261,7 @@ def assign_range_colors(normalized: list[dict]) -> list[str]:
     const_idx = 0
     reserved_idx = 0
     gap_idx = 0
+    control_idx = 0
     for r in normalized:
         rtype = r.get("type")
         if rtype == "constant":
@@ -239,6 +272,8 @@ def assign_range_colors(normalized: list[dict]) -> list[str]:
             )
         elif rtype == "gap":
             color, gap_idx = next_palette_color(GAP_PALETTE, gap_idx, prev)
+        elif rtype in CONTROL_TYPES:
+            color, control_idx = next_palette_color(CONTROL_PALETTE, control_idx, prev)
         else:
             color, main_idx = next_palette_color(PASTEL_PALETTE, main_idx, prev)
         colors.append(color)
@@ -262,6 +297,8 @@ def range_label(r: dict) -> str:
         return name or "flag"
     if rtype == "modifier":
         return name or "modifier"
+    if rtype in ("flag", "operand_modifier") and name:
+        return name
     if rtype == "constant":
         const = r.get("constant")
         if const is None:
@@ -286,10 +323,9 @@ def range_title(r: dict) -> str:
     parts = [rtype or "range", bits, f"len={length}"]
     if name:
         parts.append(f"name={name}")
-    if rtype == "oprnd_flag":
-        oprnd = r.get("oprnd_idx")
-        if oprnd:
-            parts.append(f"oprnd={oprnd}")
+    oprnd = r.get("oprnd_idx")
+    if oprnd:
+        parts.append(f"oprnd={oprnd}")
     if rtype == "constant":
         parts.append(f"const={format_constant(r.get('constant'), length)}")
     return " ".join(parts)
@@ -505,28 +541,53 @@ def html_page(title: str, body: str) -> str:
     )
 
 
+def encoding_width(ranges: list[dict]) -> int:
+    return max(
+        (r.get("start", 0) + r.get("length", 0) for r in ranges),
+        default=0,
+    )
+
+
+def page_filename(base: str, page: int) -> str:
+    return f"{base}.html" if page == 0 else f"{base}_p{page + 1}.html"
+
+
+def render_page_nav(base: str, page: int, page_count: int) -> str:
+    if page_count <= 1:
+        return ""
+    links = []
+    for idx in range(page_count):
+        if idx == page:
+            links.append(f"<strong>{idx + 1}</strong>")
+        else:
+            href = html.escape(page_filename(base, idx))
+            links.append(f"<a href=\"{href}\">{idx + 1}</a>")
+    return "<div class=\"pager\">pages: " + " ".join(links) + "</div>"
+
+
 def render_instruction_page(
     instruction: str,
     enc_items: list[tuple[str, dict]],
     index_href: str,
+    page_nav: str = "",
+    total_forms: int | None = None,
 ) -> str:
+    total = len(enc_items) if total_forms is None else total_forms
     parts = [
         "<header>",
         f"<h1>{html.escape(instruction)}</h1>",
         f"<a href=\"{html.escape(index_href)}\">index</a>",
         "</header>",
         "<div class=\"summary\">",
-        f"{len(enc_items)} forms; bit 0 is LSB (rightmost cell); each row shows up to 64 bits.",
+        f"{total} forms; bit 0 is LSB (rightmost cell); each row shows up to 64 bits.",
         "</div>",
+        page_nav,
     ]
     for enc_key, enc in enc_items:
         form_path = enc.get("form_path") or []
         form_str = ".".join(str(x) for x in form_path) or "(none)"
         ranges = enc.get("ranges", [])
-        bit_width = max(
-            (r.get("start", 0) + r.get("length", 0) for r in ranges),
-            default=0,
-        )
+        bit_width = encoding_width(ranges)
         bitgrid_html, warnings, normalized, range_colors = render_bitgrid(
             ranges, bit_width, row_bits=64
         )
@@ -540,13 +601,19 @@ def render_instruction_page(
             "<div class=\"encoding-meta\">"
             f"form_path: <span class=\"mono\">{html.escape(form_str)}</span>"
             f" | width: {bit_width} bits"
-            "</div>"
+            + (f" | {html.escape(enc['note'])}" if enc.get("note") else "")
+            + "".join(
+                f" | <a href=\"{html.escape(link['href'])}\">{html.escape(link['label'])}</a>"
+                for link in enc.get("links", [])
+            )
+            + "</div>"
         )
         parts.append(bitgrid_html)
         parts.append(legend_html)
         parts.append(warn_html)
         parts.append(render_ranges_table(ranges))
         parts.append("</section>")
+    parts.append(page_nav)
     return html_page(instruction, "".join(parts))
 
 
@@ -556,6 +623,7 @@ def render_index_page(
     instruction_groups: dict[str, list[tuple[str, dict]]],
     name_to_file: dict[str, str],
     inst_subdir: str,
+    title: str = "ISA Encoding Index",
 ) -> str:
     stats = meta.get("statistics") or {}
     summary_items = [
@@ -581,7 +649,7 @@ def render_index_page(
             f" <span class=\"mono\">({count})</span></li>"
         )
     body = (
-        "<header><h1>ISA Encoding Index</h1></header>"
+        f"<header><h1>{html.escape(title)}</h1></header>"
         "<div class=\"summary\">"
         + " | ".join(summary_items)
         + "</div>"
@@ -590,65 +658,240 @@ def render_index_page(
         + "</ul>"
         "<div class=\"note\">Counts in parentheses are number of forms per instruction.</div>"
     )
-    return html_page("ISA Encoding Index", body)
+    return html_page(title, body)
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(
-        description="Render encoding JSON into per-instruction HTML pages."
+def render_diff_side(label: str, enc: dict | None) -> str:
+    parts = ["<div class=\"diff-side\">", f"<h3>{html.escape(label)}</h3>"]
+    if enc is None:
+        parts.append("<div class=\"note\">(not present)</div></div>")
+        return "".join(parts)
+    ranges = enc.get("ranges", [])
+    bitgrid_html, warnings, normalized, range_colors = render_bitgrid(
+        ranges, encoding_width(ranges), row_bits=64
     )
-    parser.add_argument("encoding_json", help="Path to encoding.v1.json")
-    parser.add_argument(
-        "-o",
-        "--outdir",
-        required=True,
-        help="Output directory for HTML files",
+    parts.append(bitgrid_html)
+    parts.append(render_legend(normalized, range_colors))
+    if warnings:
+        parts.append("<div class=\"note\">warnings: " + ", ".join(warnings) + "</div>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def render_diff_instruction_page(
+    instruction: str,
+    items: list[tuple[str, dict | None, dict | None, dict | None]],
+    index_href: str,
+) -> str:
+    # items: (enc_key, old_enc, new_enc, diff_info)
+    parts = [
+        "<header>",
+        f"<h1>{html.escape(instruction)}</h1>",
+        f"<a href=\"{html.escape(index_href)}\">index</a>",
+        "</header>",
+        "<div class=\"summary\">",
+        f"{len(items)} changed encodings; left is the baseline, right is the new layout.",
+        "</div>",
+    ]
+    for enc_key, old_enc, new_enc, info in items:
+        parts.append("<section class=\"encoding\">")
+        parts.append(f"<h2>{html.escape(enc_key)}</h2>")
+        if info is not None:
+            bits = ", ".join(f"[{hi - 1}:{lo}]" for lo, hi in info["changed_bits"])
+            parts.append(
+                f"<div class=\"encoding-meta\">changed bits: <span class=\"mono\">{html.escape(bits or 'none')}</span></div>"
+            )
+            parts.append(
+                "<ul class=\"changes mono\">"
+                + "".join(f"<li>{html.escape(fmt_change(c))}</li>" for c in info["changes"])
+                + "</ul>"
+            )
+        parts.append("<div class=\"diff-pair\">")
+        parts.append(render_diff_side("old", old_enc))
+        parts.append(render_diff_side("new", new_enc))
+        parts.append("</div>")
+        parts.append("</section>")
+    return html_page(f"{instruction} (diff)", "".join(parts))
+
+
+def render_diff(old_path: Path, new_data: dict, new_path: Path, outdir: Path) -> int:
+    old_data = load_json(str(old_path))
+    diff = diff_encodings(old_data, new_data)
+    old_encs = old_data.get("encodings") or {}
+    new_encs = new_data.get("encodings") or {}
+
+    groups: dict[str, list[tuple[str, dict | None, dict | None, dict | None]]] = {}
+    for key in list(diff["changed"]) + diff["added"] + diff["removed"]:
+        old_enc = old_encs.get(key)
+        new_enc = new_encs.get(key)
+        instruction = (new_enc or old_enc).get("instruction", "")
+        groups.setdefault(instruction, []).append(
+            (key, old_enc, new_enc, diff["changed"].get(key))
+        )
+
+    name_to_file = allocate_filenames(sorted(groups))
+    inst_subdir = "instructions"
+    inst_dir = outdir / inst_subdir
+    os.makedirs(inst_dir, exist_ok=True)
+
+    s = diff["summary"]
+    list_items = []
+    for inst in sorted(groups):
+        filename = f"{inst_subdir}/{name_to_file[inst]}.html"
+        list_items.append(
+            f"<li><a href=\"{html.escape(filename)}\">{html.escape(inst)}</a>"
+            f" <span class=\"mono\">({len(groups[inst])})</span></li>"
+        )
+    body = (
+        "<header><h1>ISA Encoding Diff</h1></header>"
+        "<div class=\"summary\">"
+        f"old: {html.escape(str(old_path))} | new: {html.escape(str(new_path))} | "
+        f"unchanged: {s['unchanged']} | changed: {s['changed']} | "
+        f"added: {s['added']} | removed: {s['removed']}"
+        "</div>"
+        "<ul class=\"inst-list\">" + "".join(list_items) + "</ul>"
+        "<div class=\"note\">Counts in parentheses are changed/added/removed encodings per instruction.</div>"
     )
-    args = parser.parse_args()
+    (outdir / "index.html").write_text(html_page("ISA Encoding Diff", body), encoding="utf-8")
 
-    encoding_path = Path(args.encoding_json)
-    if not encoding_path.exists():
-        print(f"error: file not found: {encoding_path}", file=sys.stderr)
-        return 1
+    for instruction, items in groups.items():
+        items.sort(key=lambda x: x[0])
+        page_html = render_diff_instruction_page(instruction, items, "../index.html")
+        (inst_dir / (name_to_file[instruction] + ".html")).write_text(page_html, encoding="utf-8")
+    return 0
 
-    data = load_json(str(encoding_path))
-    encodings = data.get("encodings") or {}
-    if not isinstance(encodings, dict):
-        print("error: encodings must be an object", file=sys.stderr)
-        return 1
 
+def attach_xref_links(encodings: dict[str, dict], xref: dict, site: str) -> int:
+    # Link each encoding to the reference pages of the base names matched by xref_spec_ref.py.
+    forms = xref.get("forms") or {}
+    linked = 0
+    for enc_key, enc in encodings.items():
+        bases = (forms.get(enc_key) or {}).get("ref_base_names") or []
+        if not bases:
+            continue
+        enc["links"] = [
+            {"label": f"ref: {base}", "href": f"{site}/instructions/{safe_filename(base)}.html"}
+            for base in bases
+        ]
+        linked += 1
+    return linked
+
+
+def write_site(
+    outdir: Path,
+    source_path: str,
+    meta: dict,
+    encodings: dict[str, dict],
+    page_size: int = 0,
+    title: str = "ISA Encoding Index",
+) -> None:
     instruction_groups: dict[str, list[tuple[str, dict]]] = {}
     for enc_key, enc in encodings.items():
         instruction = enc.get("instruction", "")
         instruction_groups.setdefault(instruction, []).append((enc_key, enc))
 
     name_to_file = allocate_filenames(sorted(instruction_groups))
-    outdir = Path(args.outdir)
     os.makedirs(outdir, exist_ok=True)
     inst_subdir = "instructions"
     inst_dir = outdir / inst_subdir
     os.makedirs(inst_dir, exist_ok=True)
 
-    meta = data.get("meta") or {}
     index_html = render_index_page(
-        str(encoding_path),
+        source_path,
         meta,
         instruction_groups,
         name_to_file,
         inst_subdir,
+        title=title,
     )
     (outdir / "index.html").write_text(index_html, encoding="utf-8")
 
     for instruction, items in instruction_groups.items():
         items_sorted = sorted(items, key=lambda x: x[0])
-        page_html = render_instruction_page(
-            instruction,
-            items_sorted,
-            "../index.html",
-        )
-        filename = name_to_file[instruction] + ".html"
-        (inst_dir / filename).write_text(page_html, encoding="utf-8")
+        base = name_to_file[instruction]
+        # page_size=0 keeps one page per instruction.
+        chunk = page_size if page_size > 0 else max(1, len(items_sorted))
+        pages = [items_sorted[i : i + chunk] for i in range(0, len(items_sorted), chunk)]
+        for page, page_items in enumerate(pages):
+            page_html = render_instruction_page(
+                instruction,
+                page_items,
+                "../index.html",
+                page_nav=render_page_nav(base, page, len(pages)),
+                total_forms=len(items_sorted),
+            )
+            (inst_dir / page_filename(base, page)).write_text(page_html, encoding="utf-8")
 
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Render encoding JSON into per-instruction HTML pages."
+    )
+    parser.add_argument("encoding_json", help="Path to encoding.v1.json")
+    parser.add_argument(
+        "-o",
+        "--outdir",
+        required=True,
+        help="Output directory for HTML files",
+    )
+    parser.add_argument(
+        "--diff-against",
+        default="",
+        help="Baseline encoding JSON; render only encodings that differ from it",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=0,
+        help="Max encodings per instruction page (0 means one page per instruction)",
+    )
+    parser.add_argument(
+        "--xref",
+        default="",
+        help="Cross-reference JSON from xref_spec_ref.py; adds links to reference encodings",
+    )
+    parser.add_argument(
+        "--xref-site",
+        default="../ref",
+        help="Reference site root as seen from the output directory (default: ../ref)",
+    )
+    args = parser.parse_args()
+
+    encoding_path = Path(args.encoding_json)
+    if not encoding_path.exists():
+        print(f"error: file not found: {encoding_path}", file=sys.stderr)
+        return 1
+
+    data = load_json(str(encoding_path))
+    encodings = data.get("encodings") or {}
+    if not isinstance(encodings, dict):
+        print("error: encodings must be an object", file=sys.stderr)
+        return 1
+
+    if args.diff_against:
+        old_path = Path(args.diff_against)
+        if not old_path.exists():
+            print(f"error: file not found: {old_path}", file=sys.stderr)
+            return 1
+        outdir = Path(args.outdir)
+        os.makedirs(outdir, exist_ok=True)
+        return render_diff(old_path, data, encoding_path, outdir)
+
+    if args.xref:
+        xref_path = Path(args.xref)
+        if not xref_path.exists():
+            print(f"error: file not found: {xref_path}", file=sys.stderr)
+            return 1
+        # Instruction pages live one level below the output directory.
+        attach_xref_links(encodings, load_json(str(xref_path)), "../" + args.xref_site.rstrip("/"))
+
+    write_site(
+        Path(args.outdir),
+        str(encoding_path),
+        data.get("meta") or {},
+        encodings,
+        page_size=args.page_size,
+    )
     return 0
 
 
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/search_docs.py build
+#   python3 isa/search_docs.py query 'IADD3.*X'
+#   python3 isa/search_docs.py query 'rnd*' ftz --source spec
+#   python3 isa/search_docs.py query FADD --source sm90a --limit 5
+# Notes:
+#   - documents: every instruction, global_modifier_defs and global_oprnd_flag_defs entry of spec.jsonc,
+#     and every record of the reference-doc index built by isa/ref/parse_ref_docs.py (refreshed
+#     incrementally on each build, so unchanged HTML pages are not reparsed).
+#   - tokens are lowercased; dotted mnemonics are indexed whole and per part ("iadd3.x", "iadd3", "x");
+#     CJK runs are indexed as character bigrams.
+#   - query terms are ANDed; a term containing * or ? is a glob over the vocabulary (the literal
+#     prefix before the first wildcard narrows the candidates by binary search).
+#   - on-disk format (little-endian):
+#       magic "GPIDLFTS" | u32 version | u32 meta_len | zlib(JSON {docs, terms}) | u32 offsets[n_terms + 1] | postings
+#     postings of term i are postings[offsets[i]:offsets[i + 1]]: ascending doc ids, delta + LEB128 varint.
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import fnmatch
+import json
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "ref"))
+
+from parse_ref_docs import DEFAULT_INDEX as DEFAULT_DOCS_INDEX  # noqa: E402
+from parse_ref_docs import load_index, refresh_index, save_index  # noqa: E402
+from validate_spec_format import load_jsonc  # noqa: E402
+
+MAGIC = b"GPIDLFTS"
+FORMAT_VERSION = 1
+DEFAULT_SEARCH_INDEX = Path(__file__).with_name("search-docs.idx")
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.]*")
+_CJK_RE = re.compile(r"[㐀-鿿]+")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Full-text index over spec.jsonc and the ISA reference docs.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("build", help="Build the search index.")
+    p.add_argument("--spec", default=str(Path(__file__).with_name("spec.jsonc")), help="Path to spec.jsonc")
+    p.add_argument("--docs-index", default=str(DEFAULT_DOCS_INDEX), help="parse_ref_docs.py index (refreshed)")
+    p.add_argument("--jobs", type=int, default=1, help="Worker processes for reparsing changed HTML pages")
+    p.add_argument("-o", "--out", default=str(DEFAULT_SEARCH_INDEX), help="Output index path")
+
+    p = sub.add_parser("query", help="Query the search index.")
+    p.add_argument("terms", nargs="+", help="Terms (ANDed); * and ? are globs")
+    p.add_argument("--index", default=str(DEFAULT_SEARCH_INDEX), help="Search index path")
+    p.add_argument("--source", default="", help="Only hits from this source (spec / sm90a / maxwell)")
+    p.add_argument("--limit", type=int, default=20, help="Max hits printed (0 means no limit)")
+    return parser.parse_args()
+
+
+def tokenize(text: str) -> set[str]:
+    tokens: set[str] = set()
+    for m in _WORD_RE.finditer(text):
+        word = m.group(0).strip(".").lower()
+        if not word:
+            continue
+        tokens.add(word)
+        if "." in word:
+            tokens.update(p for p in word.split(".") if p)
+    for m in _CJK_RE.finditer(text):
+        run = m.group(0)
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def flatten_text(value: Any) -> Iterator[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield str(k)
+            yield from flatten_text(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from flatten_text(v)
+    elif value is not None:
+        yield str(value)
+
+
+def iter_spec_docs(spec: dict) -> Iterator[tuple[str, str, str, str]]:
+    # (source, location, title, text)
+    for section in ("global_oprnd_flag_defs", "global_modifier_defs"):
+        for name, d in (spec.get(section) or {}).items():
+            yield "spec", f"{section}.{name}", name, " ".join([name, *flatten_text(d)])
+    for name, inst in (spec.get("instructions") or {}).items():
+        behavior = inst.get("behavior") or {}
+        title = f"{name} ({behavior.get('SASS')})" if behavior.get("SASS") else name
+        yield "spec", f"instructions.{name}", title, " ".join([name, *flatten_text(inst)])
+
+
+def iter_ref_docs(docs_index: dict) -> Iterator[tuple[str, str, str, str]]:
+    for rel, page in docs_index["pages"].items():
+        for i, rec in enumerate(page["records"]):
+            title = rec.get("syntax", [rec["name"]])[0] if rec.get("syntax") else rec["name"]
+            yield page["source"], f"{rel}#{i}", title, " ".join(flatten_text(rec))
+
+
+def encode_postings(doc_ids: list[int]) -> bytes:
+    out = bytearray()
+    prev = 0
+    for d in doc_ids:
+        delta = d - prev
+        prev = d
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(buf: bytes | memoryview) -> list[int]:
+    out = []
+    cur = 0
+    shift = 0
+    delta = 0
+    for b in buf:
+        delta |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        cur += delta
+        out.append(cur)
+        delta = 0
+        shift = 0
+    return out
+
+
+def build_index(docs: list[tuple[str, str, str, str]]) -> bytes:
+    postings: dict[str, list[int]] = defaultdict(list)
+    for doc_id, (_source, _loc, _title, text) in enumerate(docs):
+        for tok in tokenize(text):
+            postings[tok].append(doc_id)
+    terms = sorted(postings)
+    offsets = array("I", [0])
+    blob = bytearray()
+    for t in terms:
+        blob += encode_postings(postings[t])
+        offsets.append(len(blob))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    meta = zlib.compress(
+        json.dumps(
+            {"docs": [[s, loc, title] for s, loc, title, _ in docs], "terms": terms},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    )
+    return MAGIC + struct.pack("<II", FORMAT_VERSION, len(meta)) + meta + offsets.tobytes() + bytes(blob)
+
+
+class SearchIndex:
+    def __init__(self, data: bytes) -> None:
+        if data[:8] != MAGIC:
+            raise ValueError("not a search index (bad magic)")
+        version, meta_len = struct.unpack_from("<II", data, 8)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported index version {version}")
+        pos = 16
+        meta = json.loads(zlib.decompress(data[pos : pos + meta_len]))
+        pos += meta_len
+        self.docs: list[list[str]] = meta["docs"]
+        self.terms: list[str] = meta["terms"]
+        n = len(self.terms) + 1
+        self.offsets = array("I")
+        self.offsets.frombytes(data[pos : pos + 4 * n])
+        if sys.byteorder != "little":
+            self.offsets.byteswap()
+        self.postings = memoryview(data)[pos + 4 * n :]
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        return cls(path.read_bytes())
+
+    def term_docs(self, i: int) -> list[int]:
+        return decode_postings(self.postings[self.offsets[i] : self.offsets[i + 1]])
+
+    def expand(self, term: str) -> list[int]:
+        # Vocabulary indices matching one query term.
+        term = term.lower()
+        if not any(c in term for c in "*?["):
+            i = bisect.bisect_left(self.terms, term)
+            return [i] if i < len(self.terms) and self.terms[i] == term else []
+        prefix = re.split(r"[*?\[]", term, maxsplit=1)[0]
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff") if prefix else len(self.terms)
+        return [i for i in range(lo, hi) if fnmatch.fnmatchcase(self.terms[i], term)]
+
+    def search(self, query_terms: list[str]) -> tuple[list[int], list[list[str]]]:
+        # Returns (doc ids matching every term, matched vocabulary per term).
+        result: set[int] | None = None
+        matched = []
+        for qt in query_terms:
+            qt_tokens = tokenize(qt) if not any(c in qt for c in "*?[") else {qt.lower()}
+            # A plain term that tokenizes into several tokens (e.g. "iadd3.x") must match all of them.
+            for tok in sorted(qt_tokens) or [qt.lower()]:
+                idx = self.expand(tok)
+                matched.append([self.terms[i] for i in idx])
+                docs: set[int] = set()
+                for i in idx:
+                    docs.update(self.term_docs(i))
+                result = docs if result is None else result & docs
+                if not result:
+                    return [], matched
+        return sorted(result or ()), matched
+
+
+def cmd_build(args: argparse.Namespace) -> int:
+    t0 = time.perf_counter()
+    spec = load_jsonc(args.spec)
+    docs_path = Path(args.docs_index)
+    old = load_index(docs_path) if docs_path.exists() else None
+    docs_index, counts = refresh_index(old, args.jobs)
+    save_index(docs_path, docs_index)
+    docs = list(iter_spec_docs(spec)) + list(iter_ref_docs(docs_index))
+    data = build_index(docs)
+    Path(args.out).write_bytes(data)
+    dt = time.perf_counter() - t0
+    print(
+        f"Wrote {args.out}: {len(docs)} documents, {len(SearchIndex(data).terms)} terms, {len(data)} bytes "
+        f"(ref pages: {counts['parsed']} parsed, {counts['reused']} reused; {dt:.2f}s)"
+    )
+    return 0
+
+
+def cmd_query(args: argparse.Namespace) -> int:
+    path = Path(args.index)
+    if not path.exists():
+        print(f"error: index not found: {path} (run `build` first)", file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    index = SearchIndex.load(path)
+    t1 = time.perf_counter()
+    hits, matched = index.search(args.terms)
+    if args.source:
+        hits = [d for d in hits if index.docs[d][0] == args.source]
+    t2 = time.perf_counter()
+    shown = hits[: args.limit] if args.limit else hits
+    for d in shown:
+        source, loc, title = index.docs[d]
+        print(f"{source:8} {loc}  {title}")
+    expanded = "; ".join(", ".join(m[:8]) + (" ..." if len(m) > 8 else "") for m in matched)
+    more = f", showing {len(shown)}" if len(shown) < len(hits) else ""
+    print(
+        f"-- {len(hits)} hits{more} | terms: {expanded or '-'} | "
+        f"load {(t1 - t0) * 1e3:.1f} ms, query {(t2 - t1) * 1e3:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0 if hits else 1
+
+
+def main() -> int:
+    args = parse_args()
+    if args.cmd == "build":
+        return cmd_build(args)
+    return cmd_query(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/banks.py trace.npy
+#   python3 isa/sim/banks.py trace.txt --banks 16
+# Notes:
+#   - shared-memory bank-conflict analyzer. Shared memory has `--banks` (default 32) banks of 4-byte words,
+#     word w in bank w % banks. One warp request is served in phases of 128 bytes (all 32 lanes for 4-byte
+#     and narrower accesses, 16 lanes for 8-byte, 8 lanes for 16-byte, 4 lanes for 32-byte); a phase takes
+#     as many wavefronts as the largest number of distinct words any bank holds in it (lanes reading the
+#     same word share it). Replays are the wavefronts beyond one per phase.
+#   - each request is analyzed with one histogram: its distinct (phase, word) pairs are counted per bank
+#     with np.bincount, over every request of an instruction (or of a whole trace) at once.
+#   - inline: warp.py / batch.py / parallel.py `--bank-conflicts` analyze every shared-memory access (atoms,
+#     shared LD / ST, and the generic accesses that fall in the shared window) per static instruction;
+#     `--bank-trace FILE` also writes the accesses as a trace.
+#   - offline: a trace is a .npy file of TRACE_DTYPE records, or a text file with one access per line,
+#     `seq pc lane addr nbytes` (decimal or 0x hex, `#` comments). Accesses with the same `seq` form one
+#     warp request; `addr` is the byte address within shared memory.
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+import numpy as np
+
+BANKS = 32
+BANK_WIDTH = 4
+PHASE_BYTES = 128
+LANES = 32
+
+TRACE_DTYPE = np.dtype([("seq", "<u8"), ("pc", "<u4"), ("lane", "u1"), ("nbytes", "u1"), ("addr", "<u4")])
+
+
+def analyze(
+    seq: np.ndarray, lane: np.ndarray, addr: np.ndarray, nbytes: np.ndarray, banks: int = BANKS
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Per request (sorted by seq): (seq, wavefronts, phases, worst bank degree of any phase).
+    seq = np.asarray(seq, dtype=np.int64)
+    words = np.maximum(np.asarray(nbytes, dtype=np.int64) // BANK_WIDTH, 1)
+    phase = np.asarray(lane, dtype=np.int64) // np.maximum(PHASE_BYTES // (words * BANK_WIDTH), 1)
+    # One element per word a lane touches.
+    rep = np.repeat(np.arange(seq.size), words)
+    word = (np.asarray(addr, dtype=np.int64) // BANK_WIDTH)[rep]
+    word += np.arange(rep.size) - np.repeat(np.cumsum(words) - words, words)
+    reqphase, rp = np.unique(seq[rep] * 8 + phase[rep], return_inverse=True)
+    distinct = np.unique((rp.astype(np.int64) << 32) | word)
+    hist = np.bincount((distinct >> 32) * banks + (distinct & 0xFFFFFFFF) % banks, minlength=reqphase.size * banks)
+    degree = hist.reshape(reqphase.size, banks).max(axis=1)
+    req, r = np.unique(reqphase >> 3, return_inverse=True)
+    worst = np.zeros(req.size, dtype=np.int64)
+    np.maximum.at(worst, r, degree)
+    return req, np.bincount(r, weights=degree).astype(np.int64), np.bincount(r), worst
+
+
+class BankStats:
+    # Per pc: [instruction key, requests, wavefronts, phases, worst degree]; `trace` keeps the accesses.
+    def __init__(self, banks: int = BANKS, trace: bool = False) -> None:
+        self.banks = banks
+        self.rows: dict[int, list] = {}
+        self.next_seq = 0
+        self.chunks: list[np.ndarray] | None = [] if trace else None
+
+    def add(self, pc: int, key: str, requests: int, wavefronts: int, phases: int, worst: int) -> None:
+        row = self.rows.setdefault(pc, [key, 0, 0, 0, 0])
+        row[1] += requests
+        row[2] += wavefronts
+        row[3] += phases
+        row[4] = max(row[4], worst)
+
+    def record(
+        self, pc: int, key: str, warps: int, rows: np.ndarray, lanes: np.ndarray, addr: np.ndarray, nbytes: int
+    ) -> None:
+        # One instruction over `warps` warps; rows / lanes / addr: its shared-memory lanes.
+        seq = self.next_seq + rows
+        self.next_seq += warps
+        if addr.size == 0:
+            return
+        n = np.full(addr.size, nbytes)
+        req, wave, phases, worst = analyze(seq, lanes, addr, n, self.banks)
+        self.add(pc, key, req.size, int(wave.sum()), int(phases.sum()), int(worst.max()))
+        if self.chunks is not None:
+            t = np.empty(addr.size, dtype=TRACE_DTYPE)
+            t["seq"], t["pc"], t["lane"], t["nbytes"], t["addr"] = seq, pc, lanes, nbytes, addr
+            self.chunks.append(t)
+
+    def merge(self, other: BankStats) -> None:
+        for pc, row in other.rows.items():
+            self.add(pc, *row)
+        if self.chunks is not None and other.chunks:
+            for t in other.chunks:
+                t = t.copy()
+                t["seq"] += self.next_seq
+                self.chunks.append(t)
+        self.next_seq += other.next_seq
+
+    def trace(self) -> np.ndarray:
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=TRACE_DTYPE)
+
+    def report(self) -> list[str]:
+        lines = [f"{'pc':>6}  {'instruction':<28} {'requests':>9} {'wavefronts':>10} {'replays':>9} "
+                 f"{'degree':>7} {'worst':>5}"]
+        for pc in sorted(self.rows):
+            key, requests, wave, phases, worst = self.rows[pc]
+            lines.append(
+                f"{pc:#6x}  {key:<28} {requests:>9} {wave:>10} {wave - phases:>9} {wave / phases:>7.2f} {worst:>5}"
+            )
+        return lines
+
+
+def analyze_trace(trace: np.ndarray, banks: int = BANKS) -> BankStats:
+    # Per-pc statistics of a whole trace; a request's pc is the pc of its first access.
+    stats = BankStats(banks)
+    if trace.size == 0:
+        return stats
+    req, wave, phases, worst = analyze(trace["seq"], trace["lane"], trace["addr"], trace["nbytes"], banks)
+    seq = trace["seq"].astype(np.int64)
+    order = np.argsort(seq, kind="stable")
+    first = order[np.searchsorted(seq[order], req)]
+    pcs = trace["pc"][first]
+    for pc in np.unique(pcs):
+        sel = pcs == pc
+        stats.add(int(pc), "-", int(sel.sum()), int(wave[sel].sum()), int(phases[sel].sum()), int(worst[sel].max()))
+    stats.next_seq = int(req.max()) + 1
+    return stats
+
+
+def load_trace(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        trace = np.load(path)
+        if trace.dtype != TRACE_DTYPE:
+            raise ValueError(f"{path}: expected records of {TRACE_DTYPE}, got {trace.dtype}")
+        return trace
+    cols = np.loadtxt(path, dtype=np.int64, comments="#", ndmin=2, converters=lambda s: int(s, 0))
+    if cols.size and cols.shape[1] != 5:
+        raise ValueError(f"{path}: expected 5 columns (seq pc lane addr nbytes), got {cols.shape[1]}")
+    trace = np.zeros(len(cols), dtype=TRACE_DTYPE)
+    if cols.size:
+        for j, name in enumerate(("seq", "pc", "lane", "addr", "nbytes")):
+            trace[name] = cols[:, j]
+    return trace
+
+
+def add_bank_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--bank-conflicts", action="store_true", help="Print shared-memory bank conflicts per instruction"
+    )
+    parser.add_argument("--bank-trace", default="", help="Write the shared-memory accesses to this .npy trace")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Shared-memory bank conflicts of a recorded address trace.")
+    parser.add_argument("trace", help=".npy trace (TRACE_DTYPE) or text trace (seq pc lane addr nbytes)")
+    parser.add_argument("--banks", type=int, default=BANKS, help="Number of 4-byte banks (default: 32)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        if args.banks < 1:
+            raise ValueError("--banks must be positive")
+        trace = load_trace(args.trace)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    stats = analyze_trace(trace, args.banks)
+    print("\n".join(stats.report()))
+    print(f"-- {trace.size} accesses in {sum(r[1] for r in stats.rows.values())} requests", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/batch.py isa/encoding.v1.json isa/spec.jsonc prog.json --ctas 128 --block 256
+#   python3 isa/sim/batch.py isa/encoding.v1.json isa/spec.jsonc prog.json --ctas 16 --block 96 --dump R1 --warp 5
+#   python3 isa/sim/batch.py isa/encoding.v1.json isa/spec.jsonc prog.json --ctas 64 --block 128 --verify 8
+# Notes:
+#   - a kernel launch (`--ctas` CTAs of `--block` threads, 1-D) is one WarpBatch: every register file has a
+#     warp axis after the register index, VGPR (256, warps, 32), SGPR (64, warps), predicates (8, warps), so
+#     one register of a group of warps is a dense block. Lanes past the block size start inactive.
+#   - each step picks a pc, gathers the warps at it into a WarpGroup and runs the warp.py handler once for
+#     all of them; a group of every warp uses slices (views), so converged warps cost one NumPy expression
+#     per operand regardless of the warp count.
+#   - `--schedule min-pc` (default) always runs the lowest pc, so lagging warps catch up and merge into the
+#     larger group; `round-robin` runs every distinct pc once per round. Under min-pc a group runs its
+#     translated basic block (warp.Program.block) in one go, up to the first pc another path is at, so
+#     the group is gathered once per block instead of once per instruction.
+#   - divergence: the batch rows are paths (warp, pc, lane mask). Until a branch diverges path i is warp i;
+#     a divergent `bra` appends its taken lanes as a new path, so a group holds the paths at one pc (one per
+#     warp) and each path's mask is applied in the same NumPy step. Paths of a warp that meet at a pc
+#     merge after every round; under round-robin they meet only where a `bsync` holds them. Bx registers
+#     and exited lanes are per warp; `--simt` sums the active lanes of every step per instruction.
+#   - `--chunk` (default 1024) caps the warps of one NumPy expression: a group is stepped in chunks, which
+#     keeps each operand array cache-sized; very large groups are memory-bound and run slower.
+#   - measured throughput (one core, `--block 128`, 1024-8192 warps): about 600M lane-ops/s on a converged
+#     loop, 140-190M on a straight-line ALU mix with FFMA / I2F / BREV / LOP3 (their per-op NumPy kernels,
+#     not the per-group dispatch, dominate), and far less on programs of a few dozen instructions, where
+#     the launch and register setup outweigh execution. Divergent or scattered-pc programs split into
+#     small groups and drop towards single-warp speed.
+#   - `--verify N` reruns N warps on warp.py's single-warp WarpState (each on the initial global memory) and
+#     compares the final registers; warps that load what other warps store can differ.
+#   - global memory (`--gmem`, `--gmem-in`, `--gmem-out`) and the constant banks are shared by all warps,
+#     shared memory by the warps of a CTA (`cta_slot`); `--mem-stats` prints the per-instruction sector /
+#     line statistics and `--bank-conflicts` the shared-memory bank conflicts of the whole launch. See
+#     memory.py and banks.py.
+#   - `--trace FILE` writes the exectrace.py binary trace of the launch, one record per warp of a group
+#     (warp ids are batch rows plus `warp_base`, the grid index of the batch's first warp).
+#   - per-warp CSRs are filled as in warp.py (CTAID_X, NTID_X, WARPID within the CTA, NCTAID_X; TID_X and
+#     LANEID per lane).
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import exectrace
+import memory
+from decode import LANES, PT, RZ, URZ, assemble, load_decoder, parse_operand
+from warp import (
+    BARRIERS, BLOCK_CACHE, CSR_CTAID, CSR_LANEID, CSR_NCTAID, CSR_NTID, CSR_TID, CSR_WARPID, FULL_MASK, Program,
+    SimtStats, WarpState, apply_sets, format_lanes, pack_lanes, popcount, unpack_lanes,
+)
+from warp import run as run_warp
+
+
+class WarpBatch:
+    def __init__(self, n_warps: int) -> None:
+        self.n = n_warps
+        # Register-major: one register of every warp is contiguous, so an operand of a converged group is
+        # a dense block rather than one 128-byte row per warp spread over the whole register file.
+        self.vgpr = np.zeros((RZ + 1, n_warps, LANES), dtype=np.uint32)
+        self.sgpr = np.zeros((URZ + 1, n_warps), dtype=np.uint32)
+        self.pred = np.zeros((PT + 1, n_warps), dtype=np.uint32)
+        self.pred[PT] = FULL_MASK
+        self.csr = np.zeros((64, n_warps), dtype=np.uint32)
+        self.lane_csr = np.zeros((64, n_warps, LANES), dtype=np.uint32)
+        self.breg = np.zeros((n_warps, BARRIERS), dtype=np.uint32)
+        self.bpc = np.zeros((n_warps, BARRIERS), dtype=np.int64)
+        self.exited = np.zeros(n_warps, dtype=np.uint32)
+        # Paths: a warp (`warp`) at a pc with a lane mask. Until a branch diverges, path i is warp i; a
+        # divergent branch appends the taken lanes as a new path, and paths of a warp meeting at a pc merge.
+        self.warp = np.arange(n_warps)
+        self.pc = np.zeros(n_warps, dtype=np.int64)
+        self.done = np.zeros(n_warps, dtype=bool)
+        self.held = np.zeros(n_warps, dtype=bool)
+        self.exec_mask = np.full(n_warps, FULL_MASK, dtype=np.uint32)
+        self.active = unpack_lanes(self.exec_mask)
+        self.diverged = False
+        self.mem: memory.AddressSpaces | None = None
+        self.trace: exectrace.TraceWriter | None = None
+        # Trace warp id of warp 0 (set by launch: the first warp of the batch within the grid).
+        self.warp_base = 0
+        # Shared / local memory slots: CTA of each warp (set by launch), thread of each lane.
+        self.cta_slot = np.zeros(n_warps, dtype=np.int64)
+        self.thread_slot = np.arange(n_warps * LANES, dtype=np.int64).reshape(n_warps, LANES)
+
+    @property
+    def paths(self) -> int:
+        return len(self.pc)
+
+    def set_exec(self, idx, mask) -> None:
+        self.exec_mask[idx] = mask
+        self.active[idx] = unpack_lanes(self.exec_mask[idx])
+
+    def group(self, idx, pc: int) -> WarpGroup:
+        return WarpGroup(self, idx, pc)
+
+    def resolve(self, idx, group: WarpGroup) -> None:
+        # Apply the group's branch / bsync requests to its paths `idx`.
+        rows = np.arange(self.paths)[idx]
+        if group.blocked is not None and group.blocked.any():
+            r = rows[group.blocked]
+            self.pc[r] = group.pc
+            self.held[r] = True
+        if group.jump is None:
+            return
+        target, taken = group.jump
+        taken = taken & group.exec_mask
+        self.pc[rows[(taken == group.exec_mask) & (taken != 0)]] = target
+        split = (taken != 0) & (taken != group.exec_mask)
+        if not split.any():
+            return
+        # Divergent paths: the fall-through lanes stay in the row, the taken lanes become a new path.
+        r = rows[split]
+        self.set_exec(r, group.exec_mask[split] & ~taken[split])
+        k = len(r)
+        self.warp = np.concatenate([self.warp, self.warp[r]])
+        self.pc = np.concatenate([self.pc, np.full(k, target, dtype=np.int64)])
+        self.done = np.concatenate([self.done, np.zeros(k, dtype=bool)])
+        self.held = np.concatenate([self.held, np.zeros(k, dtype=bool)])
+        self.exec_mask = np.concatenate([self.exec_mask, taken[split]])
+        self.active = np.concatenate([self.active, unpack_lanes(taken[split])])
+        self.diverged = True
+
+    def exit(self, idx) -> None:
+        # Paths `idx` left the program: their lanes exit and the held bsyncs of their warps are retried.
+        self.done[idx] = True
+        w = self.warp[idx]
+        self.exited[w] |= self.exec_mask[idx]
+        if self.held.any():
+            self.held[np.isin(self.warp, w)] = False
+
+    def merge(self) -> None:
+        # Merge the paths of a warp that meet at a pc (a held path that gains lanes retries its bsync) and
+        # drop finished paths, keeping them ordered by warp; once every warp is one path again, path i is
+        # warp i.
+        live = np.flatnonzero(~self.done)
+        keys = (self.warp[live] << 32) | self.pc[live]
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        keep = live[first]
+        mask = np.zeros(len(keep), dtype=np.uint32)
+        np.bitwise_or.at(mask, inverse, self.exec_mask[live])
+        held = self.held[keep] & (counts == 1)
+        self.warp, self.pc = self.warp[keep], self.pc[keep]
+        self.done = np.zeros(len(keep), dtype=bool)
+        self.held = held
+        self.exec_mask = mask
+        self.active = unpack_lanes(mask)
+        if len(keep) == self.n and np.array_equal(self.warp, np.arange(self.n)):
+            self.diverged = False
+
+
+def launch(n_ctas: int, block: int, first_cta: int = 0, grid: int | None = None) -> WarpBatch:
+    # CTAs first_cta .. first_cta + n_ctas - 1 of a 1-D grid of `grid` (default n_ctas) 1-D CTAs; the last
+    # warp of a CTA has its lanes past `block` inactive.
+    per_cta = -(-block // LANES)
+    batch = WarpBatch(n_ctas * per_cta)
+    cta = np.repeat(np.arange(first_cta, first_cta + n_ctas, dtype=np.uint32), per_cta)
+    wid = np.tile(np.arange(per_cta, dtype=np.uint32), n_ctas)
+    batch.csr[CSR_CTAID] = cta
+    batch.csr[CSR_NTID] = block
+    batch.csr[CSR_NTID + 1] = 1
+    batch.csr[CSR_NTID + 2] = 1
+    batch.csr[CSR_WARPID] = wid
+    batch.cta_slot[:] = np.repeat(np.arange(n_ctas), per_cta)
+    batch.warp_base = first_cta * per_cta
+    batch.csr[CSR_NCTAID] = n_ctas if grid is None else grid
+    batch.csr[CSR_NCTAID + 1] = 1
+    batch.csr[CSR_NCTAID + 2] = 1
+    tid = wid[:, None] * LANES + np.arange(LANES, dtype=np.uint32)
+    batch.lane_csr[CSR_TID] = tid
+    batch.lane_csr[CSR_LANEID] = np.arange(LANES, dtype=np.uint32)
+    batch.set_exec(slice(None), pack_lanes(tid < block))
+    return batch
+
+
+def init_registers(batch: WarpBatch, sets: list[str]) -> None:
+    # The same `--set REG=VALUE` initial values in every warp.
+    probe = WarpState()
+    apply_sets(probe, sets)
+    batch.vgpr[:] = probe.vgpr[:, None]
+    batch.sgpr[:] = probe.sgpr[:, None]
+    batch.pred[:] = probe.pred[:, None]
+
+
+class WarpGroup:
+    # The paths `rows` (a slice or an index array) of a WarpBatch, all at `pc`, one per warp; same accessors
+    # as WarpState. `idx` are their warps.
+    def __init__(self, batch: WarpBatch, rows, pc: int) -> None:
+        self.b = batch
+        self.idx = batch.warp[rows] if batch.diverged else rows
+        self.pc = pc
+        self.mem = batch.mem
+        self.trace = batch.trace
+        self.cta_slot = batch.cta_slot[self.idx][:, None]
+        self.thread_slot = batch.thread_slot[self.idx]
+        self.next_pc = pc
+        self.jump = None
+        self.blocked = None
+        self.exec_mask = batch.exec_mask[rows]
+        self.active = batch.active[rows]
+        self.all_active = bool(np.all(self.exec_mask == FULL_MASK))
+        self.lane_shape = (len(self.exec_mask), LANES)
+
+    def v(self, r: int) -> np.ndarray:
+        return self.b.vgpr[r, self.idx]
+
+    def x(self, r: int) -> np.ndarray:
+        return self.b.sgpr[r, self.idx]
+
+    def xv(self, r: int) -> np.ndarray:
+        return self.b.sgpr[r, self.idx][:, None]
+
+    def p(self, i: int) -> np.ndarray:
+        return unpack_lanes(self.b.pred[i, self.idx])
+
+    def pmask(self, i: int) -> np.ndarray:
+        return self.b.pred[i, self.idx]
+
+    def csr_value(self, i: int) -> np.ndarray:
+        return self.b.csr[i, self.idx]
+
+    def lane_csr_value(self, i: int) -> np.ndarray:
+        return self.b.lane_csr[i, self.idx]
+
+    def set_v(self, r: int, value) -> None:
+        if r == RZ:
+            return
+        if self.all_active:
+            self.b.vgpr[r, self.idx] = value
+        else:
+            self.b.vgpr[r, self.idx] = np.where(self.active, value, self.b.vgpr[r, self.idx])
+        if self.trace is not None:
+            self.trace.reg(exectrace.VREG, r, self.exec_mask, self.b.vgpr[r, self.idx])
+
+    def set_x(self, r: int, value) -> None:
+        if r != URZ:
+            self.b.sgpr[r, self.idx] = value
+            if self.trace is not None:
+                self.trace.reg(exectrace.SREG, r, self.exec_mask, self.b.sgpr[r, self.idx])
+
+    def set_p(self, i: int, lanes: np.ndarray) -> None:
+        if i != PT:
+            m = self.exec_mask
+            self.b.pred[i, self.idx] = (self.b.pred[i, self.idx] & ~m) | (pack_lanes(lanes) & m)
+            if self.trace is not None:
+                self.trace.reg(exectrace.PRED, i, m, self.b.pred[i, self.idx])
+
+    def set_csr(self, i: int, value) -> None:
+        self.b.csr[i, self.idx] = value
+        if self.trace is not None:
+            self.trace.reg(exectrace.CSR, i, self.exec_mask, self.b.csr[i, self.idx])
+
+    def bx(self, i: int) -> np.ndarray:
+        return self.b.breg[self.idx, i]
+
+    def set_bx(self, i: int, mask, pc: int) -> None:
+        self.b.breg[self.idx, i] = mask
+        self.b.bpc[self.idx, i] = pc
+
+    def branch(self, target: int, taken) -> None:
+        self.jump = (target, taken)
+
+    def wait(self, mask) -> None:
+        self.blocked = (mask & ~self.b.exited[self.idx] & ~self.exec_mask) != 0
+
+
+def chunks(idx, n: int, chunk: int):
+    # Split a group into pieces of at most `chunk` warps (slices stay slices, so they stay views).
+    if isinstance(idx, slice):
+        return [slice(s, min(s + chunk, n)) for s in range(0, n, chunk)] if n > chunk else [idx]
+    return [idx[s:s + chunk] for s in range(0, len(idx), chunk)]
+
+
+def run(
+    program: Program, batch: WarpBatch, schedule: str = "min-pc", chunk: int = 1024, max_steps: int = 1 << 62,
+    simt: SimtStats | None = None,
+) -> tuple[int, int]:
+    # Returns (group steps, warp instructions).
+    steps = warp_instrs = 0
+    with np.errstate(all="ignore"):
+        while steps < max_steps:
+            live = np.flatnonzero(~batch.done & ~batch.held)
+            if live.size == 0:
+                if not batch.done.all():
+                    held = sorted(set(batch.pc[~batch.done].tolist()))
+                    raise RuntimeError(f"bsync deadlock: every path held at {', '.join(map(hex, held))}")
+                break
+            pcs = batch.pc[live]
+            lo = int(pcs.min())
+            if lo == int(pcs.max()):
+                groups = [(lo, slice(None) if live.size == batch.paths else live)]
+            elif schedule == "min-pc":
+                groups = [(lo, live[pcs == lo])]
+            else:
+                uniq, inverse = np.unique(pcs, return_inverse=True)
+                groups = [(int(pc), live[inverse == j]) for j, pc in enumerate(uniq)]
+            for pc, idx in groups:
+                block = program.block(pc)
+                if block is None:
+                    batch.exit(idx)
+                    continue
+                ops = block.ops[:min(max_steps - steps, 1 if schedule == "round-robin" else len(block.ops))]
+                # min-pc: the group runs its block until it reaches the pc of another path, where they merge.
+                rest = batch.pc[~batch.done]
+                ahead = rest[rest > pc]
+                if ahead.size:
+                    ops = [o for o in ops if o[0] < ahead.min()]
+                for part in chunks(idx, batch.paths, chunk):
+                    group = batch.group(part, pc)
+                    lanes = int(popcount(group.exec_mask).sum()) if simt is not None else 0
+                    ids = batch.warp_base + np.arange(batch.n)[group.idx] if batch.trace is not None else None
+                    for op_pc, op, next_pc, key in ops:
+                        group.pc = op_pc
+                        group.next_pc = next_pc
+                        if ids is not None:
+                            batch.trace.step(op_pc, ids, group.exec_mask)
+                        op(group)
+                        if simt is not None:
+                            simt.record(op_pc, key, len(group.exec_mask), lanes)
+                    batch.pc[part] = group.next_pc
+                    if group.jump is not None or group.blocked is not None:
+                        batch.resolve(part, group)
+                    warp_instrs += len(group.exec_mask) * len(ops)
+                steps += len(ops)
+            if batch.diverged:
+                batch.merge()
+    return steps, warp_instrs
+
+
+def verify(
+    program: Program, batch: WarpBatch, init: list[str], warps: np.ndarray, image: np.ndarray | None = None
+) -> list[str]:
+    # Rerun the chosen warps one by one on WarpState, each on a fresh copy of the initial global memory
+    # `image` and empty shared / local memory; returns a message per mismatch.
+    errors = []
+    for w in warps:
+        w = int(w)
+        state = WarpState()
+        state.csr[:] = batch.csr[:, w]
+        state.lane_csr[:] = batch.lane_csr[:, w]
+        state.set_exec(int(pack_lanes(batch.lane_csr[CSR_TID, w] < batch.csr[CSR_NTID, w])))
+        apply_sets(state, init)
+        if image is not None:
+            mem = batch.mem
+            state.mem = memory.AddressSpaces(
+                memory.FlatMemory(image.copy()), 1, LANES, mem.shared_size, mem.local_size, mem.const
+            )
+        run_warp(program, state)
+        for name, a, b in (("vgpr", state.vgpr, batch.vgpr[:, w]), ("sgpr", state.sgpr, batch.sgpr[:, w]),
+                           ("pred", state.pred, batch.pred[:, w])):
+            if not np.array_equal(a, b):
+                errors.append(f"warp {w}: {name} differs")
+    return errors
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a kernel launch on the batched multi-warp simulator.")
+    parser.add_argument("encoding", help="Encoding JSON (encoding_synthesis v1 / v2 output)")
+    parser.add_argument("spec", help="Path to spec.jsonc")
+    parser.add_argument("program", help="JSON program (see decode.py --asm)")
+    parser.add_argument("--ctas", type=int, default=1, help="Number of CTAs (default: 1)")
+    parser.add_argument("--block", type=int, default=LANES, help="Threads per CTA (default: 32)")
+    parser.add_argument("--set", dest="sets", action="append", default=[], help="Initial value REG=VALUE (repeatable)")
+    parser.add_argument("--schedule", choices=["min-pc", "round-robin"], default="min-pc", help="PC group order")
+    parser.add_argument("--chunk", type=int, default=1024, help="Max warps per NumPy step (default: 1024)")
+    parser.add_argument("--dump", default="", help="Comma-separated registers of --warp to print")
+    parser.add_argument("--warp", type=int, default=0, help="Warp shown by --dump (default: 0)")
+    parser.add_argument("--verify", type=int, default=0, help="Check this many warps against warp.py")
+    parser.add_argument("--simt", action="store_true", help="Print the SIMT efficiency of every instruction")
+    parser.add_argument(
+        "--block-cache", type=int, default=BLOCK_CACHE, help="Translated basic blocks kept (LRU, 0: no cache)"
+    )
+    memory.add_memory_args(parser)
+    exectrace.add_trace_args(parser)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        decoder = load_decoder(args.encoding, args.spec)
+        with open(args.program, "r", encoding="utf-8") as fh:
+            program = Program(decoder, assemble(decoder, json.load(fh)), args.block_cache)
+        if args.ctas < 1 or args.block < 1 or args.chunk < 1:
+            raise ValueError("--ctas, --block and --chunk must be positive")
+        batch = launch(args.ctas, args.block)
+        init_registers(batch, args.sets)
+        batch.mem = memory.make_spaces(args, memory.FlatMemory.zeros(args.gmem), args.ctas, batch.n * LANES)
+        memory.fill_memory(batch.mem.glob, args.gmem_in)
+        image = batch.mem.glob.data.copy() if args.verify else None
+        batch.trace = exectrace.open_trace(args)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    simt = SimtStats() if args.simt else None
+    t0 = time.perf_counter()
+    steps, warp_instrs = run(program, batch, args.schedule, args.chunk, simt=simt)
+    dt = time.perf_counter() - t0
+    if batch.trace is not None:
+        batch.trace.close()
+    memory.save_memory(batch.mem.glob, args.gmem_out)
+
+    w = min(max(args.warp, 0), batch.n - 1)
+    for name in (n.strip().upper() for n in args.dump.split(",") if n.strip()):
+        if name.startswith("UR"):
+            print(f"{name:>5} = {int(batch.sgpr[parse_operand('sreg', name), w]):#010x}")
+        elif name.startswith("R"):
+            print(f"{name:>5} = {format_lanes(batch.vgpr[parse_operand('vreg', name), w])}")
+        elif name.startswith("P"):
+            print(f"{name:>5} = {int(batch.pred[parse_operand('pred', name), w]):#010x}")
+    memory.report(args, batch.mem.stats, batch.mem.banks)
+    if simt is not None:
+        print("\n".join(simt.report()))
+    lane_ops = warp_instrs * LANES
+    rate = lane_ops / dt if dt > 0 else 0.0
+    print(
+        f"-- {batch.n} warps, {steps} group steps, {warp_instrs} warp instructions in {dt:.3f}s "
+        f"({rate:,.0f} lane-ops/s)",
+        file=sys.stderr,
+    )
+    if args.verify:
+        rng = np.random.default_rng(0)
+        warps = rng.choice(batch.n, size=min(args.verify, batch.n), replace=False)
+        errors = verify(program, batch, args.sets, warps, image)
+        for e in errors:
+            print(f"verify: {e}", file=sys.stderr)
+        print(f"-- verified {len(warps)} warps: {'ok' if not errors else f'{len(errors)} mismatches'}", file=sys.stderr)
+        return 1 if errors else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
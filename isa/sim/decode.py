@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/decode.py isa/encoding.v1.json isa/spec.jsonc 0x<hex word> [...]
+#   python3 isa/sim/decode.py isa/encoding.v2.json isa/spec.jsonc --asm prog.json
+# Notes:
+#   - any encoding json of encoding_synthesis_notes.md (v1, v2, prefix opcodes, `short_encodings`) is decoded
+#     the same way: each encoding's `constant` ranges give a (mask, value) pair, encodings are grouped by
+#     mask, and a word matches the encoding whose constant bits equal `word & mask`.
+#   - fields are returned by operand *role* (canonical_roles), so `lop3`'s `imm8` is `imme` and `LD`'s
+#     `vaddr` is `src0`; operand flags are keyed `(role, flag)`; modifiers are enum labels.
+#   - register operands follow spec_notes.md: vreg 255 is RZ, sreg 63 is URZ; a pred field whose bits are
+#     all ones is PT (P7), so the 2-bit `pred` kind reaches P0..P2 and PT.
+#   - fixed_modi_vals along the form path override the encoded field (and are filled in by `encode`);
+#     modifiers without a range (0-bit enums) decode as the label of value 0.
+#   - `--asm` takes a JSON list whose items are hex words or objects such as
+#       {"op": "iadd.vp_vv", "dst": "R1", "pout0": "P0", "src0": "R2", "src1": "0x10", "src1.src_int_modi": "NEG"}
+#     (operand keys are names or roles, `role.flag` keys are operand flags, other keys are modifiers).
+#   - instructions without an encoding (PSEUDO_FORMS: the spec's form-less `atom` / `atoms` / `atomg`, and
+#     the control flow `bssy` / `bsync` / `bra` the spec lacks) are accepted by `--asm` as pseudo
+#     instructions, e.g. {"op": "atomg", "dst": "R1", "vaddr": "R2", "data": "R3", "atom_op": "ADD"} or
+#     {"op": "bra", "pin0": "P0", "pin0.src_bit_modi": "INV", "target": "0x40"}; they have no instruction
+#     word, occupy INSTRUCTION_WIDTH_BITS in the program and are printed as `pseudo`.
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from validate_spec_format import load_jsonc  # noqa: E402
+
+INSTRUCTION_WIDTH_BITS = 128
+LANES = 32
+RZ = 255
+URZ = 63
+PT = 7
+REGISTER_KINDS = ("vreg", "sreg", "pred")
+
+
+# Simulator-side operand / modifier lists for instructions the spec declares without forms. Operands are
+# (name, role, kind); flags and modifiers list their labels (the first is the default).
+ATOM_FORM = {
+    "operands": [
+        ("dst", "dst", "vreg"), ("vaddr", "src0", "vreg"), ("saddr", "src1", "sreg"), ("offset", "imme", "imm24"),
+        ("data", "src2", "vreg"),
+    ],
+    "modifiers": {
+        "atom_op": ["ADD", "MIN", "MAX", "INC", "DEC", "AND", "OR", "XOR", "EXCH", "CAS"],
+        "atom_type": ["U32", "S32", "U64", "F32"],
+    },
+}
+# Control flow has no instruction in the spec; bssy / bsync / bra are modelled on the BSSY Bx / BSYNC Bx of
+# spec_notes.md (Bx is an imm4 barrier index, "B1" or 1) and a branch to an absolute byte address.
+BSSY_FORM = {"operands": [("barrier", "src0", "imm4"), ("target", "imme", "imm32")], "modifiers": {}}
+BSYNC_FORM = {"operands": [("barrier", "src0", "imm4")], "modifiers": {}}
+BRA_FORM = {
+    "operands": [("pin0", "pin0", "pred"), ("target", "imme", "imm32")],
+    "flags": {("pin0", "src_bit_modi"): ["ID", "INV"]},
+    "modifiers": {},
+}
+PSEUDO_FORMS = {
+    "atom": ATOM_FORM, "atoms": ATOM_FORM, "atomg": ATOM_FORM, "bssy": BSSY_FORM, "bsync": BSYNC_FORM,
+    "bra": BRA_FORM,
+}
+
+
+@dataclass(frozen=True)
+class Operand:
+    role: str
+    name: str
+    kind: str
+    value: int  # register index (RZ / URZ / PT already mapped) or immediate bits
+
+
+@dataclass
+class EncodingInfo:
+    key: str
+    instruction: str
+    form_path: list[str]
+    width: int
+    mask: int
+    value: int
+    operands: dict[str, dict]  # operand name -> spec operand (role, kind, oprnd_flag)
+    fields: list[dict]  # non-constant, non-reserved ranges
+    enums: dict[str, dict[int, str]]  # modifier / flag name -> value -> label
+    labels: dict[str, dict[str, int]]  # modifier / flag name -> label -> value
+    modifiers: list[str]
+    fixed: dict[str, str]
+
+
+@dataclass
+class Instr:
+    key: str
+    instruction: str
+    form_path: list[str]
+    width: int
+    operands: dict[str, Operand] = field(default_factory=dict)
+    flags: dict[tuple[str, str], str] = field(default_factory=dict)
+    mods: dict[str, str] = field(default_factory=dict)
+
+    def flag(self, role: str, name: str, default: str | None = None) -> str | None:
+        return self.flags.get((role, name), default)
+
+    def mod(self, name: str, default: str | None = None) -> str | None:
+        return self.mods.get(name, default)
+
+
+def enum_table(mod_def: dict) -> dict[str, int]:
+    enum = mod_def.get("enum") or {}
+    if isinstance(enum, list):
+        return {label: i for i, label in enumerate(enum)}
+    return dict(enum)
+
+
+def spec_leaves(spec: dict) -> dict[str, dict]:
+    # Encoding key -> operands, modifier list, modifier defs and fixed values, walked like version 1.
+    flag_defs = spec.get("global_oprnd_flag_defs") or {}
+    leaves: dict[str, dict] = {}
+
+    def walk(name: str, forms, path, operands, modifiers, mod_defs, fixed_names, fixed) -> None:
+        if isinstance(forms, dict):
+            items = list(forms.items())
+        else:
+            items = [(f.get("key"), f) for f in forms or []]
+        for key, form in items:
+            new_defs = dict(mod_defs, **(form.get("local_modifier_defs") or {}))
+            new_fixed = dict(fixed, **(form.get("fixed_modi_vals") or {}))
+            new_ops = operands + list(form.get("operands") or [])
+            new_mods = modifiers + list(fixed_names) + list(form.get("inst_modifiers") or [])
+            if form.get("forms"):
+                walk(name, form["forms"], path + [key], new_ops, new_mods, new_defs, form.get("fixed_modifiers") or [], new_fixed)
+            else:
+                leaves[name + "." + ".".join(path + [key])] = {
+                    "operands": new_ops,
+                    "modifiers": new_mods,
+                    "mod_defs": new_defs,
+                    "flag_defs": flag_defs,
+                    "fixed": new_fixed,
+                }
+
+    for name, inst in (spec.get("instructions") or {}).items():
+        mod_defs = dict(spec.get("global_modifier_defs") or {}, **(inst.get("local_modifier_defs") or {}))
+        walk(
+            name, inst.get("forms"), [], [], list(inst.get("inst_modifiers") or []), mod_defs,
+            inst.get("fixed_modifiers") or [], {},
+        )
+    return leaves
+
+
+def register_index(kind: str, value: int, width: int) -> int:
+    if kind == "pred":
+        return PT if value == (1 << width) - 1 else value
+    if kind == "sreg" and value > URZ:
+        raise ValueError(f"sreg index {value} out of range (URZ = {URZ})")
+    return value
+
+
+def register_field(kind: str, index: int, width: int) -> int:
+    if kind == "pred" and index == PT:
+        return (1 << width) - 1
+    if index >= 1 << width:
+        raise ValueError(f"{kind} index {index} does not fit in {width} bits")
+    return index
+
+
+def parse_operand(kind: str, text) -> int:
+    # "R3", "RZ", "UR2", "URZ", "P1", "PT", "B1" or a number (immediates are taken modulo 2**32).
+    if isinstance(text, int):
+        return text
+    s = str(text).strip()
+    upper = s.upper()
+    named = {"RZ": RZ, "URZ": URZ, "PT": PT}
+    if upper in named:
+        return named[upper]
+    for prefix in ("UR", "R", "P", "B"):
+        if upper.startswith(prefix) and upper[len(prefix):].isdigit():
+            return int(upper[len(prefix):])
+    return int(s, 0) & 0xFFFFFFFF
+
+
+class Decoder:
+    def __init__(self, encoding: dict, spec: dict) -> None:
+        leaves = spec_leaves(spec)
+        self.infos: dict[str, EncodingInfo] = {}
+        self.short: dict[str, EncodingInfo] = {}
+        groups: dict[int, dict[int, EncodingInfo]] = {}
+        tables = [(encoding.get("encodings") or {}, self.infos)]
+        tables.append((encoding.get("short_encodings") or {}, self.short))
+        for encs, out in tables:
+            for key, enc in encs.items():
+                if key not in leaves:
+                    raise ValueError(f"encoding '{key}' has no leaf form in the spec")
+                info = self._info(key, enc, leaves[key])
+                out[key] = info
+                slot = groups.setdefault(info.mask, {})
+                if info.value in slot:
+                    raise ValueError(f"encodings '{slot[info.value].key}' and '{key}' have the same constant bits")
+                slot[info.value] = info
+        # Widest masks first so a prefix-coded opcode is not shadowed by a shorter one.
+        self.groups = sorted(groups.items(), key=lambda kv: -bin(kv[0]).count("1"))
+        self._cache: dict[int, Instr] = {}
+
+    @staticmethod
+    def _info(key: str, enc: dict, leaf: dict) -> EncodingInfo:
+        mask = value = 0
+        fields = []
+        for r in enc["ranges"]:
+            if r["type"] == "constant":
+                bits = ((1 << r["length"]) - 1) << r["start"]
+                mask |= bits
+                value |= (int(r["constant"]) << r["start"]) & bits
+            elif r["type"] != "reserved":
+                fields.append(r)
+        defs = dict(leaf["flag_defs"], **leaf["mod_defs"])
+        labels = {name: enum_table(d) for name, d in defs.items()}
+        return EncodingInfo(
+            key=key,
+            instruction=enc["instruction"],
+            form_path=list(enc["form_path"]),
+            width=int(enc.get("width", INSTRUCTION_WIDTH_BITS)),
+            mask=mask,
+            value=value,
+            operands={op["name"]: op for op in leaf["operands"]},
+            fields=fields,
+            enums={name: {v: k for k, v in t.items()} for name, t in labels.items()},
+            labels=labels,
+            modifiers=leaf["modifiers"],
+            fixed=leaf["fixed"],
+        )
+
+    def match(self, word: int) -> EncodingInfo:
+        for mask, slot in self.groups:
+            info = slot.get(word & mask)
+            if info is not None:
+                return info
+        raise ValueError(f"no encoding matches word {word:#034x}")
+
+    def decode(self, word: int) -> Instr:
+        ins = self._cache.get(word)
+        if ins is not None:
+            return ins
+        info = self.match(word)
+        ins = Instr(key=info.key, instruction=info.instruction, form_path=info.form_path, width=info.width)
+        for name in info.modifiers:
+            ins.mods[name] = info.enums.get(name, {}).get(0, "0")
+        for r in info.fields:
+            raw = (word >> r["start"]) & ((1 << r["length"]) - 1)
+            if r["type"] == "operand":
+                op = info.operands[r["name"]]
+                index = register_index(op["kind"], raw, r["length"]) if op["kind"] in REGISTER_KINDS else raw
+                ins.operands[op["role"]] = Operand(op["role"], op["name"], op["kind"], index)
+                continue
+            label = info.enums.get(r["name"], {}).get(raw)
+            if label is None:
+                raise ValueError(f"{info.key}: value {raw} is not a label of '{r['name']}'")
+            if r["type"] == "oprnd_flag":
+                ins.flags[(info.operands[r["oprnd_idx"]]["role"], r["name"])] = label
+            else:
+                ins.mods[r["name"]] = label
+        ins.mods.update(info.fixed)
+        self._cache[word] = ins
+        return ins
+
+    def pseudo(self, name: str, fields: dict) -> Instr:
+        # Instr of a PSEUDO_FORMS instruction; fields as for `encode`.
+        form = PSEUDO_FORMS.get(name)
+        if form is None:
+            raise ValueError(f"unknown encoding '{name}'")
+        if any(info.instruction == name for info in self.infos.values()):
+            raise ValueError(f"'{name}' has encodings; use one of its encoding keys")
+        ins = Instr(key=f"{name}.pseudo", instruction=name, form_path=["pseudo"], width=INSTRUCTION_WIDTH_BITS)
+        fields = dict(fields)
+        for op_name, role, kind in form["operands"]:
+            text = fields.pop(op_name, fields.pop(role, None))
+            if text is None:
+                text = {"vreg": RZ, "sreg": URZ, "pred": PT}.get(kind, 0)
+            value = parse_operand(kind, text)
+            if kind not in REGISTER_KINDS:
+                value &= (1 << int(kind[3:])) - 1
+            ins.operands[role] = Operand(role, op_name, kind, value)
+        for (role, flag), labels in form.get("flags", {}).items():
+            label = fields.pop(f"{role}.{flag}", labels[0])
+            if label not in labels:
+                raise ValueError(f"{name}: '{label}' is not a label of '{role}.{flag}'")
+            ins.flags[(role, flag)] = label
+        for mod, labels in form["modifiers"].items():
+            label = fields.pop(mod, labels[0])
+            if label not in labels:
+                raise ValueError(f"{name}: '{label}' is not a label of '{mod}'")
+            ins.mods[mod] = label
+        if fields:
+            raise ValueError(f"{name}: unknown fields {', '.join(map(str, fields))}")
+        return ins
+
+    def encode(self, key: str, fields: dict, short: bool = False) -> int:
+        # fields: operand name or role -> register / immediate, "role.flag" -> label, modifier -> label.
+        info = (self.short if short else self.infos).get(key)
+        if info is None:
+            raise ValueError(f"unknown encoding '{key}'" + (" (short)" if short else ""))
+        by_role = {op["role"]: name for name, op in info.operands.items()}
+        values = dict(info.fixed)
+        for k, v in fields.items():
+            if "." in k:
+                role, flag = k.split(".", 1)
+                values[(by_role.get(role, role), flag)] = v
+            elif k in info.fixed and v != info.fixed[k]:
+                raise ValueError(f"{key}: '{k}' is fixed to {info.fixed[k]}")
+            else:
+                values[by_role.get(k, k)] = v
+        word = info.value
+        seen = set()
+        for r in info.fields:
+            width = r["length"]
+            if r["type"] == "operand":
+                name = r["name"]
+                if name not in values:
+                    raise ValueError(f"{key}: missing operand '{name}'")
+                kind = info.operands[name]["kind"]
+                raw = parse_operand(kind, values[name])
+                if kind in REGISTER_KINDS:
+                    raw = register_field(kind, raw, width)
+                seen.add(name)
+            else:
+                name = (r["oprnd_idx"], r["name"]) if r["type"] == "oprnd_flag" else r["name"]
+                label = values.get(name, info.enums.get(r["name"], {}).get(0))
+                raw = info.labels.get(r["name"], {}).get(label) if isinstance(label, str) else label
+                if raw is None:
+                    raise ValueError(f"{key}: '{label}' is not a label of '{r['name']}'")
+                seen.add(name)
+            word |= (int(raw) & ((1 << width) - 1)) << r["start"]
+        extra = [str(k) for k in values if k not in seen and k not in info.fixed]
+        if extra:
+            raise ValueError(f"{key}: unknown fields {', '.join(extra)}")
+        return word
+
+
+def load_decoder(encoding_path: str, spec_path: str) -> Decoder:
+    with open(encoding_path, "r", encoding="utf-8") as fh:
+        encoding = json.load(fh)
+    return Decoder(encoding, load_jsonc(spec_path))
+
+
+def assemble(decoder: Decoder, items: list) -> list[int | Instr]:
+    # Instruction words, with an Instr in place of each pseudo instruction.
+    words: list[int | Instr] = []
+    for i, item in enumerate(items):
+        if isinstance(item, (int, str)):
+            words.append(int(item, 16) if isinstance(item, str) else item)
+            continue
+        fields = dict(item)
+        key = fields.pop("op", None)
+        if key is None:
+            raise ValueError(f"item {i}: missing 'op'")
+        short = bool(fields.pop("short", False))
+        if key in PSEUDO_FORMS:
+            words.append(decoder.pseudo(key, fields))
+            continue
+        words.append(decoder.encode(key, fields, short))
+    return words
+
+
+def format_instr(ins: Instr) -> str:
+    prefix = {"vreg": "R", "sreg": "UR", "pred": "P"}
+    named = {("vreg", RZ): "RZ", ("sreg", URZ): "URZ", ("pred", PT): "PT"}
+    parts = []
+    for role, op in ins.operands.items():
+        if op.kind in prefix:
+            text = named.get((op.kind, op.value), f"{prefix[op.kind]}{op.value}")
+        else:
+            text = f"{op.value:#x}"
+        flags = [f"{f}={v}" for (r, f), v in ins.flags.items() if r == role]
+        parts.append(f"{role}={text}" + (f"[{','.join(flags)}]" if flags else ""))
+    mods = " ".join(f"{k}={v}" for k, v in ins.mods.items())
+    return f"{ins.key} ({ins.width}b) " + " ".join(parts) + (f" | {mods}" if mods else "")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Decode synthesized instruction words.")
+    parser.add_argument("encoding", help="Encoding JSON (encoding_synthesis v1 / v2 output)")
+    parser.add_argument("spec", help="Path to spec.jsonc")
+    parser.add_argument("words", nargs="*", help="Hex instruction words")
+    parser.add_argument("--asm", default="", help="Assemble this JSON program, then decode it back")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        decoder = load_decoder(args.encoding, args.spec)
+        words = [int(w, 16) for w in args.words]
+        if args.asm:
+            with open(args.asm, "r", encoding="utf-8") as fh:
+                words += assemble(decoder, json.load(fh))
+        for word in words:
+            if isinstance(word, Instr):
+                print(f"{'pseudo':>32}  {format_instr(word)}")
+                continue
+            width = decoder.match(word).width
+            print(f"{word:0{width // 4}x}  {format_instr(decoder.decode(word))}")
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
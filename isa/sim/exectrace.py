@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/exectrace.py run.trace
+#   python3 isa/sim/exectrace.py run.trace --warp 3 --print 40
+# Notes:
+#   - binary execution traces: warp.py / batch.py / parallel.py `--trace FILE` record every executed
+#     instruction, register write and memory access as fixed-size TRACE_DTYPE records (151 bytes) after a
+#     16-byte header (MAGIC, record size). All records of one warp instruction share its `seq`.
+#   - record kinds: EXEC (pc, warp, active mask), VREG / SREG / PRED / CSR (register `reg` after the write:
+#     32 lane values, or the value / lane mask in values[0]), MEM (`reg` is the SPACES index, `size` the
+#     bytes per lane, values the 32 lane byte addresses within the space; LDC addresses are bank * 64K +
+#     offset). `mask` is the active mask of the instruction; only its lanes were written / accessed.
+#   - TraceWriter fills a preallocated ring of `--trace-buffer` records (vectorized over the warps of a
+#     group) and writes it to the file in one call whenever it is full, then reuses it.
+#   - `load_trace` memory-maps a file (np.memmap, read-only), so analyses slice and reduce traces larger
+#     than memory without copying; this tool prints a per-instruction summary and selected records.
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+LANES = 32
+MAGIC = b"GPIDLTRC"
+HEADER = np.dtype([("magic", "S8"), ("itemsize", "<u4"), ("reserved", "<u4")])
+TRACE_DTYPE = np.dtype([
+    ("seq", "<u8"), ("pc", "<u4"), ("warp", "<u4"), ("mask", "<u4"), ("kind", "u1"), ("reg", "u1"),
+    ("size", "u1"), ("values", "<u4", (LANES,)),
+])
+EXEC, VREG, SREG, PRED, CSR, MEM = range(6)
+KINDS = ("exec", "vreg", "sreg", "pred", "csr", "mem")
+SPACES = ("generic", "global", "shared", "local", "constant")
+DEFAULT_BUFFER = 1 << 16
+
+
+class TraceWriter:
+    # Records of the running instruction carry `seq`, `pc` and one row per warp of `warps`.
+    def __init__(self, path: str, capacity: int = DEFAULT_BUFFER) -> None:
+        self.path = path
+        self.fh = open(path, "wb")
+        header = np.zeros(1, dtype=HEADER)
+        header["magic"], header["itemsize"] = MAGIC, TRACE_DTYPE.itemsize
+        self.fh.write(header.tobytes())
+        self.buf = np.zeros(max(1, capacity), dtype=TRACE_DTYPE)
+        self.pos = 0
+        self.records = 0
+        self.seq = 0
+        self.pc = 0
+        self.warps = np.zeros(1, dtype=np.uint32)
+
+    def step(self, pc: int, warps, masks) -> None:
+        self.seq += 1
+        self.pc = pc
+        self.warps = np.atleast_1d(np.asarray(warps, dtype=np.uint32))
+        self.add(EXEC, 0, 0, masks, None)
+
+    def reg(self, kind: int, i: int, masks, values) -> None:
+        self.add(kind, i, 0, masks, values)
+
+    def memory(self, space: str, nbytes: int, masks, addr) -> None:
+        self.add(MEM, SPACES.index(space), nbytes, masks, addr)
+
+    def add(self, kind: int, reg: int, size: int, masks, values) -> None:
+        # values: lane values (warps, 32) for VREG / MEM, per-warp values (warps,) stored in values[0] for the
+        # other kinds, or None.
+        k = len(self.warps)
+        if self.pos + k > len(self.buf):
+            self.flush()
+        r = self.buf[self.pos:self.pos + k] if k <= len(self.buf) else np.zeros(k, dtype=TRACE_DTYPE)
+        r["seq"], r["pc"], r["warp"], r["kind"], r["reg"], r["size"] = self.seq, self.pc, self.warps, kind, reg, size
+        r["mask"] = np.broadcast_to(masks, (k,))
+        if values is None:
+            r["values"] = 0
+        elif kind in (VREG, MEM):
+            r["values"] = np.broadcast_to(values, (k, LANES))
+        else:
+            r["values"] = 0
+            r["values"][:, 0] = np.broadcast_to(values, (k,))
+        if k <= len(self.buf):
+            self.pos += k
+        else:
+            self.fh.write(r.tobytes())
+            self.records += k
+
+    def flush(self) -> None:
+        if self.pos:
+            self.fh.write(self.buf[:self.pos].tobytes())
+            self.records += self.pos
+            self.pos = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.fh.close()
+
+
+def load_trace(path: str) -> np.ndarray:
+    # The records of a trace file as a read-only memmap (an empty array for a trace without records).
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if header.size != 1 or header["magic"][0] != MAGIC:
+        raise ValueError(f"{path}: not a trace file")
+    if int(header["itemsize"][0]) != TRACE_DTYPE.itemsize:
+        raise ValueError(f"{path}: {int(header['itemsize'][0])}-byte records, expected {TRACE_DTYPE.itemsize}")
+    count = (os.path.getsize(path) - HEADER.itemsize) // TRACE_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=TRACE_DTYPE)
+    return np.memmap(path, dtype=TRACE_DTYPE, mode="r", offset=HEADER.itemsize, shape=(count,))
+
+
+def concat(path: str, parts: list[str], capacity: int = DEFAULT_BUFFER) -> None:
+    # Join trace files in order (parallel.py tasks), adding to each part's `seq` the last seq before it;
+    # the parts are removed.
+    out = TraceWriter(path, capacity)
+    base = 0
+    try:
+        for part in parts:
+            records = load_trace(part)
+            last = base
+            for s in range(0, records.size, len(out.buf)):
+                chunk = np.array(records[s:s + len(out.buf)])
+                chunk["seq"] += base
+                out.fh.write(chunk.tobytes())
+                out.records += chunk.size
+                last = int(chunk["seq"][-1])
+            base = last
+            del records
+            os.remove(part)
+    finally:
+        out.close()
+
+
+def open_trace(args: argparse.Namespace, path: str | None = None) -> TraceWriter | None:
+    path = args.trace if path is None else path
+    return TraceWriter(path, args.trace_buffer) if path else None
+
+
+def add_trace_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--trace", default="", help="Write a binary execution trace to this file")
+    parser.add_argument(
+        "--trace-buffer", type=int, default=DEFAULT_BUFFER, help="Trace records buffered per write (default: 65536)"
+    )
+
+
+def summary(records: np.ndarray) -> list[str]:
+    # Per pc: warp instructions, active lanes, register writes and memory accesses.
+    lines = [f"{'pc':>6}  {'warp instrs':>11} {'lanes':>12} {'reg writes':>10} {'mem':>8}"]
+    if records.size == 0:
+        return lines
+    pcs, at = np.unique(records["pc"], return_inverse=True)
+    kind = np.asarray(records["kind"])
+    exe, mem = kind == EXEC, kind == MEM
+    bits = np.unpackbits(np.ascontiguousarray(records["mask"][exe]).view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+    instrs = np.bincount(at[exe], minlength=pcs.size)
+    lanes = np.bincount(at[exe], weights=bits, minlength=pcs.size)
+    regs = np.bincount(at[~exe & ~mem], minlength=pcs.size)
+    mems = np.bincount(at[mem], minlength=pcs.size)
+    for i, pc in enumerate(pcs):
+        lines.append(f"{int(pc):#6x}  {instrs[i]:>11} {int(lanes[i]):>12} {regs[i]:>10} {mems[i]:>8}")
+    return lines
+
+
+def format_record(r) -> str:
+    kind = int(r["kind"])
+    head = f"{int(r['seq']):>8} {int(r['pc']):#6x} w{int(r['warp']):<5} {int(r['mask']):08x} {KINDS[kind]:<5}"
+    if kind == EXEC:
+        return head
+    if kind == MEM:
+        return head + f" {SPACES[int(r['reg'])]} {int(r['size'])}B " + " ".join(f"{int(v):x}" for v in r["values"])
+    prefix = {VREG: "R", SREG: "UR", PRED: "P", CSR: "CSR"}[kind]
+    if kind == VREG:
+        return head + f" {prefix}{int(r['reg'])} = " + " ".join(f"{int(v):08x}" for v in r["values"])
+    return head + f" {prefix}{int(r['reg'])} = {int(r['values'][0]):#010x}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Summarize a binary execution trace.")
+    parser.add_argument("trace", help="Trace file written with --trace")
+    parser.add_argument("--warp", type=int, default=-1, help="Only this warp (default: all)")
+    parser.add_argument("--print", dest="count", type=int, default=0, help="Print the first N records")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        records = load_trace(args.trace)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    if args.warp >= 0:
+        records = records[records["warp"] == args.warp]
+    print("\n".join(summary(records)))
+    for r in records[:args.count]:
+        print(format_record(r))
+    instrs = int(np.count_nonzero(records["kind"] == EXEC))
+    print(f"-- {records.size} records, {instrs} warp instructions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
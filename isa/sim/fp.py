@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# Notes:
+#   - floating-point helpers for the simulator; every function works on NumPy arrays of any shape.
+#   - results are rounded from an exact float64 pair (hi, lo) with value hi + lo: a product of two fp32 /
+#     fp16 values is exact in float64, and a sum is made exact with two_sum, so rounding honours every
+#     `rnd_mode_fp` (rne / rtz / rup / rdn) without double rounding.
+#   - register values stay uint32 bit patterns; `bits_to_f32` / `f32_to_bits` are views, and 16-bit values
+#     travel as the low 16 bits of a uint32.
+#   - arithmetic NaN results are canonical (0x7fffffff for fp32, 0x7fff for fp16 and bf16, 0x7fffe000 for
+#     tf32).
+#   - NumPy has no bfloat16 / tf32: they are the markers BF16 / TF32 wherever a dtype is taken, and their
+#     values travel in float32 arrays (bf16 is the high half of an fp32 pattern, tf32 an fp32 pattern with
+#     the low 13 mantissa bits zero). round_to rounds to them by rounding to float32 with round-to-odd and
+#     then dropping the low bits in the requested mode, which never double-rounds (float32 keeps at least
+#     2 more bits).
+
+from __future__ import annotations
+
+import numpy as np
+
+SIGN32 = np.uint32(0x80000000)
+SIGN16 = np.uint32(0x8000)
+CANONICAL_NAN32 = np.uint32(0x7FFFFFFF)
+CANONICAL_NAN16 = np.uint32(0x7FFF)
+ONE32 = np.uint32(0x3F800000)
+
+BF16 = "BF16"
+TF32 = "TF32"
+NARROW_DROP = {BF16: 16, TF32: 13}
+CANONICAL_NAN_TF32 = np.uint32(0x7FFFE000)
+MAX_NARROW = {BF16: np.uint32(0x7F7F0000), TF32: np.uint32(0x7F7FE000)}
+
+FP_DTYPES = {
+    "F32": np.float32, "FP32": np.float32, "F16": np.float16, "FP16": np.float16, "BF16": BF16, "TF32": TF32,
+}
+
+
+def container(dtype):
+    # NumPy dtype that holds values of `dtype`.
+    return np.float32 if dtype in NARROW_DROP else dtype
+
+
+def bit_width(dtype) -> int:
+    return 16 if dtype in (np.float16, BF16) else 32
+
+
+def bits_to_f32(u) -> np.ndarray:
+    return np.asarray(u, dtype=np.uint32).view(np.float32)
+
+
+def f32_to_bits(f) -> np.ndarray:
+    return np.asarray(f, dtype=np.float32).view(np.uint32)
+
+
+def bits_to_f16(u) -> np.ndarray:
+    return np.asarray(u, dtype=np.uint32).astype(np.uint16).view(np.float16)
+
+
+def f16_to_bits(f) -> np.ndarray:
+    return np.asarray(f, dtype=np.float16).view(np.uint16).astype(np.uint32)
+
+
+def bits_to_bf16(u) -> np.ndarray:
+    return (np.asarray(u, dtype=np.uint32) << np.uint32(16)).view(np.float32)
+
+
+def bf16_to_bits(f) -> np.ndarray:
+    return f32_to_bits(f) >> np.uint32(16)
+
+
+def apply_fp_modi(bits, modi: str | None, sign=SIGN32) -> np.ndarray:
+    # src_fp_modi on the bit pattern, so NaN payloads and -0.0 are handled like the sign bit they are.
+    if modi in (None, "ID"):
+        return bits
+    if modi == "NEG":
+        return bits ^ sign
+    if modi == "ABS":
+        return bits & ~sign
+    if modi == "ABS_THEN_NEG":
+        return bits | sign
+    raise ValueError(f"unknown src_fp_modi '{modi}'")
+
+
+def flush_denorm(x: np.ndarray) -> np.ndarray:
+    tiny = np.finfo(x.dtype).smallest_normal
+    return np.where(np.abs(x) < tiny, np.copysign(np.zeros_like(x), x), x)
+
+
+def two_sum(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    s = a + b
+    bb = s - a
+    # err is NaN when s overflows; every comparison in round_to is then false, which leaves s alone.
+    return s, (a - (s - bb)) + (b - bb)
+
+
+def round_narrow(hi, lo, mode: str, drop: int) -> np.ndarray:
+    # float32 with the low `drop` bits zero: round to float32 with round-to-odd, then drop the bits.
+    f = round_to(hi, lo, "rtz", np.float32)
+    inexact = (np.asarray(hi, dtype=np.float64) != f) | (np.asarray(lo) != 0)
+    u = f32_to_bits(f) | (inexact & np.isfinite(f)).astype(np.uint32)
+    low = u & np.uint32((1 << drop) - 1)
+    if mode == "rne":
+        up = (low > np.uint32(1 << (drop - 1))) | ((low == np.uint32(1 << (drop - 1))) & ((u >> np.uint32(drop)) & 1 != 0))
+    elif mode == "rtz":
+        up = np.zeros(u.shape, dtype=bool)
+    elif mode in ("rup", "rdn"):
+        negative = (u & SIGN32) != 0
+        up = (low != 0) & (negative if mode == "rdn" else ~negative)
+    else:
+        raise ValueError(f"unknown rounding mode '{mode}'")
+    up &= ~np.isnan(f)
+    # A carry out of the mantissa steps the exponent, and from the largest finite value to infinity.
+    r = (u & ~np.uint32((1 << drop) - 1)) + (up.astype(np.uint32) << np.uint32(drop))
+    return np.where(np.isnan(f), f, r.view(np.float32))
+
+
+def round_to(hi, lo, mode: str, dtype) -> np.ndarray:
+    # Round the exact value hi + lo (float64, |lo| at most half an ulp of hi) to `dtype`.
+    if dtype in NARROW_DROP:
+        return round_narrow(hi, lo, mode, NARROW_DROP[dtype])
+    hi = np.asarray(hi, dtype=np.float64)
+    f = hi.astype(dtype)
+    if mode == "rne":
+        if np.ndim(lo) == 0 and lo == 0:
+            return f
+        # RNE of hi is only wrong when hi sits exactly on a midpoint of `dtype` (its dropped float64 bits
+        # are 100..0, or it is in the subnormal range) and lo points away from f; fix just those lanes.
+        lo = np.broadcast_to(np.asarray(lo, dtype=np.float64), hi.shape)
+        info = np.finfo(dtype)
+        shift = 52 - info.nmant
+        low = hi.view(np.uint64) & np.uint64((1 << shift) - 1)
+        cand = (lo != 0) & ((low == np.uint64(1 << (shift - 1))) | (np.abs(hi) < info.smallest_normal))
+        if not cand.any():
+            return f
+        h, l, g = hi[cand], lo[cand], f[cand]
+        back = g.astype(np.float64)
+        d = h - back
+        toward = np.nextafter(g, np.where(d > 0, np.inf, -np.inf).astype(dtype))
+        mid = (back + toward.astype(np.float64)) / 2
+        f[cand] = np.where((d != 0) & (h == mid) & (np.sign(l) == np.sign(d)), toward, g)
+        return f
+    lo = np.broadcast_to(np.asarray(lo, dtype=np.float64), hi.shape)
+    # Sign of (exact - f): hi - f is exact when finite; when hi itself is representable lo decides.
+    d = hi - f.astype(np.float64)
+    diff = np.where(d != 0, d, lo)
+    if mode == "rtz":
+        fix = ((f > 0) & (diff < 0)) | ((f < 0) & (diff > 0))
+        return np.where(fix, np.nextafter(f, dtype(0)), f)
+    if mode == "rup":
+        return np.where(diff > 0, np.nextafter(f, dtype(np.inf)), f)
+    if mode == "rdn":
+        return np.where(diff < 0, np.nextafter(f, dtype(-np.inf)), f)
+    raise ValueError(f"unknown rounding mode '{mode}'")
+
+
+def finish(x: np.ndarray, ftz: bool, saturate: bool) -> np.ndarray:
+    if ftz:
+        x = flush_denorm(x)
+    if saturate:
+        x = np.where(np.isnan(x), x.dtype.type(0), np.clip(x, 0, 1))
+    return x
+
+
+def to_bits(x: np.ndarray, dtype=None) -> np.ndarray:
+    # fp32 / fp16 (/ bf16, tf32 in float32) result -> uint32 register bits with canonical NaN.
+    if dtype == BF16:
+        return np.where(np.isnan(x), CANONICAL_NAN16, bf16_to_bits(x))
+    if dtype == TF32:
+        return np.where(np.isnan(x), CANONICAL_NAN_TF32, f32_to_bits(x))
+    if x.dtype == np.float16:
+        return np.where(np.isnan(x), CANONICAL_NAN16, f16_to_bits(x))
+    return np.where(np.isnan(x), CANONICAL_NAN32, f32_to_bits(x))
+
+
+def satfinite(x: np.ndarray, dtype=None) -> np.ndarray:
+    big = MAX_NARROW[dtype].view(np.float32) if dtype in NARROW_DROP else np.finfo(x.dtype).max
+    return np.where(np.isinf(x), np.copysign(x.dtype.type(big), x), x)
+
+
+def fp_compare(a: np.ndarray, b: np.ndarray, cmp: str) -> np.ndarray:
+    unordered = np.isnan(a) | np.isnan(b)
+    base = cmp[:-1] if cmp.endswith("U") and cmp not in ("NAN",) else cmp
+    if base == "F":
+        return np.zeros(np.broadcast(a, b).shape, dtype=bool)
+    if base == "T":
+        return np.ones(np.broadcast(a, b).shape, dtype=bool)
+    if base == "NUM":
+        return ~unordered
+    if base == "NAN":
+        return unordered
+    ordered = {
+        "LT": np.less, "EQ": np.equal, "LE": np.less_equal, "GT": np.greater, "NE": np.not_equal,
+        "GE": np.greater_equal,
+    }[base](a, b)
+    if base == "NE":
+        ordered &= ~unordered
+    return ordered | unordered if base != cmp else ordered
+
+
+def fp_min_max(a: np.ndarray, b: np.ndarray, is_max: bool, nan: bool) -> np.ndarray:
+    # minNum / maxNum (a NaN input yields the other input), -0.0 < +0.0; `.NaN` propagates NaN instead.
+    r = np.fmax(a, b) if is_max else np.fmin(a, b)
+    ua = a.view(np.uint16 if a.dtype == np.float16 else np.uint32)
+    ub = np.asarray(b, dtype=a.dtype).view(ua.dtype)
+    zeros = (a == 0) & (b == 0)
+    signed = (ua & ub) if is_max else (ua | ub)
+    r = np.where(zeros, signed.view(a.dtype), r)
+    if nan:
+        r = np.where(np.isnan(a) | np.isnan(b), a.dtype.type(np.nan), r)
+    return r
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# Notes:
+#   - memory of the simulator: every address space is a FlatMemory, one flat, byte-addressable uint8 buffer
+#     (a NumPy array, or a multiprocessing.shared_memory block for global memory in parallel.py) with
+#     int8 .. uint64 / float32 views of the same bytes. Accesses must be naturally aligned and inside the
+#     buffer.
+#   - AddressSpaces is what a WarpState / WarpBatch sees: global memory (shared by every warp), shared
+#     memory (`--smem` bytes per CTA), local memory (`--lmem` bytes per thread) and the read-only constant
+#     banks (CONST_BANKS x 64 KiB, filled with `--cmem-in BANK:FILE`). Shared and local memory are one
+#     buffer each with a slot per CTA / thread, allocated with np.zeros, so untouched slots cost no pages.
+#   - addresses are 32-bit byte addresses within their space. Generic addresses (mem_scope generic, atom)
+#     fall in the shared window (SHARED_WINDOW, 16 MiB) or the local window (LOCAL_WINDOW, 16 MiB) or are
+#     global, so global addresses stay below LOCAL_WINDOW; a warp may mix the three.
+#   - `load` / `store` / `atomic` take the addresses of the active lanes only (1-D, warps then lanes) and do
+#     one gather / scatter per register of the access.
+#   - atomics on the same address are applied in lane order and each lane gets the value its own update
+#     saw: ADD / MIN / MAX / AND / OR / XOR as a segmented scan over the lanes sorted by address (F32 ADD
+#     is therefore summed as a tree), EXCH as a shift, INC / DEC / CAS in rounds of distinct addresses. With
+#     `locks` (parallel runs), the stripes covering the touched addresses (8-byte granules, hashed modulo
+#     the stripe count) are held for the whole instruction, taken in increasing order.
+#   - shared-memory accesses are also handed to banks.BankStats (`--bank-conflicts`, `--bank-trace`).
+#   - AccessStats (`--mem-stats`) counts, per static instruction, the warp requests, active lanes, bytes and
+#     the distinct 32-byte sectors and 128-byte lines of each request (from the addresses the program
+#     computed, before the space's slot is added); efficiency is bytes / (32 * sectors), above 100% when lanes
+#     share words.
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+
+import numpy as np
+
+import banks
+
+LDST_BYTES = {"U8": 1, "S8": 1, "U16": 2, "S16": 2, "B32": 4, "B64": 8, "B128": 16, "B256": 32}
+SUBWORD = {"U8": np.uint8, "S8": np.int8, "U16": np.uint16, "S16": np.int16}
+ATOM_TYPES = {"U32": np.uint32, "S32": np.int32, "U64": np.uint64, "F32": np.float32}
+ATOM_OPS = {
+    "ADD": ("U32", "S32", "U64", "F32"),
+    "MIN": ("U32", "S32", "U64"),
+    "MAX": ("U32", "S32", "U64"),
+    "INC": ("U32",),
+    "DEC": ("U32",),
+    "AND": ("U32", "S32", "U64"),
+    "OR": ("U32", "S32", "U64"),
+    "XOR": ("U32", "S32", "U64"),
+    "EXCH": ("U32", "S32", "U64", "F32"),
+    "CAS": ("U32", "S32", "U64", "F32"),
+}
+SCAN_OPS = {
+    "ADD": np.add, "MIN": np.minimum, "MAX": np.maximum, "AND": np.bitwise_and, "OR": np.bitwise_or,
+    "XOR": np.bitwise_xor,
+}
+STRIPE_SHIFT = 3
+DEFAULT_SIZE = 1 << 20
+DEFAULT_SHARED = 48 << 10
+DEFAULT_LOCAL = 1 << 10
+SLOT_ALIGN = 32
+WINDOW_BYTES = 1 << 24
+SHARED_WINDOW = 0xFF000000
+LOCAL_WINDOW = 0xFE000000
+CONST_BANKS = 32
+CONST_BANK_BYTES = 1 << 16
+SECTOR_SHIFT = 5
+LINE_SHIFT = 7
+
+
+class FlatMemory:
+    def __init__(self, data: np.ndarray, locks: list | None = None) -> None:
+        if data.dtype != np.uint8 or data.ndim != 1 or data.size % 8:
+            raise ValueError("memory must be a 1-D uint8 buffer whose size is a multiple of 8")
+        self.data = data
+        self.locks = locks
+        self.views = {
+            np.dtype(t): data.view(t)
+            for t in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.uint64, np.float32)
+        }
+
+    @classmethod
+    def zeros(cls, size: int) -> FlatMemory:
+        return cls(np.zeros(-(-size // 8) * 8, dtype=np.uint8))
+
+    def view(self, dtype) -> np.ndarray:
+        return self.views[np.dtype(dtype)]
+
+    def index(self, addr: np.ndarray, nbytes: int) -> np.ndarray:
+        # Element index of `nbytes`-wide accesses at byte addresses `addr`.
+        if addr.size:
+            bad = addr & (nbytes - 1)
+            if bad.any():
+                raise ValueError(f"misaligned {nbytes}-byte access at {int(addr[bad != 0][0]):#x}")
+            top = int(addr.max())
+            if top + nbytes > self.data.size:
+                raise ValueError(f"address {top:#x} outside memory ({self.data.size:#x} bytes)")
+        return addr // nbytes
+
+    @contextmanager
+    def locked(self, addr: np.ndarray):
+        if not self.locks:
+            yield
+            return
+        stripes = [int(s) for s in np.unique((addr >> STRIPE_SHIFT) % len(self.locks))]
+        for s in stripes:
+            self.locks[s].acquire()
+        try:
+            yield
+        finally:
+            for s in reversed(stripes):
+                self.locks[s].release()
+
+
+def load(mem: FlatMemory, addr: np.ndarray, length: str) -> list[np.ndarray]:
+    # One uint32 array per destination register; U8 / U16 zero-extend, S8 / S16 sign-extend.
+    n = LDST_BYTES[length]
+    if n < 4:
+        v = mem.view(SUBWORD[length])[mem.index(addr, n)]
+        return [v.astype(np.int32).view(np.uint32)]
+    words = mem.view(np.uint32)
+    base = mem.index(addr, n) * (n // 4)
+    return [words[base + j] for j in range(n // 4)]
+
+
+def store(mem: FlatMemory, addr: np.ndarray, length: str, values: list[np.ndarray]) -> None:
+    # Lanes storing to the same address: the last lane wins.
+    n = LDST_BYTES[length]
+    if n < 4:
+        dtype = np.uint8 if n == 1 else np.uint16
+        mem.view(dtype)[mem.index(addr, n)] = values[0].astype(dtype)
+        return
+    words = mem.view(np.uint32)
+    base = mem.index(addr, n) * (n // 4)
+    for j in range(n // 4):
+        words[base + j] = values[j]
+
+
+def apply_atom(op: str, old: np.ndarray, val: np.ndarray, new: np.ndarray | None) -> np.ndarray:
+    # The value-dependent updates, applied one round at a time.
+    if op == "INC":
+        return np.where(old >= val, old.dtype.type(0), old + old.dtype.type(1))
+    if op == "DEC":
+        return np.where((old == 0) | (old > val), val, old - old.dtype.type(1))
+    if op == "CAS":
+        return np.where(old == val, new, old)
+    raise ValueError(f"unknown atom_op '{op}'")
+
+
+def atomic(
+    mem: FlatMemory, op: str, typ: str, addr: np.ndarray, val: np.ndarray, new: np.ndarray | None = None
+) -> np.ndarray:
+    # `val` / `new` (CAS: compare / new value) and the returned old values are uint32 bits (uint64 for U64).
+    if typ not in ATOM_OPS.get(op, ()):
+        raise ValueError(f"atom_op {op} is not defined for {typ}")
+    dtype = ATOM_TYPES[typ]
+    if op in ("EXCH", "CAS"):
+        dtype = np.uint64 if typ == "U64" else np.uint32
+    bits = np.uint64 if typ == "U64" else np.uint32
+    view = mem.view(dtype)
+    idx = mem.index(addr, view.itemsize)
+    if idx.size == 0:
+        return np.zeros(0, dtype=bits)
+    val = val.view(dtype)
+    new = None if new is None else new.view(dtype)
+    # Sort the lanes by address (stable, so lane order within an address) into segments of one address.
+    order = np.argsort(idx, kind="stable")
+    s = idx[order]
+    start = np.r_[True, s[1:] != s[:-1]]
+    heads = np.flatnonzero(start)
+    seg = np.cumsum(start) - 1
+    v = val[order]
+    old = np.empty(idx.size, dtype=dtype)
+    with mem.locked(addr):
+        base = view[s[heads]]
+        if op in SCAN_OPS:
+            # Inclusive segmented scan (Hillis-Steele, log2 of the longest segment steps); lane i sees the
+            # memory value combined with the updates of the lanes before it.
+            f = SCAN_OPS[op]
+            inc = v.copy()
+            longest = int(np.diff(np.r_[heads, s.size]).max())
+            d = 1
+            while d < longest:
+                inc[d:] = np.where(seg[d:] == seg[:-d], f(inc[:-d], inc[d:]), inc[d:])
+                d *= 2
+            b = base[seg]
+            old[order] = np.where(start, b, f(b, np.r_[inc[:1], inc[:-1]]))
+            view[s[heads]] = f(base, inc[np.r_[heads[1:], s.size] - 1])
+        elif op == "EXCH":
+            old[order] = np.where(start, base[seg], np.r_[v[:1], v[:-1]])
+            view[s[heads]] = v[np.r_[heads[1:], s.size] - 1]
+        else:
+            # INC / DEC / CAS depend on the value they see: rounds of distinct addresses.
+            rank = np.empty_like(seg)
+            rank[order] = np.arange(s.size) - heads[seg]
+            for r in range(int(rank.max()) + 1):
+                sel = np.flatnonzero(rank == r)
+                i = idx[sel]
+                o = view[i]
+                old[sel] = o
+                view[i] = apply_atom(op, o, val[sel], None if new is None else new[sel])
+    return old.view(bits)
+
+
+class AddressSpaces:
+    def __init__(
+        self, glob: FlatMemory | None, ctas: int = 1, threads: int = 32, shared_size: int = DEFAULT_SHARED,
+        local_size: int = DEFAULT_LOCAL, const: FlatMemory | None = None, stats: bool = False,
+    ) -> None:
+        # `ctas` / `threads` slots of shared / local memory; slot sizes are rounded up to SLOT_ALIGN so that
+        # every aligned access stays inside its slot.
+        self.glob = glob
+        self.shared_size = -(-shared_size // SLOT_ALIGN) * SLOT_ALIGN
+        self.local_size = -(-local_size // SLOT_ALIGN) * SLOT_ALIGN
+        if max(self.shared_size, self.local_size) > WINDOW_BYTES:
+            raise ValueError(f"shared / local slots are limited to {WINDOW_BYTES} bytes")
+        self.shared = FlatMemory.zeros(max(ctas * self.shared_size, 8))
+        self.local = FlatMemory.zeros(max(threads * self.local_size, 8))
+        self.const = const if const is not None else FlatMemory.zeros(CONST_BANKS * CONST_BANK_BYTES)
+        self.stats = AccessStats() if stats else None
+        self.banks: banks.BankStats | None = None
+
+    def translate(
+        self, space: str, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray
+    ) -> tuple[FlatMemory, np.ndarray]:
+        # Buffer and buffer offsets of addresses within `space`.
+        if space == "global":
+            if self.glob is None:
+                raise ValueError("no global memory attached")
+            return self.glob, addr
+        mem, size, slot = (
+            (self.shared, self.shared_size, cta) if space == "shared" else (self.local, self.local_size, thread)
+        )
+        if addr.size and int(addr.max()) >= size:
+            raise ValueError(f"{space} address {int(addr.max()):#x} outside the {size:#x}-byte {space} slot")
+        return mem, slot * size + addr
+
+    def route(
+        self, scope: str, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray
+    ) -> list[tuple[FlatMemory, object, np.ndarray]]:
+        # (buffer, lanes, offsets) per space the lanes access; `lanes` indexes the active-lane arrays.
+        if scope == "generic":
+            window = addr & ~(WINDOW_BYTES - 1)
+            shared, local = window == SHARED_WINDOW, window == LOCAL_WINDOW
+            if shared.any() or local.any():
+                return self.split(addr, cta, thread, shared, local)
+            scope = "global"
+        mem, offsets = self.translate(scope, addr, cta, thread)
+        return [(mem, slice(None), offsets)]
+
+    def split(
+        self, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray, shared: np.ndarray, local: np.ndarray
+    ) -> list[tuple[FlatMemory, object, np.ndarray]]:
+        # Generic addresses that fall in more than one window.
+        parts = []
+        for space, sel, base in (
+            ("global", ~(shared | local), 0), ("shared", shared, SHARED_WINDOW), ("local", local, LOCAL_WINDOW)
+        ):
+            i = np.flatnonzero(sel)
+            if i.size:
+                mem, offsets = self.translate(space, addr[i] - base, cta[i], thread[i])
+                parts.append((mem, i, offsets))
+        return parts
+
+    def load(
+        self, scope: str, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray, length: str
+    ) -> list[np.ndarray]:
+        parts = self.route(scope, addr, cta, thread)
+        if len(parts) == 1:
+            return load(parts[0][0], parts[0][2], length)
+        out = [np.empty(addr.size, dtype=np.uint32) for _ in range(max(1, LDST_BYTES[length] // 4))]
+        for mem, lanes, offsets in parts:
+            for o, v in zip(out, load(mem, offsets, length)):
+                o[lanes] = v
+        return out
+
+    def store(
+        self, scope: str, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray, length: str,
+        values: list[np.ndarray],
+    ) -> None:
+        for mem, lanes, offsets in self.route(scope, addr, cta, thread):
+            store(mem, offsets, length, [v[lanes] for v in values])
+
+    def atomic(
+        self, scope: str, op: str, typ: str, addr: np.ndarray, cta: np.ndarray, thread: np.ndarray,
+        val: np.ndarray, new: np.ndarray | None = None,
+    ) -> np.ndarray:
+        parts = self.route(scope, addr, cta, thread)
+        if len(parts) == 1:
+            return atomic(parts[0][0], op, typ, parts[0][2], val, new)
+        out = np.empty(addr.size, dtype=np.uint64 if typ == "U64" else np.uint32)
+        for mem, lanes, offsets in parts:
+            out[lanes] = atomic(mem, op, typ, offsets, val[lanes], None if new is None else new[lanes])
+        return out
+
+    def load_constant(self, bank: np.ndarray, addr: np.ndarray, length: str) -> list[np.ndarray]:
+        if bank.size and int(bank.max()) >= CONST_BANKS:
+            raise ValueError(f"constant bank {int(bank.max())} does not exist ({CONST_BANKS} banks)")
+        if addr.size and int(addr.max()) >= CONST_BANK_BYTES:
+            raise ValueError(f"constant address {int(addr.max()):#x} outside its {CONST_BANK_BYTES:#x}-byte bank")
+        return load(self.const, bank * CONST_BANK_BYTES + addr, length)
+
+
+class AccessStats:
+    # Per pc: [instruction key, requests, lanes, bytes, sectors, lines].
+    def __init__(self) -> None:
+        self.rows: dict[int, list] = {}
+
+    def record(self, pc: int, key: str, active: np.ndarray, addr: np.ndarray, nbytes: int) -> None:
+        # `addr`: active-lane addresses (warps then lanes) of one instruction over the warps of `active`.
+        if addr.size == 0:
+            return
+        if active.ndim > 1:
+            warp = np.nonzero(active)[0].astype(np.int64) << 32
+            requests = int(np.count_nonzero(active.any(axis=-1)))
+        else:
+            warp, requests = 0, 1
+        sectors = np.unique(warp | (addr >> SECTOR_SHIFT)).size
+        lines = np.unique(warp | (addr >> LINE_SHIFT)).size
+        row = self.rows.setdefault(pc, [key, 0, 0, 0, 0, 0])
+        for j, n in enumerate((requests, addr.size, addr.size * nbytes, sectors, lines), 1):
+            row[j] += n
+
+    def merge(self, rows: dict[int, list]) -> None:
+        for pc, other in rows.items():
+            row = self.rows.setdefault(pc, [other[0], 0, 0, 0, 0, 0])
+            for j in range(1, 6):
+                row[j] += other[j]
+
+    def report(self) -> list[str]:
+        lines = [f"{'pc':>6}  {'instruction':<28} {'requests':>9} {'lanes':>10} {'sectors/req':>11} "
+                 f"{'lines/req':>9} {'efficiency':>10}"]
+        for pc in sorted(self.rows):
+            key, requests, lanes, nbytes, sectors, rows = self.rows[pc]
+            lines.append(
+                f"{pc:#6x}  {key:<28} {requests:>9} {lanes:>10} {sectors / requests:>11.2f} "
+                f"{rows / requests:>9.2f} {nbytes / (32 * sectors):>10.1%}"
+            )
+        return lines
+
+
+def parse_size(text: str) -> int:
+    # "4096", "0x1000", "64K", "16M", "1G".
+    s = text.strip().upper()
+    scale = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(s[-1:], 1)
+    return int(s[:-1] if scale > 1 else s, 0) * scale
+
+
+def add_memory_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--gmem", type=parse_size, default=DEFAULT_SIZE, help="Global memory size (default: 1M)")
+    parser.add_argument("--gmem-in", default="", help="Binary file copied to global memory address 0")
+    parser.add_argument("--gmem-out", default="", help="Write global memory to this file after the run")
+    parser.add_argument("--smem", type=parse_size, default=DEFAULT_SHARED, help="Shared memory per CTA (default: 48K)")
+    parser.add_argument("--lmem", type=parse_size, default=DEFAULT_LOCAL, help="Local memory per thread (default: 1K)")
+    parser.add_argument(
+        "--cmem-in", action="append", default=[], help="BANK:FILE copied to a constant bank (repeatable)"
+    )
+    parser.add_argument("--mem-stats", action="store_true", help="Print per-instruction sector / line statistics")
+    banks.add_bank_args(parser)
+
+
+def load_constants(items: list[str]) -> FlatMemory:
+    # The constant banks, each `BANK:FILE` copied to the start of its bank.
+    const = FlatMemory.zeros(CONST_BANKS * CONST_BANK_BYTES)
+    for item in items:
+        bank, sep, path = item.partition(":")
+        if not sep or not 0 <= int(bank, 0) < CONST_BANKS:
+            raise ValueError(f"expected BANK:FILE with BANK below {CONST_BANKS}, got '{item}'")
+        image = np.fromfile(path, dtype=np.uint8)
+        if image.size > CONST_BANK_BYTES:
+            raise ValueError(f"{path}: {image.size} bytes do not fit in a constant bank ({CONST_BANK_BYTES} bytes)")
+        base = int(bank, 0) * CONST_BANK_BYTES
+        const.data[base:base + image.size] = image
+    return const
+
+
+def make_spaces(
+    args: argparse.Namespace, glob: FlatMemory | None, ctas: int, threads: int, const: FlatMemory | None = None
+) -> AddressSpaces:
+    # AddressSpaces of a run from the add_memory_args options (`const`: banks already loaded).
+    if const is None:
+        const = load_constants(args.cmem_in)
+    spaces = AddressSpaces(glob, ctas, threads, args.smem, args.lmem, const, args.mem_stats)
+    if args.bank_conflicts or args.bank_trace:
+        spaces.banks = banks.BankStats(trace=bool(args.bank_trace))
+    return spaces
+
+
+def report(args: argparse.Namespace, stats: AccessStats | None, bank_stats: banks.BankStats | None) -> None:
+    # The --mem-stats / --bank-conflicts tables and the --bank-trace file of a finished run.
+    if stats is not None:
+        print("\n".join(stats.report()))
+    if bank_stats is not None:
+        if args.bank_conflicts:
+            print("\n".join(bank_stats.report()))
+        if args.bank_trace:
+            np.save(args.bank_trace, bank_stats.trace())
+
+
+def fill_memory(mem: FlatMemory, path: str) -> None:
+    if path:
+        image = np.fromfile(path, dtype=np.uint8)
+        if image.size > mem.data.size:
+            raise ValueError(f"{path}: {image.size} bytes do not fit in global memory ({mem.data.size} bytes)")
+        mem.data[:image.size] = image
+
+
+def save_memory(mem: FlatMemory, path: str) -> None:
+    if path:
+        mem.data.tofile(path)
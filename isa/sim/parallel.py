@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/parallel.py isa/encoding.v1.json isa/spec.jsonc prog.json --ctas 4096 --block 256
+#   python3 isa/sim/parallel.py isa/encoding.v1.json isa/spec.jsonc prog.json --ctas 1024 --block 128 --jobs 8 \
+#       --gmem 64M --gmem-in in.bin --gmem-out out.bin --peek 0x1000:8
+# Notes:
+#   - CTA-parallel kernel launch: the 1-D grid is cut into tasks of `--ctas-per-task` consecutive CTAs
+#     (default: about four tasks per worker) and each worker process runs its tasks as batch.py WarpBatches.
+#     CTAs share no registers, so global memory is the only state shared between workers.
+#   - global memory is one multiprocessing.shared_memory block that every worker wraps in a NumPy uint8
+#     array (memory.FlatMemory over the same pages, no copies). Plain LD / ST are visible to other CTAs as
+#     soon as they execute, with no ordering between CTAs, as on hardware without fences.
+#   - atom / atomg hold lock stripes (`--stripes` multiprocessing locks over 8-byte granules) for the
+#     addresses they touch, so atomics from different workers are serialized per stripe; see memory.py.
+#   - `--jobs 1` runs every task in this process (same memory block, no locks); commutative atomics (ADD,
+#     MIN, MAX, AND, OR, XOR) give the same final memory for any `--jobs`.
+#   - shared and local memory are private to a task's batch (CTAs never share them); every worker gets a
+#     copy of the constant banks. `--mem-stats` / `--bank-conflicts` / `--simt` sum the statistics of all
+#     tasks.
+#   - `--trace FILE`: every task writes its own trace, `FILE.<first CTA>`, and the parts are joined into
+#     FILE in task order (exectrace.concat); warp ids are grid-wide.
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import banks
+import exectrace
+import memory
+from batch import init_registers, launch, run
+from decode import LANES, assemble, load_decoder
+from warp import BLOCK_CACHE, Program, SimtStats
+
+# Worker state, set once per process by init_worker.
+_PROGRAM: Program | None = None
+_SHM: shared_memory.SharedMemory | None = None
+_MEM: memory.FlatMemory | None = None
+_OPTIONS: dict = {}
+
+
+def init_worker(program: Program, shm_name: str, size: int, locks: list | None, options: dict) -> None:
+    global _PROGRAM, _SHM, _MEM, _OPTIONS
+    _PROGRAM = program
+    _SHM = shared_memory.SharedMemory(name=shm_name)
+    _MEM = memory.FlatMemory(np.ndarray(size, dtype=np.uint8, buffer=_SHM.buf), locks)
+    _OPTIONS = options
+
+
+def release_worker() -> None:
+    global _SHM, _MEM
+    _MEM = None
+    if _SHM is not None:
+        _SHM.close()
+        _SHM = None
+
+
+def run_ctas(span: tuple[int, int]) -> tuple:
+    # One task: CTAs first .. first + count - 1; returns (group steps, warp instructions, access stats,
+    # bank stats, SIMT stats). With --trace the task writes its own part file, `<trace>.<first CTA>`.
+    first, count = span
+    args = _OPTIONS["args"]
+    batch = launch(count, _OPTIONS["block"], first, _OPTIONS["ctas"])
+    init_registers(batch, _OPTIONS["sets"])
+    batch.mem = memory.make_spaces(args, _MEM, count, batch.n * LANES, _OPTIONS["const"])
+    batch.trace = exectrace.open_trace(args, f"{args.trace}.{first}" if args.trace else "")
+    simt = SimtStats() if args.simt else None
+    try:
+        steps, warp_instrs = run(_PROGRAM, batch, _OPTIONS["schedule"], _OPTIONS["chunk"], simt=simt)
+    finally:
+        if batch.trace is not None:
+            batch.trace.close()
+    return steps, warp_instrs, batch.mem.stats, batch.mem.banks, simt
+
+
+def run_grid(
+    program: Program, shm: shared_memory.SharedMemory, size: int, options: dict, jobs: int, per_task: int,
+    stripes: int,
+) -> tuple:
+    # Returns (tasks, group steps, warp instructions, access stats, bank stats, SIMT stats); the statistics
+    # are summed over the tasks in task order.
+    n = options["ctas"]
+    tasks = [(c, min(per_task, n - c)) for c in range(0, n, per_task)]
+    if jobs <= 1:
+        init_worker(program, shm.name, size, None, options)
+        try:
+            results = [run_ctas(t) for t in tasks]
+        finally:
+            release_worker()
+    else:
+        ctx = mp.get_context()
+        locks = [ctx.Lock() for _ in range(stripes)]
+        initargs = (program, shm.name, size, locks, options)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, initializer=init_worker, initargs=initargs) as pool:
+            results = list(pool.map(run_ctas, tasks))
+    stats = memory.AccessStats() if results[0][2] is not None else None
+    bank_stats = banks.BankStats(trace=results[0][3].chunks is not None) if results[0][3] is not None else None
+    if options["args"].trace:
+        exectrace.concat(options["args"].trace, [f"{options['args'].trace}.{c}" for c, _ in tasks])
+    simt = SimtStats() if results[0][4] is not None else None
+    for r in results:
+        if stats is not None:
+            stats.merge(r[2].rows)
+        if bank_stats is not None:
+            bank_stats.merge(r[3])
+        if simt is not None:
+            simt.merge(r[4])
+    return len(tasks), sum(r[0] for r in results), sum(r[1] for r in results), stats, bank_stats, simt
+
+
+def simulate(
+    program: Program, shm: shared_memory.SharedMemory, size: int, options: dict, jobs: int, per_task: int,
+    args: argparse.Namespace, peeks: list[tuple[int, int]],
+) -> tuple[int, int, int, float]:
+    # Fill the shared block, run the grid, then save / print memory; the NumPy views die with this frame,
+    # so the caller can close the block.
+    mem = memory.FlatMemory(np.ndarray(size, dtype=np.uint8, buffer=shm.buf))
+    mem.data[:] = 0
+    memory.fill_memory(mem, args.gmem_in)
+    t0 = time.perf_counter()
+    tasks, steps, warp_instrs, stats, bank_stats, simt = run_grid(
+        program, shm, size, options, jobs, per_task, args.stripes
+    )
+    dt = time.perf_counter() - t0
+    memory.save_memory(mem, args.gmem_out)
+    words = mem.view(np.uint32)
+    for addr, count in peeks:
+        row = words[addr // 4:addr // 4 + count]
+        print(f"{addr:#010x}: " + " ".join(f"{int(v):08x}" for v in row))
+    memory.report(args, stats, bank_stats)
+    if simt is not None:
+        print("\n".join(simt.report()))
+    return tasks, steps, warp_instrs, dt
+
+
+def parse_peek(text: str) -> tuple[int, int]:
+    addr, _, count = text.partition(":")
+    return int(addr, 0), int(count or "1", 0)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a kernel launch with its CTAs spread over worker processes.")
+    parser.add_argument("encoding", help="Encoding JSON (encoding_synthesis v1 / v2 output)")
+    parser.add_argument("spec", help="Path to spec.jsonc")
+    parser.add_argument("program", help="JSON program (see decode.py --asm)")
+    parser.add_argument("--ctas", type=int, default=1, help="Number of CTAs (default: 1)")
+    parser.add_argument("--block", type=int, default=LANES, help="Threads per CTA (default: 32)")
+    parser.add_argument("--set", dest="sets", action="append", default=[], help="Initial value REG=VALUE (repeatable)")
+    parser.add_argument("--schedule", choices=["min-pc", "round-robin"], default="min-pc", help="PC group order")
+    parser.add_argument("--chunk", type=int, default=1024, help="Max warps per NumPy step (default: 1024)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--ctas-per-task", type=int, default=0, help="CTAs per task (default: ~4 tasks per worker)")
+    parser.add_argument("--stripes", type=int, default=64, help="Atomic lock stripes (default: 64)")
+    parser.add_argument("--peek", action="append", default=[], help="Print ADDR[:COUNT] 32-bit words of global memory")
+    parser.add_argument("--simt", action="store_true", help="Print the SIMT efficiency of every instruction")
+    parser.add_argument(
+        "--block-cache", type=int, default=BLOCK_CACHE, help="Translated basic blocks kept (LRU, 0: no cache)"
+    )
+    memory.add_memory_args(parser)
+    exectrace.add_trace_args(parser)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        decoder = load_decoder(args.encoding, args.spec)
+        with open(args.program, "r", encoding="utf-8") as fh:
+            program = Program(decoder, assemble(decoder, json.load(fh)), args.block_cache)
+        if min(args.ctas, args.block, args.chunk, args.stripes) < 1:
+            raise ValueError("--ctas, --block, --chunk and --stripes must be positive")
+        peeks = [parse_peek(p) for p in args.peek]
+        const = memory.load_constants(args.cmem_in)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    jobs = max(1, args.jobs)
+    per_task = args.ctas_per_task if args.ctas_per_task > 0 else max(1, -(-args.ctas // (jobs * 4)))
+    options = {
+        "ctas": args.ctas, "block": args.block, "sets": args.sets, "schedule": args.schedule, "chunk": args.chunk,
+        "args": args, "const": const,
+    }
+    size = -(-args.gmem // 8) * 8
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        tasks, steps, warp_instrs, dt = simulate(program, shm, size, options, jobs, per_task, args, peeks)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        shm.close()
+        shm.unlink()
+    rate = warp_instrs * LANES / dt if dt > 0 else 0.0
+    print(
+        f"-- {args.ctas} CTAs in {tasks} tasks on {jobs} workers, {steps} group steps, {warp_instrs} warp "
+        f"instructions in {dt:.3f}s ({rate:,.0f} lane-ops/s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
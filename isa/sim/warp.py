@@ -0,0 +1,1544 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/sim/warp.py isa/encoding.v1.json isa/spec.jsonc prog.json
+#   python3 isa/sim/warp.py isa/encoding.v2.json isa/spec.jsonc prog.json --set R2=0x3f800000 --set UR1=7 --dump R1,P0
+#   python3 isa/sim/warp.py isa/encoding.v1.json isa/spec.jsonc prog.json --repeat 10000
+# Notes:
+#   - functional model of one warp (32 lanes); `prog.json` is a decode.py `--asm` program (assembled, then
+#     executed from the decoded words). Execution starts at byte address 0 and ends when the pc leaves the
+#     program; instruction addresses advance by the encoding width (16 bytes, 8 for `short_encodings`).
+#   - state follows spec_notes.md: VGPR uint32[256, 32] (row 255 is RZ and always reads 0), SGPR uint32[64]
+#     (63 is URZ), predicates as uint32 lane bitmasks P0..P7 (P7 = PT reads all ones, writes are dropped),
+#     and the exec mask. Only active lanes are written.
+#   - every lane operation is one NumPy expression over the lane axis; handlers only use the accessors of
+#     WarpState (`v`, `xv`, `x`, `p`, `set_*`, `active`), so they also run on states with leading warp axes.
+#   - CSR ids are a simulator convention (the spec does not number them): per-warp CSRs (s_getcsr /
+#     s_setcsr) CTAID_X..Z = 0..2, NTID_X..Z = 3..5, WARPID = 6, NCTAID_X..Z = 7..9 are read-only, 10..63
+#     are scratch; per-lane CSRs (v_getcsr) TID_X..Z = 0..2, LANEID = 3.
+#   - behaviour choices where the spec is silent:
+#       iadd / shl_add pout0 is the carry out of the 32-bit addition; shl_add adds pin0 as carry-in when
+#       ccin = CCIN; imad pout0 (.wide) is the carry out of the 64-bit addition.
+#       fp16 results (v_ffma.f16, fmnmx.f16, frnd.F16) are written to the low half with the high half zeroed;
+#       16-bit and narrower conversion results (f2f / f2i / i2i) go to the half chosen by the dst opsel and
+#       keep the other half.
+#       f2i always saturates (NaN -> 0); bmsk `clamp` limits width and position to 32, `wrap` takes [4:0].
+#       fsf is the correctly rounded function (not the SFU's approximation).
+#   - LD / ST (every mem_scope), LDC and the pseudo instructions atom / atoms / atomg (decode.PSEUDO_FORMS)
+#     access the memory.AddressSpaces in `state.mem`: global memory (`--gmem` bytes, optionally loaded from
+#     `--gmem-in`), this warp's CTA slot of shared memory, its threads' slots of local memory and the
+#     constant banks. The byte address is vaddr + saddr + offset (32-bit wrap-around, offset
+#     zero-extended); generic addresses (generic LD / ST, atom) are split by the memory.py windows. LDC
+#     reads bank saddr at vaddr + offset, or bank const_bank at saddr + offset. atom / atoms / atomg return
+#     the old value to dst (dst, dst + 1 for U64); CAS compares with data and stores data + 1 (data + 2,
+#     data + 3 for U64). consistency_scope and cache_policy have no functional effect. Shared-memory
+#     accesses feed the banks.py analyzer when `state.mem.banks` is set (`--bank-conflicts`).
+#   - packed instructions (hadd_pk / hma_pk / hmnmx_pk / hmul_pk / hcmp_pk) view each register as (..., 32,
+#     2) uint16 halves (half 0 = low 16 bits, the first result half); packed_opsel picks the halves by index
+#     (H0_H0 / H1_H1), packed_opsel_B32 `B32` feeds one fp32 value to both halves. An imm16 feeds both
+#     halves, an `src1, src2` imm16 pair and an imm32 give half 0 and half 1. Results are rounded once from
+#     the exact value (rnd_mode_fp when the form has it, else rne). hcmp_pk to an sreg writes the half 0
+#     lane mask to dst and the half 1 mask to dst + 1; BoolFM BF writes 1.0 of the packed type per half.
+#   - BF16 / TF32 (f2f, f2i, i2f, frnd, type_fp16_bf16) use the fp.py helpers; 16-bit values are half
+#     registers like F16.
+#   - shfl / vote / match work on the whole lane axis: shfl is one take_along_axis gather with the PTX
+#     shfl.sync index and clamp rules, vote packs the ballot with np.packbits, match groups equal values by
+#     sorting each warp's lanes. src2 of shfl packs the clamp in [4:0] and the segment mask in [9:5] (the
+#     PTX `c` operand with its fields made adjacent to fit the imm12). Only active lanes take part: an
+#     inactive or out-of-range source lane leaves the lane its own value with pout0 false, and ballots /
+#     match masks never contain inactive lanes. The spec defines vote_type but no vote form encodes it, so
+#     a decoded vote is ANY (the ballot vote).
+#   - control flow (pseudo instructions, the spec has none): `bssy Bx, target` stores the exec mask in Bx
+#     (16 per warp, uint32 lane masks, with the reconvergence pc), `bra` branches the lanes whose pin0 is
+#     true to an absolute byte address, and `bsync Bx` holds until the lanes of Bx that have not left the
+#     program arrive. A divergent branch splits the warp into paths (pc, 32-bit lane mask); the lowest-pc
+#     ready path runs, each instruction as one NumPy expression under its mask, and paths meeting at a pc
+#     merge. Lanes whose path leaves the program exit. `--simt` prints the SIMT efficiency (active lanes /
+#     32) of every instruction.
+#   - translation cache: Program.block(pc) translates the basic block at pc (up to the first bra / bsync)
+#     once into handlers bound to their decoded Instr (functools.partial) and keeps it by pc, least recently
+#     used evicted past `--block-cache` blocks; Program.write replaces an instruction and drops the blocks
+#     that hold it. `run` executes a block per loop iteration.
+#   - `--trace FILE` records every instruction, register write and memory address to a binary trace
+#     (exectrace.py; `state.trace`, warp id = WARPID); the set_* accessors and the address helpers feed it.
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+
+import numpy as np
+
+import exectrace
+import fp
+import memory
+from decode import LANES, PT, RZ, URZ, Decoder, Instr, assemble, load_decoder, parse_operand
+
+FULL_MASK = 0xFFFFFFFF
+MASK32 = np.uint64(0xFFFFFFFF)
+LANE_BITS = np.uint32(1) << np.arange(LANES, dtype=np.uint32)
+
+CSR_CTAID = 0
+CSR_NTID = 3
+CSR_WARPID = 6
+CSR_NCTAID = 7
+CSR_READ_ONLY = 10
+CSR_TID = 0
+CSR_LANEID = 3
+BARRIERS = 16
+# Instructions that can leave the straight line: they end a basic block.
+BLOCK_ENDS = {"bra", "bsync"}
+BLOCK_CACHE = 1024
+
+HANDLERS: dict[str, Callable] = {}
+
+
+def handler(*names: str):
+    def register(fn):
+        for name in names:
+            HANDLERS[name] = fn
+        return fn
+
+    return register
+
+
+def pack_lanes(b: np.ndarray) -> np.ndarray:
+    # bool (..., 32) -> uint32 (...) lane bitmask: four little-endian bytes of packed bits per warp.
+    return np.packbits(b, axis=-1, bitorder="little").view("<u4")[..., 0].astype(np.uint32, copy=False)
+
+
+def unpack_lanes(m) -> np.ndarray:
+    return (np.asarray(m, dtype=np.uint32)[..., None] & LANE_BITS) != 0
+
+
+class WarpState:
+    def __init__(self, warp_id: int = 0, tid_base: int = 0, ntid: tuple[int, int, int] = (32, 1, 1)) -> None:
+        self.vgpr = np.zeros((RZ + 1, LANES), dtype=np.uint32)
+        self.sgpr = np.zeros(URZ + 1, dtype=np.uint32)
+        self.pred = np.zeros(PT + 1, dtype=np.uint32)
+        self.pred[PT] = FULL_MASK
+        self.csr = np.zeros(64, dtype=np.uint32)
+        self.lane_csr = np.zeros((64, LANES), dtype=np.uint32)
+        self.pc = 0
+        self.mem: memory.AddressSpaces | None = None
+        self.trace: exectrace.TraceWriter | None = None
+        # Shared / local memory slots (memory.AddressSpaces): CTA per warp, thread per lane.
+        self.cta_slot = np.int64(0)
+        self.thread_slot = np.arange(LANES, dtype=np.int64)
+        # Bx: reconvergence lane mask and pc per barrier register.
+        self.breg = np.zeros(BARRIERS, dtype=np.uint32)
+        self.bpc = np.zeros(BARRIERS, dtype=np.int64)
+        # Divergence: the paths not running (pc -> lane mask), the pcs of those held in a bsync and the lanes
+        # that left the program; `jump` / `blocked` are the requests of the running instruction.
+        self.paths: dict[int, int] = {}
+        self.held: set[int] = set()
+        self.exited = 0
+        self.jump: tuple[int, int] | None = None
+        self.blocked = False
+        self.set_exec(FULL_MASK)
+        self.csr[CSR_NTID:CSR_NTID + 3] = ntid
+        self.csr[CSR_WARPID] = warp_id
+        linear = tid_base + np.arange(LANES, dtype=np.uint32)
+        self.lane_csr[CSR_TID] = linear % ntid[0]
+        self.lane_csr[CSR_TID + 1] = (linear // ntid[0]) % ntid[1]
+        self.lane_csr[CSR_TID + 2] = linear // (ntid[0] * ntid[1])
+        self.lane_csr[CSR_LANEID] = np.arange(LANES, dtype=np.uint32)
+
+    @property
+    def lane_shape(self) -> tuple[int, ...]:
+        return (LANES,)
+
+    def set_exec(self, mask: int) -> None:
+        self.exec_mask = np.uint32(mask)
+        self.active = unpack_lanes(self.exec_mask)
+
+    # Reads: lane values (..., 32), per-warp values (...), and per-warp values broadcast over lanes.
+    def v(self, r: int) -> np.ndarray:
+        return self.vgpr[r]
+
+    def x(self, r: int) -> np.ndarray:
+        return self.sgpr[r]
+
+    def xv(self, r: int) -> np.ndarray:
+        return self.sgpr[r]
+
+    def p(self, i: int) -> np.ndarray:
+        return unpack_lanes(self.pred[i])
+
+    def pmask(self, i: int) -> np.ndarray:
+        return self.pred[i]
+
+    def csr_value(self, i: int) -> np.ndarray:
+        return self.csr[i]
+
+    def lane_csr_value(self, i: int) -> np.ndarray:
+        return self.lane_csr[i]
+
+    # Writes: only active lanes; RZ / URZ / PT writes are dropped. `trace` records the written registers.
+    def set_v(self, r: int, value) -> None:
+        if r != RZ:
+            self.vgpr[r] = np.where(self.active, value, self.vgpr[r])
+            if self.trace is not None:
+                self.trace.reg(exectrace.VREG, r, self.exec_mask, self.vgpr[r])
+
+    def set_x(self, r: int, value) -> None:
+        if r != URZ:
+            self.sgpr[r] = value
+            if self.trace is not None:
+                self.trace.reg(exectrace.SREG, r, self.exec_mask, self.sgpr[r])
+
+    def set_p(self, i: int, lanes: np.ndarray) -> None:
+        if i != PT:
+            m = self.exec_mask
+            self.pred[i] = (self.pred[i] & ~m) | (pack_lanes(lanes) & m)
+            if self.trace is not None:
+                self.trace.reg(exectrace.PRED, i, m, self.pred[i])
+
+    def set_csr(self, i: int, value) -> None:
+        self.csr[i] = value
+        if self.trace is not None:
+            self.trace.reg(exectrace.CSR, i, self.exec_mask, self.csr[i])
+
+    # Control flow: Bx registers, and the branch / bsync requests the run loop applies after the handler.
+    def bx(self, i: int) -> np.ndarray:
+        return self.breg[i]
+
+    def set_bx(self, i: int, mask, pc: int) -> None:
+        self.breg[i] = mask
+        self.bpc[i] = pc
+
+    def branch(self, target: int, taken) -> None:
+        self.jump = (target, int(taken))
+
+    def wait(self, mask) -> None:
+        # Hold the running path until it holds every lane of `mask` that has not exited.
+        self.blocked = bool(mask & ~np.uint32(self.exited) & ~self.exec_mask)
+
+    def add_path(self, pc: int, mask: int) -> None:
+        if pc in self.paths:
+            self.paths[pc] |= mask
+            self.held.discard(pc)
+        else:
+            self.paths[pc] = mask
+
+    def advance(self) -> None:
+        # Move to next_pc; a divergent branch or a bsync that holds switches to the lowest ready path.
+        if self.jump is None and not self.blocked and not self.paths:
+            self.pc = self.next_pc
+            return
+        mask = int(self.exec_mask)
+        if self.blocked:
+            self.blocked = False
+            self.paths[self.pc] = mask
+            self.held.add(self.pc)
+        else:
+            if self.jump is not None:
+                target, taken = self.jump
+                self.jump = None
+                taken &= mask
+                if taken:
+                    self.add_path(target, taken)
+                    mask &= ~taken
+            if mask:
+                self.add_path(self.next_pc, mask)
+        self.resume()
+
+    def resume(self) -> bool:
+        # Run the lowest-pc path not held in a bsync; False when no path is left.
+        ready = [pc for pc in self.paths if pc not in self.held]
+        if not ready:
+            if self.paths:
+                raise RuntimeError(f"bsync deadlock: every path held at {', '.join(map(hex, sorted(self.held)))}")
+            return False
+        self.pc = min(ready)
+        mask = self.paths.pop(self.pc)
+        if mask != self.exec_mask:
+            self.set_exec(mask)
+        return True
+
+    def exit(self) -> bool:
+        # The running path left the program: its lanes exit and the held bsyncs are retried. When no path is
+        # left the exec mask goes back to every lane that ran, so the program can run again.
+        self.exited |= int(self.exec_mask)
+        self.held.clear()
+        if self.resume():
+            return True
+        self.set_exec(self.exited)
+        self.exited = 0
+        return False
+
+
+class SimtStats:
+    # Per pc: [instruction key, warp instructions, active lanes]; SIMT efficiency is lanes / (32 * instrs).
+    def __init__(self) -> None:
+        self.rows: dict[int, list] = {}
+
+    def record(self, pc: int, key: str, warps: int, lanes: int) -> None:
+        row = self.rows.setdefault(pc, [key, 0, 0])
+        row[1] += warps
+        row[2] += lanes
+
+    def merge(self, other: SimtStats) -> None:
+        for pc, (key, warps, lanes) in other.rows.items():
+            self.record(pc, key, warps, lanes)
+
+    def report(self) -> list[str]:
+        lines = [f"{'pc':>6}  {'instruction':<28} {'warp instrs':>11} {'lanes':>12} {'SIMT eff':>8}"]
+        for pc in sorted(self.rows):
+            key, warps, lanes = self.rows[pc]
+            lines.append(f"{pc:#6x}  {key:<28} {warps:>11} {lanes:>12} {lanes / (warps * LANES):>8.1%}")
+        warps = sum(r[1] for r in self.rows.values())
+        lanes = sum(r[2] for r in self.rows.values())
+        if warps:
+            lines.append(f"{'total':>6}  {'':<28} {warps:>11} {lanes:>12} {lanes / (warps * LANES):>8.1%}")
+        return lines
+
+
+@dataclass
+class Block:
+    # A basic block from `pc` up to and including the first BLOCK_ENDS instruction (or the program end);
+    # ops are (pc, handler bound to its Instr, next pc, key).
+    pc: int
+    end: int
+    ops: list[tuple[int, Callable, int, str]]
+
+
+class Program:
+    def __init__(self, decoder: Decoder, words: list[int | Instr], cache_blocks: int = BLOCK_CACHE) -> None:
+        # `words` as returned by decode.assemble (pseudo instructions are already Instr).
+        self.decoder = decoder
+        self.words = list(words)
+        self.instrs = [w if isinstance(w, Instr) else decoder.decode(w) for w in self.words]
+        self.addrs: list[int] = []
+        addr = 0
+        for ins in self.instrs:
+            self.addrs.append(addr)
+            addr += ins.width // 8
+        self.end = addr
+        self.index = {a: i for i, a in enumerate(self.addrs)}
+        # Translation cache: start pc -> Block, least recently used first; 0 translates on every entry.
+        self.cache_blocks = cache_blocks
+        self.blocks: OrderedDict[int, Block] = OrderedDict()
+        self.translations = 0
+
+    def translate(self, pc: int) -> Block | None:
+        i = self.index.get(pc)
+        if i is None:
+            return None
+        ops = []
+        for ins, addr in zip(self.instrs[i:], self.addrs[i:]):
+            fn = HANDLERS.get(ins.instruction)
+            # An unmodelled instruction raises in `step` when it is reached, not when its block is built.
+            op = partial(fn, ins=ins) if fn is not None else partial(step, ins=ins)
+            ops.append((addr, op, addr + ins.width // 8, ins.key))
+            if ins.instruction in BLOCK_ENDS:
+                break
+        self.translations += 1
+        return Block(pc, ops[-1][2], ops)
+
+    def block(self, pc: int) -> Block | None:
+        # The translated block at `pc` (None outside the program), with LRU eviction past cache_blocks.
+        block = self.blocks.get(pc)
+        if block is not None:
+            self.blocks.move_to_end(pc)
+            return block
+        block = self.translate(pc)
+        if block is not None and self.cache_blocks > 0:
+            self.blocks[pc] = block
+            if len(self.blocks) > self.cache_blocks:
+                self.blocks.popitem(last=False)
+        return block
+
+    def write(self, addr: int, word: int | Instr) -> None:
+        # Code write: replace the instruction at `addr` (same width) and drop every block holding it.
+        i = self.index.get(addr)
+        if i is None:
+            raise ValueError(f"{addr:#x}: no instruction starts here")
+        ins = word if isinstance(word, Instr) else self.decoder.decode(word)
+        if ins.width != self.instrs[i].width:
+            raise ValueError(f"{addr:#x}: {ins.key} is {ins.width} bits, the instruction it replaces is "
+                             f"{self.instrs[i].width}")
+        self.words[i] = word
+        self.instrs[i] = ins
+        for pc in [pc for pc, b in self.blocks.items() if pc <= addr < b.end]:
+            del self.blocks[pc]
+
+
+def step(state, ins: Instr) -> None:
+    fn = HANDLERS.get(ins.instruction)
+    if fn is None:
+        raise NotImplementedError(f"{ins.key}: not modelled by the simulator")
+    fn(state, ins)
+
+
+def run(program: Program, state: WarpState, max_steps: int = 1 << 62, simt: SimtStats | None = None) -> int:
+    # Runs a translated block at a time. While the warp has other paths, a block stops at the first pc
+    # another path waits at, so the paths still merge there.
+    steps = 0
+    with np.errstate(all="ignore"):
+        while steps < max_steps:
+            block = program.block(state.pc)
+            if block is None:
+                if state.exit():
+                    continue
+                break
+            ops = block.ops[:max_steps - steps]
+            if state.paths:
+                ahead = [pc for pc in state.paths if pc > state.pc]
+                if ahead:
+                    limit = min(ahead)
+                    ops = [o for o in ops if o[0] < limit]
+            lanes = int(state.exec_mask).bit_count()
+            for pc, op, next_pc, key in ops:
+                state.pc = pc
+                state.next_pc = next_pc
+                if state.trace is not None:
+                    state.trace.step(pc, state.csr[CSR_WARPID], state.exec_mask)
+                op(state)
+                if simt is not None:
+                    simt.record(pc, key, 1, lanes)
+            steps += len(ops)
+            state.advance()
+    return steps
+
+
+# ---- operand access ----------------------------------------------------------------------------------
+
+def u32(state, ins: Instr, role: str) -> np.ndarray:
+    # Lane-broadcastable uint32 source with src_int_modi / src_bit_modi applied.
+    op = ins.operands[role]
+    if op.kind == "vreg":
+        val = state.v(op.value)
+    elif op.kind == "sreg":
+        val = state.xv(op.value)
+    else:
+        val = np.uint32(op.value)
+    if ins.flags.get((role, "src_int_modi")) == "NEG":
+        val = np.negative(val, dtype=np.uint32)
+    if ins.flags.get((role, "src_bit_modi")) == "INV":
+        val = ~val
+    return val
+
+
+def uniform(state, ins: Instr, role: str) -> np.ndarray:
+    # Per-warp uint32 source of a scalar (s_*) instruction.
+    op = ins.operands[role]
+    val = state.x(op.value) if op.kind == "sreg" else np.uint32(op.value)
+    if ins.flags.get((role, "src_int_modi")) == "NEG":
+        val = np.negative(val, dtype=np.uint32)
+    if ins.flags.get((role, "src_bit_modi")) == "INV":
+        val = ~val
+    return val
+
+
+def pair(state, ins: Instr, role: str, lanes: bool = True) -> np.ndarray:
+    # 64-bit source: a register pair (r, r + 1), or a 32-bit immediate zero-extended.
+    op = ins.operands[role]
+    if op.kind == "vreg":
+        lo, hi = state.v(op.value), state.v(op.value + 1 if op.value != RZ else RZ)
+    elif op.kind == "sreg":
+        read = state.xv if lanes else state.x
+        lo, hi = read(op.value), read(op.value + 1 if op.value != URZ else URZ)
+    else:
+        lo, hi = np.uint32(op.value), np.uint32(0)
+    return np.asarray(lo, dtype=np.uint64) | (np.asarray(hi, dtype=np.uint64) << np.uint64(32))
+
+
+def pred(state, ins: Instr, role: str) -> np.ndarray:
+    val = state.p(ins.operands[role].value)
+    if ins.flags.get((role, "src_bit_modi")) == "INV":
+        val = ~val
+    return val
+
+
+def f32(state, ins: Instr, role: str) -> np.ndarray:
+    bits = fp.apply_fp_modi(u32(state, ins, role), ins.flags.get((role, "src_fp_modi")))
+    x = fp.bits_to_f32(bits)
+    return fp.flush_denorm(x) if ins.mods.get("ftz") == "FTZ" else x
+
+
+def half_bits(state, ins: Instr, role: str) -> np.ndarray:
+    # 16-bit source: an imm16, or the register half selected by opsel.
+    op = ins.operands[role]
+    bits = u32(state, ins, role)
+    if op.kind not in ("vreg", "sreg"):
+        return bits & np.uint32(0xFFFF)
+    if ins.flags.get((role, "opsel")) == "HI":
+        return bits >> np.uint32(16)
+    return bits & np.uint32(0xFFFF)
+
+
+def f16(state, ins: Instr, role: str) -> np.ndarray:
+    bits = fp.apply_fp_modi(half_bits(state, ins, role), ins.flags.get((role, "src_fp_modi")), fp.SIGN16)
+    x = fp.bits_to_f16(bits)
+    return fp.flush_denorm(x) if ins.mods.get("ftz") == "FTZ" else x
+
+
+def bf16(state, ins: Instr, role: str) -> np.ndarray:
+    bits = fp.apply_fp_modi(half_bits(state, ins, role), ins.flags.get((role, "src_fp_modi")), fp.SIGN16)
+    x = fp.bits_to_bf16(bits)
+    return fp.flush_denorm(x) if ins.mods.get("ftz") == "FTZ" else x
+
+
+def fsrc(state, ins: Instr, role: str, dtype) -> np.ndarray:
+    if dtype == np.float16:
+        return f16(state, ins, role)
+    if dtype == fp.BF16:
+        return bf16(state, ins, role)
+    x = f32(state, ins, role)
+    # tf32 reads the fp32 pattern without its low 13 mantissa bits.
+    return fp.bits_to_f32(fp.f32_to_bits(x) & ~np.uint32(0x1FFF)) if dtype == fp.TF32 else x
+
+
+def write_dst(state, ins: Instr, value) -> None:
+    op = ins.operands["dst"]
+    if op.kind == "sreg":
+        state.set_x(op.value, value)
+    else:
+        state.set_v(op.value, value)
+
+
+def write_pair(state, ins: Instr, value64: np.ndarray) -> None:
+    op = ins.operands["dst"]
+    lo = (value64 & MASK32).astype(np.uint32)
+    hi = (value64 >> np.uint64(32)).astype(np.uint32)
+    if op.kind == "sreg":
+        state.set_x(op.value, lo)
+        if op.value != URZ:
+            state.set_x(op.value + 1, hi)
+    else:
+        state.set_v(op.value, lo)
+        if op.value != RZ:
+            state.set_v(op.value + 1, hi)
+
+
+def write_half(state, ins: Instr, value16: np.ndarray) -> None:
+    # Write a 16-bit result into the dst half chosen by its opsel, keeping the other half.
+    op = ins.operands["dst"]
+    old = state.v(op.value)
+    value16 = np.asarray(value16, dtype=np.uint32) & np.uint32(0xFFFF)
+    if ins.flags.get(("dst", "opsel")) == "HI":
+        state.set_v(op.value, (old & np.uint32(0xFFFF)) | (value16 << np.uint32(16)))
+    else:
+        state.set_v(op.value, (old & np.uint32(0xFFFF0000)) | value16)
+
+
+def combine(state, ins: Instr, cond: np.ndarray) -> np.ndarray:
+    # pred_comb with pin0 for the compare instructions (packed compares: pin0 applies to both halves).
+    p = pred(state, ins, "pin0")
+    if np.ndim(cond) > np.ndim(p):
+        p = p[..., None]
+    comb = ins.mods.get("pred_comb", "AND")
+    if comb == "AND":
+        return cond & p
+    if comb == "OR":
+        return cond | p
+    if comb == "XOR":
+        return cond ^ p
+    raise ValueError(f"{ins.key}: unknown pred_comb '{comb}'")
+
+
+def write_bool(state, ins: Instr, r: np.ndarray, true_bits: np.uint32) -> None:
+    # Boolean result to a predicate, a per-lane register, or a per-warp lane mask in an sreg.
+    if "pout0" in ins.operands:
+        state.set_p(ins.operands["pout0"].value, r)
+        return
+    op = ins.operands["dst"]
+    if op.kind == "sreg":
+        state.set_x(op.value, pack_lanes(r & state.active))
+    else:
+        state.set_v(op.value, np.where(r, true_bits, np.uint32(0)))
+
+
+def as_signed(u: np.ndarray) -> np.ndarray:
+    return np.asarray(u, dtype=np.uint32).view(np.int32)
+
+
+def rounding(ins: Instr) -> str:
+    return ins.mods.get("rnd_mode_fp", "rne")
+
+
+def fp_type(ins: Instr):
+    return np.float16 if ins.mods.get("fp_type") == "FP16" else np.float32
+
+
+# ---- integer / bitwise ---------------------------------------------------------------------------------
+
+@handler("nop")
+def op_nop(state, ins: Instr) -> None:
+    pass
+
+
+@handler("mov")
+def op_mov(state, ins: Instr) -> None:
+    write_dst(state, ins, u32(state, ins, "src0"))
+
+
+@handler("sel")
+def op_sel(state, ins: Instr) -> None:
+    write_dst(state, ins, np.where(pred(state, ins, "pin0"), u32(state, ins, "src0"), u32(state, ins, "src1")))
+
+
+def add_carry(a, b) -> tuple[np.ndarray, np.ndarray]:
+    # 32-bit sum with wrap-around, and its carry out.
+    s = a + b
+    return s, s < a
+
+
+@handler("iadd")
+def op_iadd(state, ins: Instr) -> None:
+    s, carry = add_carry(u32(state, ins, "src0"), u32(state, ins, "src1"))
+    write_dst(state, ins, s)
+    if "pout0" in ins.operands:
+        state.set_p(ins.operands["pout0"].value, np.broadcast_to(carry, state.lane_shape))
+
+
+@handler("shl_add")
+def op_shl_add(state, ins: Instr) -> None:
+    b = u32(state, ins, "src1") << (u32(state, ins, "src2") & np.uint32(31))
+    s, carry = add_carry(u32(state, ins, "src0"), b)
+    if ins.mods.get("ccin") == "CCIN":
+        s, c2 = add_carry(s, pred(state, ins, "pin0").astype(np.uint32))
+        carry = carry | c2
+    write_dst(state, ins, s)
+    if "pout0" in ins.operands:
+        state.set_p(ins.operands["pout0"].value, np.broadcast_to(carry, state.lane_shape))
+
+
+@handler("imad")
+def op_imad(state, ins: Instr) -> None:
+    signed = ins.mods.get("is_signed") == "SIGNED"
+    a, b = u32(state, ins, "src0"), u32(state, ins, "src1")
+    if ins.mods.get("wide") != "WIDE":
+        # The low 32 bits of the product do not depend on signedness.
+        write_dst(state, ins, a * b + u32(state, ins, "src2"))
+        return
+    if signed:
+        prod = (as_signed(a).astype(np.int64) * as_signed(b).astype(np.int64)).astype(np.uint64)
+    else:
+        prod = np.asarray(a, dtype=np.uint64) * np.asarray(b, dtype=np.uint64)
+    op = ins.operands["src2"]
+    if op.kind in ("vreg", "sreg"):
+        c = pair(state, ins, "src2")
+        if ins.flags.get(("src2", "src_int_modi")) == "NEG":
+            c = np.negative(c, dtype=np.uint64)
+    else:
+        c = np.uint32(op.value)
+        c = as_signed(c).astype(np.int64).astype(np.uint64) if signed else np.uint64(c)
+    s = prod + c
+    write_pair(state, ins, s)
+    if "pout0" in ins.operands:
+        state.set_p(ins.operands["pout0"].value, np.broadcast_to(s < c, state.lane_shape))
+
+
+def min_max(a: np.ndarray, b: np.ndarray, ins: Instr) -> np.ndarray:
+    if ins.mods.get("is_signed") == "SIGNED":
+        a, b = as_signed(a), as_signed(b)
+    r = np.maximum(a, b) if ins.mods.get("mn_mx") == "MAX" else np.minimum(a, b)
+    return np.asarray(r).astype(np.uint32)
+
+
+@handler("imnmx")
+def op_imnmx(state, ins: Instr) -> None:
+    write_dst(state, ins, min_max(u32(state, ins, "src0"), u32(state, ins, "src1"), ins))
+
+
+@handler("s_imnmx")
+def op_s_imnmx(state, ins: Instr) -> None:
+    write_dst(state, ins, min_max(uniform(state, ins, "src0"), uniform(state, ins, "src1"), ins))
+
+
+INT_CMP = {
+    "LT": np.less, "EQ": np.equal, "LE": np.less_equal, "GT": np.greater, "NE": np.not_equal,
+    "GE": np.greater_equal,
+}
+
+
+@handler("icmp")
+def op_icmp(state, ins: Instr) -> None:
+    a, b = u32(state, ins, "src0"), u32(state, ins, "src1")
+    if ins.mods.get("is_signed") == "SIGNED":
+        a, b = as_signed(a), as_signed(b)
+    cmp = ins.mods["int_cmp_type"]
+    if cmp in ("F", "T"):
+        cond = np.full(state.lane_shape, cmp == "T")
+    else:
+        cond = np.broadcast_to(INT_CMP[cmp](a, b), state.lane_shape)
+    write_bool(state, ins, combine(state, ins, cond), np.uint32(FULL_MASK))
+
+
+@handler("iabs")
+def op_iabs(state, ins: Instr) -> None:
+    write_dst(state, ins, np.abs(as_signed(u32(state, ins, "src0"))).view(np.uint32))
+
+
+def lut_eval(lut: int, xs: tuple):
+    # Shannon expansion of a truth table over xs (first input = most significant index bit). Constant
+    # cofactors are Python ints and get folded, so e.g. 0xF0 is `a` and 0x96 is two xors.
+    n = len(xs)
+    full = (1 << (1 << n)) - 1
+    lut &= full
+    if lut == 0:
+        return 0
+    if lut == full:
+        return FULL_MASK
+    half = 1 << (n - 1)
+    low = (1 << half) - 1
+    x = xs[0]
+    f1 = lut_eval(lut >> half, xs[1:])
+    f0 = lut_eval(lut & low, xs[1:])
+    c1 = isinstance(f1, int)
+    c0 = isinstance(f0, int)
+    if c1 and c0:
+        return x if f1 else ~x
+    if c1:
+        return (x | f0) if f1 else (~x & f0)
+    if c0:
+        return (~x | f1) if f0 else (x & f1)
+    if lut >> half == ~lut & low:
+        return x ^ f0
+    return f0 ^ (x & (f0 ^ f1))
+
+
+@handler("lop3")
+def op_lop3(state, ins: Instr) -> None:
+    a, b, c = u32(state, ins, "src0"), u32(state, ins, "src1"), u32(state, ins, "src2")
+    r = lut_eval(ins.operands["imme"].value, (a, b, c))
+    write_dst(state, ins, np.broadcast_to(np.uint32(r) if isinstance(r, int) else r, state.lane_shape))
+
+
+# Byte selectors (byte 0 first) of the non-default prmt modes, indexed by c[1:0].
+PRMT_MODES = {
+    "F4E": ((0, 1, 2, 3), (1, 2, 3, 4), (2, 3, 4, 5), (3, 4, 5, 6)),
+    "B4E": ((0, 7, 6, 5), (1, 0, 7, 6), (2, 1, 0, 7), (3, 2, 1, 0)),
+    "RC8": ((0, 0, 0, 0), (1, 1, 1, 1), (2, 2, 2, 2), (3, 3, 3, 3)),
+    "ECL": ((0, 1, 2, 3), (1, 1, 2, 3), (2, 2, 2, 3), (3, 3, 3, 3)),
+    "ECR": ((0, 0, 0, 0), (0, 1, 1, 1), (0, 1, 2, 2), (0, 1, 2, 3)),
+    "RC16": ((0, 1, 0, 1), (2, 3, 2, 3), (0, 1, 0, 1), (2, 3, 2, 3)),
+}
+
+
+def permute_const(a, b, c: int, mode: str) -> np.ndarray:
+    # Control known per instruction (an immediate): fixed byte moves, or one funnel shift for 4 consecutive
+    # source bytes.
+    if mode == "DEFAULT":
+        nibs = [(c >> (4 * i)) & 0xF for i in range(4)]
+    else:
+        nibs = list(PRMT_MODES[mode][c & 3])
+    a, b = np.asarray(a, dtype=np.uint32), np.asarray(b, dtype=np.uint32)
+    k = nibs[0]
+    if k <= 4 and nibs == [k, k + 1, k + 2, k + 3]:
+        if k == 0:
+            return a + np.uint32(0) * b
+        if k == 4:
+            return b + np.uint32(0) * a
+        return (a >> np.uint32(8 * k)) | (b << np.uint32(32 - 8 * k))
+    out = np.uint32(0)
+    for i, n in enumerate(nibs):
+        byte = ((b if n & 4 else a) >> np.uint32(8 * (n & 3))) & np.uint32(0xFF)
+        if mode == "DEFAULT" and n & 8:
+            byte = np.where(byte & np.uint32(0x80) != 0, np.uint32(0xFF), np.uint32(0))
+        out = out | (byte << np.uint32(8 * i))
+    return out
+
+
+def permute(a, b, c, mode: str) -> np.ndarray:
+    # PTX prmt: bytes 0..3 of a then 4..7 of b; DEFAULT takes a 4-bit selector per byte (bit 3 = sign fill).
+    if np.ndim(c) == 0:
+        return permute_const(a, b, int(c), mode)
+    tmp = np.asarray(a, dtype=np.uint64) | (np.asarray(b, dtype=np.uint64) << np.uint64(32))
+    c = np.asarray(c, dtype=np.uint64)
+    out = np.zeros(np.broadcast(tmp, c).shape, dtype=np.uint64)
+    if mode == "DEFAULT":
+        for i in range(4):
+            nib = (c >> np.uint64(4 * i)) & np.uint64(0xF)
+            byte = (tmp >> ((nib & np.uint64(7)) * np.uint64(8))) & np.uint64(0xFF)
+            fill = np.where(byte & np.uint64(0x80) != 0, np.uint64(0xFF), np.uint64(0))
+            out |= np.where(nib & np.uint64(8) != 0, fill, byte) << np.uint64(8 * i)
+        return out.astype(np.uint32)
+    table = np.asarray(PRMT_MODES[mode], dtype=np.uint64)[(c & np.uint64(3)).astype(np.intp)]
+    for i in range(4):
+        out |= ((tmp >> (table[..., i] * np.uint64(8))) & np.uint64(0xFF)) << np.uint64(8 * i)
+    return out.astype(np.uint32)
+
+
+@handler("prmt")
+def op_prmt(state, ins: Instr) -> None:
+    r = permute(u32(state, ins, "src0"), u32(state, ins, "src1"), u32(state, ins, "src2"), ins.mods["prmt_mode"])
+    write_dst(state, ins, r)
+
+
+@handler("s_prmt")
+def op_s_prmt(state, ins: Instr) -> None:
+    r = permute(uniform(state, ins, "src0"), uniform(state, ins, "src1"), uniform(state, ins, "src2"), "DEFAULT")
+    write_dst(state, ins, r)
+
+
+def popcount(u) -> np.ndarray:
+    return np.bitwise_count(np.asarray(u, dtype=np.uint32)).astype(np.uint32)
+
+
+_REV8 = np.array([int(f"{i:08b}"[::-1], 2) for i in range(256)], dtype=np.uint8)
+
+
+def bit_reverse(u) -> np.ndarray:
+    # Reverse each byte through a table, then the byte order.
+    u = np.asarray(u, dtype=np.uint32)
+    flat = np.ascontiguousarray(np.atleast_1d(u))
+    return _REV8[flat.view(np.uint8)].view(np.uint32).byteswap().reshape(u.shape)
+
+
+def leading_one(u, shiftamt: bool) -> np.ndarray:
+    u = np.asarray(u, dtype=np.uint32)
+    pos = (np.frexp(u.astype(np.float64))[1] - 1).astype(np.int64)
+    r = (31 - pos) if shiftamt else pos
+    return np.where(u == 0, np.uint32(FULL_MASK), r.astype(np.uint32))
+
+
+def bit_mask(width, pos, mode: str) -> np.ndarray:
+    width = np.asarray(width, dtype=np.uint64)
+    pos = np.asarray(pos, dtype=np.uint64)
+    if mode == "wrap":
+        width, pos = width & np.uint64(31), pos & np.uint64(31)
+    else:
+        width, pos = np.minimum(width, np.uint64(32)), np.minimum(pos, np.uint64(32))
+    return ((((np.uint64(1) << width) - np.uint64(1)) << pos) & MASK32).astype(np.uint32)
+
+
+@handler("popc")
+def op_popc(state, ins: Instr) -> None:
+    write_dst(state, ins, popcount(u32(state, ins, "src0")))
+
+
+@handler("s_popc")
+def op_s_popc(state, ins: Instr) -> None:
+    write_dst(state, ins, popcount(uniform(state, ins, "src0")))
+
+
+@handler("brev")
+def op_brev(state, ins: Instr) -> None:
+    write_dst(state, ins, bit_reverse(u32(state, ins, "src0")))
+
+
+@handler("s_brev")
+def op_s_brev(state, ins: Instr) -> None:
+    write_dst(state, ins, bit_reverse(uniform(state, ins, "src0")))
+
+
+@handler("flo")
+def op_flo(state, ins: Instr) -> None:
+    write_dst(state, ins, leading_one(u32(state, ins, "src0"), ins.mods.get("shiftamt") == "shiftamt"))
+
+
+@handler("s_flo")
+def op_s_flo(state, ins: Instr) -> None:
+    write_dst(state, ins, leading_one(uniform(state, ins, "src0"), ins.mods.get("shiftamt") == "shiftamt"))
+
+
+@handler("bmsk")
+def op_bmsk(state, ins: Instr) -> None:
+    write_dst(state, ins, bit_mask(u32(state, ins, "src0"), u32(state, ins, "src1"), ins.mods["bound_mode"]))
+
+
+@handler("s_bmsk")
+def op_s_bmsk(state, ins: Instr) -> None:
+    write_dst(state, ins, bit_mask(uniform(state, ins, "src0"), uniform(state, ins, "src1"), ins.mods["bound_mode"]))
+
+
+@handler("s_iadd")
+def op_s_iadd(state, ins: Instr) -> None:
+    length = ins.mods["s_add_length"]
+    if length == "U32":
+        s = np.asarray(uniform(state, ins, "src0"), dtype=np.uint64) + uniform(state, ins, "src1")
+        write_dst(state, ins, (s & MASK32).astype(np.uint32))
+        return
+    if length == "U64":
+        a, b = pair(state, ins, "src0", lanes=False), pair(state, ins, "src1", lanes=False)
+        if ins.flags.get(("src0", "src_int_modi")) == "NEG":
+            a = np.negative(a, dtype=np.uint64)
+        if ins.flags.get(("src1", "src_int_modi")) == "NEG":
+            b = np.negative(b, dtype=np.uint64)
+    else:
+        a = np.asarray(uniform(state, ins, "src0"), dtype=np.uint64)
+        b = np.asarray(uniform(state, ins, "src1"), dtype=np.uint64)
+    write_pair(state, ins, a + b)
+
+
+@handler("auipc")
+def op_auipc(state, ins: Instr) -> None:
+    write_dst(state, ins, np.uint32((state.pc + ins.operands["src0"].value) & FULL_MASK))
+
+
+def csr_field(value: int) -> tuple[int, int, int]:
+    # imm16: csrid = [5:0], offset = [10:6], size = [15:11] + 1.
+    return value & 63, (value >> 6) & 31, ((value >> 11) & 31) + 1
+
+
+def extract(val, offset: int, size: int) -> np.ndarray:
+    return (np.asarray(val, dtype=np.uint32) >> np.uint32(offset)) & np.uint32((1 << size) - 1)
+
+
+@handler("s_getcsr")
+def op_s_getcsr(state, ins: Instr) -> None:
+    csrid, offset, size = csr_field(ins.operands["src0"].value)
+    write_dst(state, ins, extract(state.csr_value(csrid), offset, size))
+
+
+@handler("v_getcsr")
+def op_v_getcsr(state, ins: Instr) -> None:
+    csrid, offset, size = csr_field(ins.operands["src0"].value)
+    write_dst(state, ins, extract(state.lane_csr_value(csrid), offset, size))
+
+
+@handler("s_setcsr", "s_setcsr_imm32")
+def op_s_setcsr(state, ins: Instr) -> None:
+    csrid, offset, size = csr_field(ins.operands["src0"].value)
+    if csrid < CSR_READ_ONLY:
+        return
+    mask = np.uint32(((1 << size) - 1) << offset & FULL_MASK)
+    src = np.asarray(uniform(state, ins, "src1"), dtype=np.uint64) << np.uint64(offset)
+    old = state.csr_value(csrid)
+    state.set_csr(csrid, (old & ~mask) | (src.astype(np.uint32) & mask))
+
+
+# ---- floating point -----------------------------------------------------------------------------------
+
+def fp_result(state, ins: Instr, hi, lo, dtype, saturate: bool = True) -> None:
+    x = fp.round_to(hi, lo, rounding(ins), dtype)
+    x = fp.finish(x, ins.mods.get("ftz") == "FTZ", saturate and ins.mods.get("saturate") == "SATURATE")
+    write_dst(state, ins, fp.to_bits(x))
+
+
+@handler("v_fadd")
+def op_v_fadd(state, ins: Instr) -> None:
+    a = f32(state, ins, "src0").astype(np.float64)
+    b = f32(state, ins, "src1").astype(np.float64)
+    hi, lo = fp.two_sum(a, b)
+    fp_result(state, ins, hi, lo, np.float32)
+
+
+OUTPUT_SCALE = {"D2": 0.5, "NOSCALE": 1.0, "M2": 2.0, "M4": 4.0}
+
+
+@handler("fmul")
+def op_fmul(state, ins: Instr) -> None:
+    a = f32(state, ins, "src0").astype(np.float64)
+    b = f32(state, ins, "src1").astype(np.float64)
+    fp_result(state, ins, a * b * OUTPUT_SCALE[ins.mods.get("output_modifier_2", "NOSCALE")], 0.0, np.float32)
+
+
+@handler("v_ffma")
+def op_v_ffma(state, ins: Instr) -> None:
+    dtype = fp_type(ins)
+    a = fsrc(state, ins, "src0", dtype).astype(np.float64)
+    b = fsrc(state, ins, "src1", dtype).astype(np.float64)
+    c = fsrc(state, ins, "src2", dtype).astype(np.float64)
+    prod = a * b
+    if ins.mods.get("fmz") == "FMZ":
+        prod = np.where((a == 0) | (b == 0), 0.0, prod)
+    hi, lo = fp.two_sum(prod, np.broadcast_to(c, np.shape(prod)))
+    fp_result(state, ins, hi, lo, dtype)
+
+
+@handler("fmnmx")
+def op_fmnmx(state, ins: Instr) -> None:
+    dtype = fp_type(ins)
+    a = np.broadcast_to(fsrc(state, ins, "src0", dtype), state.lane_shape)
+    b = fsrc(state, ins, "src1", dtype)
+    r = fp.fp_min_max(a, b, ins.mods.get("mn_mx") == "MAX", ins.mods.get("NaN") == "NaN")
+    write_dst(state, ins, fp.to_bits(r))
+
+
+@handler("fsel")
+def op_fsel(state, ins: Instr) -> None:
+    r = np.where(pred(state, ins, "pin0"), f32(state, ins, "src0"), f32(state, ins, "src1"))
+    write_dst(state, ins, fp.f32_to_bits(r))
+
+
+@handler("fcmp")
+def op_fcmp(state, ins: Instr) -> None:
+    cond = fp.fp_compare(f32(state, ins, "src0"), f32(state, ins, "src1"), ins.mods["fp_cmp_type"])
+    r = combine(state, ins, np.broadcast_to(cond, state.lane_shape))
+    write_bool(state, ins, r, fp.ONE32 if ins.mods.get("BoolFM") == "BF" else np.uint32(FULL_MASK))
+
+
+SFU = {
+    "COS": np.cos, "SIN": np.sin, "EX2": np.exp2, "LG2": np.log2, "RCP": np.reciprocal,
+    "RSQ": lambda x: 1.0 / np.sqrt(x), "SQRT": np.sqrt,
+}
+
+
+@handler("fsf")
+def op_fsf(state, ins: Instr) -> None:
+    x = f32(state, ins, "src0").astype(np.float64)
+    write_dst(state, ins, fp.to_bits(SFU[ins.mods["sfu_func"]](x).astype(np.float32)))
+
+
+def fp_dtype(name: str, ins: Instr):
+    dtype = fp.FP_DTYPES.get(name)
+    if dtype is None:
+        raise NotImplementedError(f"{ins.key}: {name} is not modelled by the simulator")
+    return dtype
+
+
+def conv_src(state, ins: Instr, dtype) -> np.ndarray:
+    return fsrc(state, ins, "src0", dtype)
+
+
+def conv_write(state, ins: Instr, bits: np.ndarray, width: int) -> None:
+    if width <= 16:
+        write_half(state, ins, bits)
+    else:
+        write_dst(state, ins, bits)
+
+
+@handler("f2f")
+def op_f2f(state, ins: Instr) -> None:
+    src = fp_dtype(ins.mods["src_fp_type"], ins)
+    dst = fp_dtype(ins.mods["dst_fp_type"], ins)
+    x = conv_src(state, ins, src).astype(np.float64)
+    r = fp.round_to(x, 0.0, rounding(ins), dst)
+    r = fp.finish(r, ins.mods.get("ftz") == "FTZ", False)
+    if ins.mods.get("satfinite") == "SATFINITE":
+        r = fp.satfinite(r, dst)
+    conv_write(state, ins, fp.to_bits(r, dst), fp.bit_width(dst))
+
+
+INT_TYPES = {
+    "U8": (8, False), "U16": (16, False), "U32": (32, False), "U64": (64, False),
+    "S8": (8, True), "S16": (16, True), "S32": (32, True), "S64": (64, True),
+}
+INT_ROUND = {"rni": np.rint, "rzi": np.trunc, "rupi": np.ceil, "rdni": np.floor}
+
+
+def int_range(bits: int, signed: bool) -> tuple[int, int]:
+    return (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+
+
+@handler("f2i")
+def op_f2i(state, ins: Instr) -> None:
+    src = fp_dtype(ins.mods["src_fp_type"], ins)
+    bits, signed = INT_TYPES[ins.mods["dst_int_type"]]
+    x = INT_ROUND[ins.mods.get("rnd_mode_int", "rni")](conv_src(state, ins, src).astype(np.float64))
+    lo, hi = int_range(bits, signed)
+    x = np.broadcast_to(np.where(np.isnan(x), 0.0, x), state.lane_shape)
+    if bits == 64:
+        # float64 cannot hold the 64-bit bounds exactly; clamp through the integer type instead.
+        big = x >= float(hi)
+        small = x <= float(lo)
+        mid = np.where(big | small, 0.0, x)
+        v = (mid.astype(np.int64) if signed else mid.astype(np.uint64)).astype(np.uint64)
+        v = np.where(big, np.uint64(hi & 0xFFFFFFFFFFFFFFFF), np.where(small, np.uint64(lo & 0xFFFFFFFFFFFFFFFF), v))
+        write_pair(state, ins, v)
+        return
+    v = np.clip(x, lo, hi).astype(np.int64).astype(np.uint64) & np.uint64((1 << bits) - 1)
+    if signed and bits < 32:
+        v = np.where(v >> np.uint64(bits - 1) != 0, v | (MASK32 ^ np.uint64((1 << bits) - 1)), v)
+    conv_write(state, ins, (v & MASK32).astype(np.uint32), bits)
+
+
+def int_source(state, ins: Instr, bits: int, signed: bool) -> tuple[np.ndarray, np.ndarray]:
+    # Integer source as an exact float64 pair (hi, lo); a 64-bit value is split into its 32-bit halves.
+    if bits == 64:
+        v = pair(state, ins, "src0")
+        if ins.flags.get(("src0", "src_int_modi")) == "NEG":
+            v = np.negative(v, dtype=np.uint64)
+        high = (v >> np.uint64(32)).astype(np.uint32)
+        high = as_signed(high) if signed else high
+        return fp.two_sum(high.astype(np.float64) * 2.0**32, (v & MASK32).astype(np.float64))
+    if bits == 32:
+        v = u32(state, ins, "src0")
+        return (as_signed(v) if signed else np.asarray(v)).astype(np.float64), 0.0
+    v = (half_bits(state, ins, "src0") & np.uint32((1 << bits) - 1)).astype(np.int64)
+    if signed:
+        v = np.where(v >> (bits - 1) != 0, v - (1 << bits), v)
+    return v.astype(np.float64), 0.0
+
+
+@handler("i2f")
+def op_i2f(state, ins: Instr) -> None:
+    dst = fp_dtype(ins.mods["dst_fp_type"], ins)
+    bits, signed = INT_TYPES[ins.mods["src_int_type"]]
+    hi, lo = int_source(state, ins, bits, signed)
+    hi = np.broadcast_to(hi, state.lane_shape)
+    r = fp.round_to(hi, lo, rounding(ins), dst)
+    r = fp.finish(r, ins.mods.get("ftz") == "FTZ", ins.mods.get("saturate") == "SATURATE")
+    conv_write(state, ins, fp.to_bits(r, dst), fp.bit_width(dst))
+
+
+@handler("i2i")
+def op_i2i(state, ins: Instr) -> None:
+    bits, signed = INT_TYPES[ins.mods["dst_int_type"]]
+    v = as_signed(u32(state, ins, "src0")).astype(np.int64)
+    if ins.mods.get("saturate") == "SATURATE":
+        lo, hi = int_range(bits, signed)
+        v = np.clip(v, lo, hi)
+    v = v.astype(np.uint64) & np.uint64((1 << bits) - 1)
+    if signed and bits < 16:
+        v = np.where(v >> np.uint64(bits - 1) != 0, v | np.uint64(0xFF00), v)
+    conv_write(state, ins, v.astype(np.uint32), bits)
+
+
+@handler("frnd")
+def op_frnd(state, ins: Instr) -> None:
+    dtype = fp_dtype(ins.mods["fp_type_FRND"], ins)
+    x = conv_src(state, ins, dtype)
+    # An integral value of a 16-bit type is representable in it, so no second rounding happens here.
+    r = INT_ROUND[ins.mods.get("rnd_mode_int", "rni")](x).astype(fp.container(dtype))
+    r = fp.finish(r, ins.mods.get("ftz") == "FTZ", False)
+    write_dst(state, ins, fp.to_bits(r, dtype))
+
+
+# ---- packed half precision ------------------------------------------------------------------------------
+
+# Half taken by result half 0 / half 1 for each packed_opsel (B32: one fp32 value for both).
+PACKED_SEL = {"PER_LANE": None, "H0_H0": [0, 0], "H1_H1": [1, 1]}
+SIGN16_H = np.uint16(0x8000)
+ONE16 = {np.float16: np.uint32(0x3C00), fp.BF16: np.uint32(0x3F80)}
+
+
+def halves(bits) -> np.ndarray:
+    # uint32 (...) -> uint16 (..., 2) as [low, high]; a view of the registers when the lane axis is contiguous.
+    bits = np.asarray(bits, dtype=np.uint32)
+    if np.little_endian and bits.ndim and bits.strides[-1] == 4:
+        return bits.view(np.uint16).reshape(bits.shape + (2,))
+    return np.stack([(bits & np.uint32(0xFFFF)).astype(np.uint16), (bits >> np.uint32(16)).astype(np.uint16)], -1)
+
+
+def packed_type(ins: Instr):
+    return fp.BF16 if ins.mods.get("type_fp16_bf16") == "BF16" else np.float16
+
+
+def packed_src(state, ins: Instr, role: str, dtype) -> np.ndarray:
+    # Both halves of a packed source as (..., 2) values (float16, or float32 holding bf16 / the B32 fp32).
+    op = ins.operands[role]
+    ftz = ins.mods.get("ftz") == "FTZ"
+    if op.kind == "imm16":
+        # One imm16 feeds both halves; `src1, src2` imm16 pairs are (half 0, half 1).
+        second = ins.operands.get("src2")
+        pair16 = second is not None and role == "src1" and second.kind == "imm16"
+        h = np.array([op.value, second.value if pair16 else op.value], dtype=np.uint16)
+    else:
+        sel = ins.flags.get((role, "packed_opsel")) or ins.flags.get((role, "packed_opsel_B32"), "PER_LANE")
+        if sel == "B32":
+            return f32(state, ins, role)[..., None]
+        h = halves(u32(state, ins, role))
+        if PACKED_SEL[sel] is not None:
+            h = h[..., PACKED_SEL[sel]]
+    h = fp.apply_fp_modi(h, ins.flags.get((role, "src_fp_modi")), SIGN16_H)
+    x = h.view(np.float16) if dtype == np.float16 else fp.bits_to_bf16(h)
+    return fp.flush_denorm(x) if ftz else x
+
+
+def write_packed(state, ins: Instr, bits16: np.ndarray) -> None:
+    # (..., 32, 2) 16-bit results -> one uint32 per lane, half 0 in the low bits.
+    b = np.ascontiguousarray(np.broadcast_to(bits16, state.lane_shape + (2,)), dtype=np.uint16)
+    write_dst(state, ins, b.view(np.uint32)[..., 0])
+
+
+def packed_result(state, ins: Instr, hi, lo, dtype) -> None:
+    x = fp.round_to(np.broadcast_to(hi, state.lane_shape + (2,)), lo, rounding(ins), dtype)
+    x = fp.finish(x, ins.mods.get("ftz") == "FTZ", ins.mods.get("saturate") == "SATURATE")
+    if ins.mods.get("satfinite") == "SATFINITE":
+        x = fp.satfinite(x, dtype)
+    write_packed(state, ins, fp.to_bits(x, dtype))
+
+
+def packed_product(state, ins: Instr, dtype) -> np.ndarray:
+    # Exact float64 product of src0 and src1 (11 + 24 significant bits at most).
+    a = packed_src(state, ins, "src0", dtype).astype(np.float64)
+    b = packed_src(state, ins, "src1", dtype).astype(np.float64)
+    prod = a * b
+    if ins.mods.get("fmz") == "FMZ":
+        prod = np.where((a == 0) | (b == 0), 0.0, prod)
+    return prod
+
+
+@handler("hadd_pk")
+def op_hadd_pk(state, ins: Instr) -> None:
+    dtype = packed_type(ins)
+    a = packed_src(state, ins, "src0", dtype).astype(np.float64)
+    b = packed_src(state, ins, "src1", dtype).astype(np.float64)
+    hi, lo = fp.two_sum(*np.broadcast_arrays(a, b))
+    packed_result(state, ins, hi, lo, dtype)
+
+
+@handler("hmul_pk")
+def op_hmul_pk(state, ins: Instr) -> None:
+    dtype = packed_type(ins)
+    packed_result(state, ins, packed_product(state, ins, dtype), 0.0, dtype)
+
+
+@handler("hma_pk")
+def op_hma_pk(state, ins: Instr) -> None:
+    dtype = packed_type(ins)
+    prod = packed_product(state, ins, dtype)
+    c = packed_src(state, ins, "src2", dtype).astype(np.float64)
+    hi, lo = fp.two_sum(*np.broadcast_arrays(prod, c))
+    packed_result(state, ins, hi, lo, dtype)
+
+
+@handler("hmnmx_pk")
+def op_hmnmx_pk(state, ins: Instr) -> None:
+    dtype = packed_type(ins)
+    a, b = np.broadcast_arrays(packed_src(state, ins, "src0", dtype), packed_src(state, ins, "src1", dtype))
+    xorsign = ins.mods.get("xorsign") == "XORSIGN"
+    if xorsign:
+        sign = np.signbit(a) ^ np.signbit(b)
+        a, b = np.abs(a), np.abs(b)
+    r = fp.fp_min_max(np.ascontiguousarray(a), b, ins.mods.get("mn_mx") == "MAX", ins.mods.get("NaN") == "NaN")
+    if xorsign:
+        r = np.where(np.isnan(r), r, np.copysign(r, np.where(sign, -1.0, 1.0).astype(r.dtype)))
+    r = fp.finish(r, ins.mods.get("ftz") == "FTZ", ins.mods.get("saturate") == "SATURATE")
+    write_packed(state, ins, fp.to_bits(r, dtype))
+
+
+@handler("hcmp_pk")
+def op_hcmp_pk(state, ins: Instr) -> None:
+    dtype = packed_type(ins)
+    cond = fp.fp_compare(packed_src(state, ins, "src0", dtype), packed_src(state, ins, "src1", dtype), ins.mods["fp_cmp_type"])
+    r = combine(state, ins, np.broadcast_to(cond, state.lane_shape + (2,)))
+    if "pout0" in ins.operands:
+        state.set_p(ins.operands["pout0"].value, r[..., 0])
+        state.set_p(ins.operands["pout1"].value, r[..., 1])
+        return
+    op = ins.operands["dst"]
+    if op.kind == "sreg":
+        # 64-bit per-warp result: lane mask of half 0 in dst, of half 1 in dst + 1.
+        state.set_x(op.value, pack_lanes(r[..., 0] & state.active))
+        if op.value != URZ:
+            state.set_x(op.value + 1, pack_lanes(r[..., 1] & state.active))
+        return
+    true_bits = ONE16[dtype] if ins.mods.get("BoolFM") == "BF" else np.uint32(0xFFFF)
+    write_packed(state, ins, np.where(r, true_bits, np.uint32(0)))
+
+
+# ---- warp collectives ----------------------------------------------------------------------------------
+
+LANE_IDS = np.arange(LANES, dtype=np.int64)
+SHFL_FIELD = np.uint32(0x1F)
+SHFL_SEGMASK_SHIFT = np.uint32(5)
+
+
+def warp_mask(state) -> np.ndarray:
+    # exec mask broadcast over the lane axis.
+    return np.asarray(state.exec_mask)[..., None]
+
+
+def lane_groups(keys: np.ndarray, active: np.ndarray) -> np.ndarray:
+    # Per lane, the mask of the active lanes of its warp holding the same key: sort each warp's keys,
+    # cut the sorted rows into runs of equal keys and OR the lane bits of every run in one reduceat.
+    keys = np.broadcast_to(keys, active.shape)
+    order = np.argsort(keys, axis=-1, kind="stable")
+    k = np.take_along_axis(keys, order, axis=-1)
+    bits = np.where(np.take_along_axis(active, order, axis=-1), LANE_BITS[order], np.uint32(0))
+    start = np.ones(k.shape, dtype=bool)
+    start[..., 1:] = k[..., 1:] != k[..., :-1]
+    # Every row starts a run, so no run crosses warps.
+    flat = start.ravel()
+    runs = np.bitwise_or.reduceat(bits.ravel(), np.flatnonzero(flat))
+    groups = np.empty(k.shape, dtype=np.uint32)
+    np.put_along_axis(groups, order, runs[np.cumsum(flat) - 1].reshape(k.shape), axis=-1)
+    return groups
+
+
+@handler("shfl")
+def op_shfl(state, ins: Instr) -> None:
+    a = np.broadcast_to(u32(state, ins, "src0"), state.lane_shape)
+    b = (u32(state, ins, "src1") & SHFL_FIELD).astype(np.int64)
+    c = u32(state, ins, "src2")
+    seg = ((c >> SHFL_SEGMASK_SHIFT) & SHFL_FIELD).astype(np.int64)
+    low = LANE_IDS & seg
+    high = low | ((c & SHFL_FIELD).astype(np.int64) & ~seg)
+    mode = ins.mods.get("shfl_mode", "IDX")
+    if mode == "IDX":
+        j = low | (b & ~seg)
+    elif mode == "UP":
+        j = LANE_IDS - b
+    elif mode == "DOWN":
+        j = LANE_IDS + b
+    elif mode == "BFLY":
+        j = LANE_IDS ^ b
+    else:
+        raise ValueError(f"{ins.key}: unknown shfl_mode '{mode}'")
+    ok = np.broadcast_to((j >= high) if mode == "UP" else (j <= high), state.lane_shape)
+    j = np.where(ok, j, LANE_IDS)
+    # An inactive source lane is as invalid as an out-of-range one: the lane keeps its own value.
+    ok = ok & np.take_along_axis(state.active, j, axis=-1)
+    j = np.where(ok, j, LANE_IDS)
+    write_dst(state, ins, np.take_along_axis(a, j, axis=-1))
+    state.set_p(ins.operands["pout0"].value, ok)
+
+
+@handler("vote")
+def op_vote(state, ins: Instr) -> None:
+    ballot = pack_lanes(pred(state, ins, "pin0") & state.active)
+    m = state.exec_mask
+    kind = ins.mods.get("vote_type", "ANY")
+    if kind == "ALL":
+        r = ballot == m
+    elif kind == "ANY":
+        r = ballot != 0
+    elif kind == "EQ":
+        r = (ballot == 0) | (ballot == m)
+    else:
+        raise ValueError(f"{ins.key}: unknown vote_type '{kind}'")
+    state.set_p(ins.operands["pout0"].value, np.broadcast_to(np.asarray(r)[..., None], state.lane_shape))
+    if "dst" in ins.operands:
+        write_dst(state, ins, np.broadcast_to(np.asarray(ballot)[..., None], state.lane_shape))
+
+
+@handler("match")
+def op_match(state, ins: Instr) -> None:
+    keys = pair(state, ins, "src0") if ins.mods.get("U64") == "U64" else u32(state, ins, "src0")
+    groups = lane_groups(keys, state.active)
+    if "pout0" not in ins.operands:
+        write_dst(state, ins, groups)
+        return
+    # match.all: every active lane holds the same value, i.e. each lane's group is the whole exec mask.
+    m = warp_mask(state)
+    same = groups == m
+    write_dst(state, ins, np.where(same, m, np.uint32(0)))
+    state.set_p(ins.operands["pout0"].value, same)
+
+
+# ---- control flow -------------------------------------------------------------------------------------
+
+@handler("bssy")
+def op_bssy(state, ins: Instr) -> None:
+    state.set_bx(ins.operands["src0"].value % BARRIERS, state.exec_mask, ins.operands["imme"].value)
+
+
+@handler("bsync")
+def op_bsync(state, ins: Instr) -> None:
+    state.wait(state.bx(ins.operands["src0"].value % BARRIERS))
+
+
+@handler("bra")
+def op_bra(state, ins: Instr) -> None:
+    state.branch(ins.operands["imme"].value, pack_lanes(pred(state, ins, "pin0") & state.active))
+
+
+# ---- memory -------------------------------------------------------------------------------------------
+
+ATOM_SCOPES = {"atom": "generic", "atoms": "shared", "atomg": "global"}
+
+
+def spaces(state, ins: Instr) -> memory.AddressSpaces:
+    if state.mem is None:
+        raise ValueError(f"{ins.key}: no memory attached")
+    return state.mem
+
+
+def active_lanes(state, value) -> np.ndarray:
+    # Values of the active lanes (1-D, warps then lanes) as int64.
+    return np.broadcast_to(value, state.lane_shape)[state.active].astype(np.int64)
+
+
+def record_banks(state, ins: Instr, scope: str, addr: np.ndarray, nbytes: int) -> None:
+    # The shared-memory lanes of an access, for the bank-conflict analyzer.
+    if scope == "generic":
+        sel = (addr & ~(memory.WINDOW_BYTES - 1)) == memory.SHARED_WINDOW
+        addr = addr[sel] - memory.SHARED_WINDOW
+    elif scope == "shared":
+        sel = slice(None)
+    else:
+        return
+    pos = np.nonzero(state.active)
+    rows = pos[0][sel] if len(pos) > 1 else np.zeros(addr.size, dtype=np.int64)
+    warps = state.active.size // LANES
+    state.mem.banks.record(state.pc, ins.key, warps, rows, pos[-1][sel], addr, nbytes)
+
+
+def lane_addresses(
+    state, ins: Instr, offset_role: str, nbytes: int, scope: str
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Byte addresses of the active lanes with their CTA / thread slots; counted in the access statistics.
+    full = u32(state, ins, "src0") + u32(state, ins, "src1") + u32(state, ins, offset_role)
+    if state.trace is not None:
+        state.trace.memory(scope, nbytes, state.exec_mask, np.broadcast_to(full, state.lane_shape))
+    a = active_lanes(state, full)
+    if state.mem.stats is not None:
+        state.mem.stats.record(state.pc, ins.key, state.active, a, nbytes)
+    if state.mem.banks is not None:
+        record_banks(state, ins, scope, a, nbytes)
+    return a, active_lanes(state, state.cta_slot), active_lanes(state, state.thread_slot)
+
+
+def reg_values(state, ins: Instr, role: str, count: int) -> list[np.ndarray]:
+    # Active-lane values of the registers role, role + 1, ... (RZ reads zero throughout).
+    r = ins.operands[role].value
+    return [state.v(r + j if r + j < RZ else RZ)[state.active] for j in range(count)]
+
+
+def write_lanes(state, ins: Instr, values: list[np.ndarray]) -> None:
+    # Scatter active-lane values into dst, dst + 1, ...
+    r = ins.operands["dst"].value
+    for j, v in enumerate(values):
+        if r + j >= RZ:
+            break
+        full = np.zeros(state.lane_shape, dtype=np.uint32)
+        full[state.active] = v
+        state.set_v(r + j, full)
+
+
+def split64(v: np.ndarray) -> list[np.ndarray]:
+    return [(v & MASK32).astype(np.uint32), (v >> np.uint64(32)).astype(np.uint32)]
+
+
+def join64(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    return lo.astype(np.uint64) | (hi.astype(np.uint64) << np.uint64(32))
+
+
+@handler("LD")
+def op_ld(state, ins: Instr) -> None:
+    mem = spaces(state, ins)
+    length = ins.mods["ldst_length"]
+    scope = ins.mods["mem_scope"]
+    addr = lane_addresses(state, ins, "src2", memory.LDST_BYTES[length], scope)
+    write_lanes(state, ins, mem.load(scope, *addr, length))
+
+
+@handler("ST")
+def op_st(state, ins: Instr) -> None:
+    mem = spaces(state, ins)
+    length = ins.mods["ldst_length"]
+    values = reg_values(state, ins, "src2", max(1, memory.LDST_BYTES[length] // 4))
+    scope = ins.mods["mem_scope"]
+    addr = lane_addresses(state, ins, "imme", memory.LDST_BYTES[length], scope)
+    mem.store(scope, *addr, length, values)
+
+
+@handler("LDC")
+def op_ldc(state, ins: Instr) -> None:
+    mem = spaces(state, ins)
+    length = ins.mods["ldconstant_length"]
+    if ins.operands["src0"].kind == "vreg":
+        # c[saddr][vaddr + offset]
+        bank, a = u32(state, ins, "src1"), u32(state, ins, "src0") + u32(state, ins, "src2")
+    else:
+        # c[const_bank][saddr + offset]
+        bank, a = u32(state, ins, "src0"), u32(state, ins, "src1") + u32(state, ins, "src2")
+    if state.trace is not None:
+        addr = np.broadcast_to(bank * memory.CONST_BANK_BYTES + a, state.lane_shape)
+        state.trace.memory("constant", memory.LDST_BYTES[length], state.exec_mask, addr)
+    bank, a = active_lanes(state, bank), active_lanes(state, a)
+    if mem.stats is not None:
+        mem.stats.record(state.pc, ins.key, state.active, bank * memory.CONST_BANK_BYTES + a, memory.LDST_BYTES[length])
+    write_lanes(state, ins, mem.load_constant(bank, a, length))
+
+
+@handler("atom", "atoms", "atomg")
+def op_atom(state, ins: Instr) -> None:
+    mem = spaces(state, ins)
+    op, typ = ins.mods["atom_op"], ins.mods["atom_type"]
+    wide = typ == "U64"
+    regs = reg_values(state, ins, "src2", (2 if wide else 1) * (2 if op == "CAS" else 1))
+    if wide:
+        regs = [join64(regs[i], regs[i + 1]) for i in range(0, len(regs), 2)]
+    scope = ATOM_SCOPES[ins.instruction]
+    addr, cta, thread = lane_addresses(state, ins, "imme", 8 if wide else 4, scope)
+    old = mem.atomic(scope, op, typ, addr, cta, thread, *regs)
+    write_lanes(state, ins, split64(old) if wide else [old])
+
+
+# ---- command line -------------------------------------------------------------------------------------
+
+def apply_sets(state: WarpState, items: list[str]) -> None:
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"expected REG=VALUE, got '{item}'")
+        name = name.strip().upper()
+        v = int(value, 0) & FULL_MASK
+        if name.startswith("UR"):
+            state.sgpr[parse_operand("sreg", name)] = v
+        elif name.startswith("R"):
+            state.vgpr[parse_operand("vreg", name)] = v
+        elif name.startswith("P"):
+            state.pred[parse_operand("pred", name)] = v
+        else:
+            raise ValueError(f"unknown register '{name}'")
+        state.vgpr[RZ] = 0
+        state.sgpr[URZ] = 0
+        state.pred[PT] = FULL_MASK
+
+
+def format_lanes(row: np.ndarray) -> str:
+    if np.all(row == row[0]):
+        return f"{int(row[0]):#010x} (all lanes)"
+    return " ".join(f"{int(v):08x}" for v in row)
+
+
+def dump(state: WarpState, names: list[str]) -> None:
+    if not names:
+        names = [f"R{r}" for r in range(RZ) if state.vgpr[r].any()]
+        names += [f"UR{r}" for r in range(URZ) if state.sgpr[r]]
+        names += [f"P{i}" for i in range(PT) if state.pred[i]]
+    for name in names:
+        upper = name.strip().upper()
+        if upper.startswith("UR"):
+            print(f"{upper:>5} = {int(state.sgpr[parse_operand('sreg', upper)]):#010x}")
+        elif upper.startswith("R"):
+            print(f"{upper:>5} = {format_lanes(state.vgpr[parse_operand('vreg', upper)])}")
+        elif upper.startswith("P"):
+            print(f"{upper:>5} = {int(state.pred[parse_operand('pred', upper)]):#010x}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a program on the single-warp functional simulator.")
+    parser.add_argument("encoding", help="Encoding JSON (encoding_synthesis v1 / v2 output)")
+    parser.add_argument("spec", help="Path to spec.jsonc")
+    parser.add_argument("program", help="JSON program (see decode.py --asm)")
+    parser.add_argument("--set", dest="sets", action="append", default=[], help="Initial value REG=VALUE (repeatable)")
+    parser.add_argument("--dump", default="", help="Comma-separated registers to print (default: all non-zero)")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the program this many times (for timing)")
+    parser.add_argument("--simt", action="store_true", help="Print the SIMT efficiency of every instruction")
+    parser.add_argument(
+        "--block-cache", type=int, default=BLOCK_CACHE, help="Translated basic blocks kept (LRU, 0: no cache)"
+    )
+    memory.add_memory_args(parser)
+    exectrace.add_trace_args(parser)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        decoder = load_decoder(args.encoding, args.spec)
+        with open(args.program, "r", encoding="utf-8") as fh:
+            program = Program(decoder, assemble(decoder, json.load(fh)), args.block_cache)
+        state = WarpState()
+        apply_sets(state, args.sets)
+        state.mem = memory.make_spaces(args, memory.FlatMemory.zeros(args.gmem), 1, LANES)
+        memory.fill_memory(state.mem.glob, args.gmem_in)
+        state.trace = exectrace.open_trace(args)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    simt = SimtStats() if args.simt else None
+    t0 = time.perf_counter()
+    steps = 0
+    for _ in range(max(1, args.repeat)):
+        state.pc = 0
+        steps += run(program, state, simt=simt)
+    dt = time.perf_counter() - t0
+    if state.trace is not None:
+        state.trace.close()
+    memory.save_memory(state.mem.glob, args.gmem_out)
+    dump(state, [n for n in args.dump.split(",") if n.strip()])
+    memory.report(args, state.mem.stats, state.mem.banks)
+    if simt is not None:
+        print("\n".join(simt.report()))
+    rate = steps / dt if dt > 0 else 0.0
+    print(f"-- {steps} instructions in {dt:.3f}s ({rate:,.0f} instr/s, {rate * LANES:,.0f} lane-ops/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# Usage:
+#   python3 isa/xref_spec_ref.py isa/spec.jsonc isa/ref/sm90a/ref-encoding.json -o xref.json
+#   python3 isa/xref_spec_ref.py isa/spec.jsonc isa/ref/sm90a/ref-encoding.json --unmatched
+# Render spec pages with links to the reference encodings:
+#   python3 isa/ref/sm90a/render_ref_encoding_html.py isa/ref/sm90a/ref-encoding.json -o site/ref
+#   python3 isa/render_encoding_html.py isa/encoding.v1.json -o site --xref xref.json --xref-site ../ref
+# Notes:
+#   - spec side: `behavior.SASS` (string or list; a form may override it) of every leaf form.
+#   - ref side: every entry is indexed once by normalized `canonical_name` and `parsed.base_name`;
+#     a SASS name is looked up as a canonical name first, then as a base name.
+#   - per spec form: ref variants of the matched base names, and those whose top-level operand count
+#     equals the form's operand count (the guard predicate is not an operand on either side).
+#   - per spec instruction: modifier tokens (modifier names + enum value names) vs tokens of the
+#     ref variants (opcode_modis, modifier table options, flag names): common / spec-only / ref-only.
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "ref" / "sm90a"))
+
+from analyze_ref_encoding import iter_ref_entries, split_modifier_tokens  # noqa: E402
+from validate_spec_format import load_jsonc  # noqa: E402
+
+# Enum values that only say "off" and would otherwise match on every instruction.
+NEUTRAL_ENUM_VALUES = {"DISABLE", "NONE", "ID", "DEFAULT"}
+
+
+def normalize_name(name: str) -> str:
+    return name.strip().upper()
+
+
+def sass_names(behavior: dict | None) -> list[str]:
+    sass = (behavior or {}).get("SASS")
+    if sass is None:
+        return []
+    return [sass] if isinstance(sass, str) else [s for s in sass if isinstance(s, str)]
+
+
+def iter_forms(forms_obj) -> list[tuple[str, dict]]:
+    if forms_obj is None:
+        return []
+    if isinstance(forms_obj, dict):
+        return list(forms_obj.items())
+    return [(form.get("key"), form) for form in forms_obj]
+
+
+def iter_spec_leaves(spec: dict) -> Iterator[dict[str, Any]]:
+    # Walks forms the same way encoding synthesis does; yields one record per leaf form.
+    global_mod_defs = spec.get("global_modifier_defs") or {}
+    for inst_name, inst in (spec.get("instructions") or {}).items():
+        mod_defs = dict(global_mod_defs)
+        mod_defs.update(inst.get("local_modifier_defs") or {})
+
+        def walk(forms_obj, path, operands, modifiers, defs, sass, fixed):
+            for form_key, form in iter_forms(forms_obj):
+                new_defs = dict(defs, **(form.get("local_modifier_defs") or {}))
+                new_ops = operands + list(form.get("operands", []))
+                new_mods = modifiers + list(fixed) + list(form.get("inst_modifiers", []))
+                new_sass = sass_names(form.get("behavior")) or sass
+                if form.get("forms"):
+                    yield from walk(form["forms"], path + [form_key], new_ops, new_mods, new_defs, new_sass,
+                                    form.get("fixed_modifiers", []))
+                else:
+                    yield {
+                        "key": inst_name + "." + ".".join(path + [form_key]),
+                        "instruction": inst_name,
+                        "form_path": path + [form_key],
+                        "sass": new_sass,
+                        "operands": new_ops,
+                        "modifiers": new_mods,
+                        "mod_defs": new_defs,
+                    }
+
+        yield from walk(
+            inst.get("forms"),
+            [],
+            [],
+            list(inst.get("inst_modifiers", [])),
+            mod_defs,
+            sass_names(inst.get("behavior")),
+            inst.get("fixed_modifiers", []),
+        )
+
+
+def spec_modifier_tokens(modifiers: list[str], mod_defs: dict) -> set[str]:
+    tokens = set()
+    for name in modifiers:
+        tokens.add(normalize_name(name))
+        enum = (mod_defs.get(name) or {}).get("enum") or {}
+        tokens.update(normalize_name(v) for v in enum if normalize_name(v) not in NEUTRAL_ENUM_VALUES)
+    return tokens
+
+
+class RefIndex:
+    """Hash indexes over the ref entries: normalized canonical/base name -> entry keys."""
+
+    def __init__(self) -> None:
+        self.by_canonical: dict[str, list[str]] = defaultdict(list)
+        self.by_base: dict[str, list[str]] = defaultdict(list)
+        self.operand_count: dict[str, int] = {}
+        self.tokens: dict[str, set[str]] = {}
+        self.base_of: dict[str, str] = {}
+
+    def add(self, key: str, v: dict[str, Any]) -> None:
+        parsed = v.get("parsed") or {}
+        base = normalize_name(parsed.get("base_name") or key)
+        self.base_of[key] = base
+        self.by_base[base].append(key)
+        if v.get("canonical_name"):
+            self.by_canonical[normalize_name(v["canonical_name"])].append(key)
+        self.operand_count[key] = len(parsed.get("operands") or [])
+        tokens = {normalize_name(m) for m in v.get("opcode_modis") or []}
+        for table in v.get("modifiers") or []:
+            for _val, text in table or []:
+                if text:
+                    tokens.update(normalize_name(t) for t in split_modifier_tokens(str(text)))
+        for r in (v.get("ranges") or {}).get("ranges", []):
+            if r.get("type") in ("flag", "operand_flag") and r.get("name"):
+                tokens.add(normalize_name(str(r["name"])))
+        self.tokens[key] = tokens
+
+    def lookup(self, sass: str) -> list[str]:
+        name = normalize_name(sass)
+        return self.by_canonical.get(name) or self.by_base.get(name) or []
+
+
+def build_ref_index(entries) -> RefIndex:
+    index = RefIndex()
+    for key, v in entries:
+        index.add(key, v)
+    return index
+
+
+def cross_reference(spec: dict, ref: RefIndex) -> dict[str, Any]:
+    forms: dict[str, dict] = {}
+    instructions: dict[str, dict] = {}
+    used_bases: set[str] = set()
+
+    for leaf in iter_spec_leaves(spec):
+        ref_keys: list[str] = []
+        for name in leaf["sass"]:
+            ref_keys.extend(ref.lookup(name))
+        bases = sorted({ref.base_of[k] for k in ref_keys})
+        used_bases.update(bases)
+        n_ops = len(leaf["operands"])
+        forms[leaf["key"]] = {
+            "instruction": leaf["instruction"],
+            "form_path": leaf["form_path"],
+            "sass": leaf["sass"],
+            "operand_count": n_ops,
+            "ref_base_names": bases,
+            "ref_variants": len(ref_keys),
+            "operand_count_matches": sorted(k for k in ref_keys if ref.operand_count[k] == n_ops),
+        }
+        inst = instructions.setdefault(
+            leaf["instruction"],
+            {"sass": [], "ref_base_names": set(), "spec_tokens": set(), "ref_keys": set(), "forms": 0},
+        )
+        inst["sass"] = sorted(set(inst["sass"]) | set(leaf["sass"]))
+        inst["ref_base_names"].update(bases)
+        inst["spec_tokens"] |= spec_modifier_tokens(leaf["modifiers"], leaf["mod_defs"])
+        inst["ref_keys"].update(ref_keys)
+        inst["forms"] += 1
+
+    # Instructions without forms (e.g. atom) still have a SASS name to match.
+    for inst_name, inst_def in (spec.get("instructions") or {}).items():
+        if inst_name in instructions:
+            continue
+        sass = sass_names(inst_def.get("behavior"))
+        ref_keys = [k for s in sass for k in ref.lookup(s)]
+        bases = {ref.base_of[k] for k in ref_keys}
+        used_bases.update(bases)
+        instructions[inst_name] = {
+            "sass": sass,
+            "ref_base_names": bases,
+            "spec_tokens": spec_modifier_tokens(inst_def.get("inst_modifiers", []), spec.get("global_modifier_defs") or {}),
+            "ref_keys": set(ref_keys),
+            "forms": 0,
+        }
+
+    inst_out: dict[str, dict] = {}
+    for name, inst in instructions.items():
+        ref_tokens: set[str] = set()
+        for k in inst["ref_keys"]:
+            ref_tokens |= ref.tokens[k]
+        inst_out[name] = {
+            "sass": inst["sass"],
+            "forms": inst["forms"],
+            "ref_base_names": sorted(inst["ref_base_names"]),
+            "ref_variants": len(inst["ref_keys"]),
+            "modifier_tokens": {
+                "common": sorted(inst["spec_tokens"] & ref_tokens),
+                "spec_only": sorted(inst["spec_tokens"] - ref_tokens),
+                "ref_only": sorted(ref_tokens - inst["spec_tokens"]),
+            },
+        }
+
+    unmatched_spec = sorted(n for n, i in inst_out.items() if not i["ref_base_names"])
+    unmatched_ref = sorted(b for b in ref.by_base if b not in used_bases)
+    return {
+        "meta": {
+            "spec_instructions": len(inst_out),
+            "spec_forms": len(forms),
+            "ref_variants": len(ref.base_of),
+            "ref_base_names": len(ref.by_base),
+            "matched_spec_instructions": len(inst_out) - len(unmatched_spec),
+            "matched_spec_forms": sum(1 for f in forms.values() if f["ref_base_names"]),
+            "forms_with_operand_count_match": sum(1 for f in forms.values() if f["operand_count_matches"]),
+            "matched_ref_base_names": len(used_bases),
+        },
+        "instructions": inst_out,
+        "forms": forms,
+        "unmatched_spec_instructions": unmatched_spec,
+        "unmatched_ref_base_names": unmatched_ref,
+    }
+
+
+def write_text_report(out, xref: dict, show_unmatched: bool) -> None:
+    m = xref["meta"]
+    out.write(
+        f"spec: {m['matched_spec_instructions']}/{m['spec_instructions']} instructions, "
+        f"{m['matched_spec_forms']}/{m['spec_forms']} forms matched "
+        f"({m['forms_with_operand_count_match']} with an operand-count match) | "
+        f"ref: {m['matched_ref_base_names']}/{m['ref_base_names']} base names used\n\n"
+    )
+    for name, inst in xref["instructions"].items():
+        if not inst["ref_base_names"]:
+            continue
+        toks = inst["modifier_tokens"]
+        out.write(
+            f"{name:16} -> {', '.join(inst['ref_base_names'])} ({inst['ref_variants']} variants)"
+            f" | modifiers common={len(toks['common'])} spec_only={toks['spec_only']}\n"
+        )
+    if show_unmatched:
+        out.write(f"\nunmatched spec instructions ({len(xref['unmatched_spec_instructions'])}):\n")
+        for name in xref["unmatched_spec_instructions"]:
+            out.write(f"  {name} (SASS: {xref['instructions'][name]['sass'] or '-'})\n")
+        out.write(f"\nunmatched ref base names ({len(xref['unmatched_ref_base_names'])}):\n")
+        out.write("  " + " ".join(xref["unmatched_ref_base_names"]) + "\n")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cross-reference spec.jsonc with ref-encoding.json via behavior.SASS.")
+    parser.add_argument("spec", help="Path to spec.jsonc")
+    parser.add_argument("ref_json", help="Path to ref-encoding.json")
+    parser.add_argument("-o", "--out", default="", help="Write the full cross-reference as JSON to this path")
+    parser.add_argument("--unmatched", action="store_true", help="List unmatched items on both sides")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    ref_path = Path(args.ref_json)
+    if not ref_path.exists():
+        print(f"error: file not found: {ref_path}", file=sys.stderr)
+        return 1
+    try:
+        spec = load_jsonc(args.spec)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    xref = cross_reference(spec, build_ref_index(iter_ref_entries(ref_path)))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(xref, fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    write_text_report(sys.stdout, xref, args.unmatched)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())